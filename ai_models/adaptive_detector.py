@@ -1,7 +1,10 @@
 from typing import Optional
 from dataclasses import dataclass
+
+import numpy as np
 from ai_models.user_profile import UserProfile, CalibrationData
 from ai_models.moving_average_filter import MultiChannelFilter
+from ai_models.duration_state import DurationState
 
 
 @dataclass
@@ -34,11 +37,11 @@ class DetectionResult:
     is_head_down: bool = False
     is_too_close: bool = False
     
-    # Counters
-    drowsy_frames: int = 0
-    bad_posture_frames: int = 0
-    head_down_frames: int = 0
-    too_close_frames: int = 0
+    # Số giây liên tục ở trạng thái bất thường
+    drowsy_seconds: float = 0.0
+    bad_posture_seconds: float = 0.0
+    head_down_seconds: float = 0.0
+    too_close_seconds: float = 0.0
 
 
 class AdaptiveDetector:
@@ -48,25 +51,26 @@ class AdaptiveDetector:
                  z_threshold_drowsy: float = -2.0,
                  z_threshold_posture: float = 2.0,
                  z_threshold_distance: float = 2.0,
-                 consecutive_frames: int = 15,
+                 hold_seconds: float = 0.5,
                  filter_window: int = 7):
         
         self.profile = user_profile
         self.z_threshold_drowsy = z_threshold_drowsy
         self.z_threshold_posture = z_threshold_posture
         self.z_threshold_distance = z_threshold_distance
-        self.consecutive_frames = consecutive_frames
         
         self.filters = MultiChannelFilter(
             channels=['ear', 'head_tilt', 'shoulder_angle', 'head_pitch', 'ipd'],
             window_size=filter_window,
             method='ema'
         )
+        self._values = np.zeros(len(self.filters.channels))   # Vector kênh, lọc in place
         
-        self.drowsy_counter = 0
-        self.bad_posture_counter = 0
-        self.head_down_counter = 0
-        self.too_close_counter = 0
+        # Bất thường phải kéo dài hold_seconds giây (~15 frame ở 30 FPS)
+        self.drowsy = DurationState(hold_seconds)
+        self.bad_posture = DurationState(hold_seconds)
+        self.head_down = DurationState(hold_seconds)
+        self.too_close = DurationState(hold_seconds)
         self.last_result: Optional[DetectionResult] = None
 
     def calculate_z_score(self, value: float, calib_data: CalibrationData) -> float:
@@ -76,8 +80,12 @@ class AdaptiveDetector:
         return (value - calib_data.mean) / calib_data.std
 
     def process(self, ear_avg: float, head_tilt: float, shoulder_angle: float,
-                head_pitch: float = 0.0, ipd: float = 0.0) -> DetectionResult:
-        """Xử lý 1 frame và phát hiện bất thường"""
+                head_pitch: float = 0.0, ipd: float = 0.0,
+                timestamp: Optional[float] = None) -> DetectionResult:
+        """Xử lý 1 frame và phát hiện bất thường
+
+        timestamp: capture_ts của frame (giây); None = bây giờ
+        """
         result = DetectionResult()
         
         # Lưu giá trị thô
@@ -87,17 +95,12 @@ class AdaptiveDetector:
         result.raw_head_pitch = head_pitch
         result.raw_ipd = ipd
         
-        # Làm mượt
-        smoothed = self.filters.update({
-            'ear': ear_avg, 'head_tilt': head_tilt, 'shoulder_angle': shoulder_angle,
-            'head_pitch': head_pitch, 'ipd': ipd
-        })
-        
-        result.smoothed_ear = smoothed['ear']
-        result.smoothed_head_tilt = smoothed['head_tilt']
-        result.smoothed_shoulder_angle = smoothed['shoulder_angle']
-        result.smoothed_head_pitch = smoothed['head_pitch']
-        result.smoothed_ipd = smoothed['ipd']
+        # Làm mượt (cùng thứ tự với channels, 1 lần cập nhật vector)
+        values = self._values
+        values[:] = (ear_avg, head_tilt, shoulder_angle, head_pitch, ipd)
+        self.filters.update_array(values, out=values, timestamp=timestamp)
+        (result.smoothed_ear, result.smoothed_head_tilt, result.smoothed_shoulder_angle,
+         result.smoothed_head_pitch, result.smoothed_ipd) = values.tolist()
 
         # Tính Z-scores
         result.z_ear = self.calculate_z_score(result.smoothed_ear, self.profile.ear_data)
@@ -107,47 +110,35 @@ class AdaptiveDetector:
         result.z_ipd = self.calculate_z_score(result.smoothed_ipd, self.profile.ipd_data)
         
         # Phát hiện buồn ngủ (Z_EAR < -2)
-        if result.z_ear < self.z_threshold_drowsy:
-            self.drowsy_counter += 1
-        else:
-            self.drowsy_counter = 0
-        result.drowsy_frames = self.drowsy_counter
-        result.is_drowsy = self.drowsy_counter >= self.consecutive_frames
+        result.is_drowsy = self.drowsy.update(
+            result.z_ear < self.z_threshold_drowsy, timestamp)
+        result.drowsy_seconds = self.drowsy.held
         
         # Phát hiện tư thế xấu
-        if (abs(result.z_head_tilt) > self.z_threshold_posture or 
-            abs(result.z_shoulder) > self.z_threshold_posture):
-            self.bad_posture_counter += 1
-        else:
-            self.bad_posture_counter = 0
-        result.bad_posture_frames = self.bad_posture_counter
-        result.is_bad_posture = self.bad_posture_counter >= self.consecutive_frames
+        result.is_bad_posture = self.bad_posture.update(
+            abs(result.z_head_tilt) > self.z_threshold_posture or
+            abs(result.z_shoulder) > self.z_threshold_posture, timestamp)
+        result.bad_posture_seconds = self.bad_posture.held
         
         # Phát hiện cúi đầu quá mức
-        if result.z_head_pitch > self.z_threshold_posture:
-            self.head_down_counter += 1
-        else:
-            self.head_down_counter = 0
-        result.head_down_frames = self.head_down_counter
-        result.is_head_down = self.head_down_counter >= self.consecutive_frames
+        result.is_head_down = self.head_down.update(
+            result.z_head_pitch > self.z_threshold_posture, timestamp)
+        result.head_down_seconds = self.head_down.held
         
         # Phát hiện ngồi quá gần
-        if result.z_ipd > self.z_threshold_distance:
-            self.too_close_counter += 1
-        else:
-            self.too_close_counter = 0
-        result.too_close_frames = self.too_close_counter
-        result.is_too_close = self.too_close_counter >= self.consecutive_frames
+        result.is_too_close = self.too_close.update(
+            result.z_ipd > self.z_threshold_distance, timestamp)
+        result.too_close_seconds = self.too_close.held
         
         self.last_result = result
         return result
 
     def reset(self):
         self.filters.reset()
-        self.drowsy_counter = 0
-        self.bad_posture_counter = 0
-        self.head_down_counter = 0
-        self.too_close_counter = 0
+        self.drowsy.reset()
+        self.bad_posture.reset()
+        self.head_down.reset()
+        self.too_close.reset()
         self.last_result = None
 
     def get_status_text(self) -> str:
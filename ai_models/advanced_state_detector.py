@@ -8,28 +8,30 @@ Sử dụng NHIỀU METRICS để phát hiện:
 import time
 from typing import Tuple, Dict, Optional
 
+from ai_models.duration_state import DurationState
+
 
 class AdvancedStateDetector:
     """Kết hợp nhiều metrics để phát hiện trạng thái học tập phức tạp"""
     
-    # Thresholds
-    BOREDOM_THRESHOLD_FRAMES = 90       # 3 giây liên tục
-    DAZED_THRESHOLD_FRAMES = 60         # 2 giây
-    SEVERE_DISTRACTION_FRAMES = 120     # 4 giây
+    # Thresholds (giây liên tục, không phụ thuộc FPS)
+    BOREDOM_THRESHOLD_SECONDS = 3.0
+    DAZED_THRESHOLD_SECONDS = 2.0
+    SEVERE_DISTRACTION_SECONDS = 4.0
     
     def __init__(self):
-        # Counters
-        self.boredom_counter = 0
-        self.dazed_counter = 0
-        self.severe_distraction_counter = 0
+        # Thời gian giữ từng trạng thái (hết dấu hiệu → giảm dần 2-3 lần nhanh hơn lúc tăng)
+        self.boredom = DurationState(self.BOREDOM_THRESHOLD_SECONDS, recovery=2.0)
+        self.dazed = DurationState(self.DAZED_THRESHOLD_SECONDS, recovery=2.0)
+        self.severe_distraction = DurationState(self.SEVERE_DISTRACTION_SECONDS, recovery=3.0)
         
         # States
         self.is_bored = False
         self.is_dazed = False
         self.is_severely_distracted = False
         
-        # Tracking
-        self.last_blink_time = time.time()
+        # Tracking (time.monotonic: cùng đồng hồ với capture_ts của frame)
+        self.last_blink_time = time.monotonic()
         self.blink_count = 0
         self.low_blink_duration = 0
         
@@ -43,7 +45,8 @@ class AdvancedStateDetector:
                       head_pitch: float,
                       head_yaw: float,
                       gaze_direction: str,
-                      blink_rate: float) -> bool:
+                      blink_rate: float,
+                      timestamp: Optional[float] = None) -> bool:
         """Phát hiện BUỒN CHÁN
         
         Dấu hiệu:
@@ -59,6 +62,7 @@ class AdvancedStateDetector:
             head_yaw: Góc quay trái/phải
             gaze_direction: Hướng nhìn
             blink_rate: Tần suất chớp mắt (blinks/minute)
+            timestamp: capture_ts của frame (giây); None = bây giờ
         
         Returns:
             bool: True nếu đang buồn chán
@@ -89,17 +93,8 @@ class AdvancedStateDetector:
             is_low_blink
         ])
         
-        if boredom_indicators >= 3:
-            self.boredom_counter += 1
-        else:
-            self.boredom_counter = max(0, self.boredom_counter - 2)
-            
-        if self.boredom_counter >= self.BOREDOM_THRESHOLD_FRAMES:
-            self.is_bored = True
-            return True
-        else:
-            self.is_bored = False
-            return False
+        self.is_bored = self.boredom.update(boredom_indicators >= 3, timestamp)
+        return self.is_bored
     
     def detect_dazed(self,
                     ear_avg: float,
@@ -107,7 +102,8 @@ class AdvancedStateDetector:
                     head_pitch: float,
                     head_roll: float,
                     gaze_direction: str,
-                    emotion: str) -> bool:
+                    emotion: str,
+                    timestamp: Optional[float] = None) -> bool:
         """Phát hiện MƠ MÀNG/SỮNG SỜ
         
         Dấu hiệu:
@@ -124,6 +120,7 @@ class AdvancedStateDetector:
             head_roll: Góc nghiêng đầu
             gaze_direction: Hướng nhìn
             emotion: Cảm xúc
+            timestamp: capture_ts của frame (giây); None = bây giờ
         
         Returns:
             bool: True nếu đang mơ màng
@@ -151,24 +148,16 @@ class AdvancedStateDetector:
             is_unfocused_stare
         ])
         
-        if dazed_indicators >= 3:
-            self.dazed_counter += 1
-        else:
-            self.dazed_counter = max(0, self.dazed_counter - 2)
-            
-        if self.dazed_counter >= self.DAZED_THRESHOLD_FRAMES:
-            self.is_dazed = True
-            return True
-        else:
-            self.is_dazed = False
-            return False
+        self.is_dazed = self.dazed.update(dazed_indicators >= 3, timestamp)
+        return self.is_dazed
     
     def detect_severe_distraction(self,
                                  gaze_direction: str,
                                  head_yaw: float,
                                  emotion: str,
                                  is_using_phone: bool,
-                                 posture_score: float) -> bool:
+                                 posture_score: float,
+                                 timestamp: Optional[float] = None) -> bool:
         """Phát hiện MẤT TẬP TRUNG NGHIÊM TRỌNG
         
         Dấu hiệu:
@@ -184,6 +173,7 @@ class AdvancedStateDetector:
             emotion: Cảm xúc
             is_using_phone: Có đang dùng điện thoại?
             posture_score: Điểm tư thế
+            timestamp: capture_ts của frame (giây); None = bây giờ
         
         Returns:
             bool: True nếu mất tập trung nghiêm trọng
@@ -212,26 +202,19 @@ class AdvancedStateDetector:
             is_bad_posture
         ])
         
-        if severe_indicators >= 2:
-            self.severe_distraction_counter += 1
-        else:
-            self.severe_distraction_counter = max(0, self.severe_distraction_counter - 3)
-            
-        if self.severe_distraction_counter >= self.SEVERE_DISTRACTION_FRAMES:
-            self.is_severely_distracted = True
-            return True
-        else:
-            self.is_severely_distracted = False
-            return False
+        self.is_severely_distracted = self.severe_distraction.update(severe_indicators >= 2, timestamp)
+        return self.is_severely_distracted
     
-    def update_blink_tracking(self, ear_avg: float, threshold: float = 0.21):
+    def update_blink_tracking(self, ear_avg: float, threshold: float = 0.21,
+                              timestamp: Optional[float] = None):
         """Track blink rate để detect dazed state
         
         Args:
             ear_avg: Eye Aspect Ratio
             threshold: EAR threshold để xác định blink
+            timestamp: capture_ts của frame (time.monotonic); None = bây giờ
         """
-        current_time = time.time()
+        current_time = time.monotonic() if timestamp is None else timestamp
         
         # Detect blink: EAR giảm xuống dưới threshold
         if ear_avg < threshold:
@@ -245,16 +228,16 @@ class AdvancedStateDetector:
             self.blink_count = 0
             self.last_blink_time = current_time
     
-    def get_blink_count_last_10s(self) -> int:
+    def get_blink_count_last_10s(self, timestamp: Optional[float] = None) -> int:
         """Lấy số lần chớp mắt trong 10s gần nhất"""
-        current_time = time.time()
+        current_time = time.monotonic() if timestamp is None else timestamp
         if current_time - self.last_blink_time > 10.0:
             return 0
         return self.blink_count
     
-    def get_blink_rate(self) -> float:
+    def get_blink_rate(self, timestamp: Optional[float] = None) -> float:
         """Tính blink rate (blinks/minute)"""
-        current_time = time.time()
+        current_time = time.monotonic() if timestamp is None else timestamp
         elapsed = current_time - (self.last_blink_time - 10.0)
         
         if elapsed <= 0:
@@ -273,9 +256,13 @@ class AdvancedStateDetector:
                           head_yaw: float,
                           gaze_direction: str,
                           is_using_phone: bool,
-                          posture_score: float) -> Dict[str, any]:
+                          posture_score: float,
+                          timestamp: Optional[float] = None) -> Dict[str, any]:
         """Xử lý TẤT CẢ trạng thái nâng cao
         
+        timestamp: capture_ts của frame (time.monotonic) - blink rate tính theo lúc capture,
+        không lệch theo độ trễ queue / inference
+        
         Returns:
             dict với keys:
             - is_bored
@@ -286,23 +273,23 @@ class AdvancedStateDetector:
             - warning_message
         """
         # 1. Update blink tracking
-        self.update_blink_tracking(ear_avg)
-        blink_rate = self.get_blink_rate()
-        blink_count_10s = self.get_blink_count_last_10s()
+        self.update_blink_tracking(ear_avg, timestamp=timestamp)
+        blink_rate = self.get_blink_rate(timestamp)
+        blink_count_10s = self.get_blink_count_last_10s(timestamp)
         
         # 2. Detect từng state
         is_bored = self.detect_boredom(
             emotion, emotion_conf, head_pitch, head_yaw, 
-            gaze_direction, blink_rate
+            gaze_direction, blink_rate, timestamp
         )
         
         is_dazed = self.detect_dazed(
             ear_avg, blink_count_10s, head_pitch, head_roll,
-            gaze_direction, emotion
+            gaze_direction, emotion, timestamp
         )
         
         is_severely_distracted = self.detect_severe_distraction(
-            gaze_direction, head_yaw, emotion, is_using_phone, posture_score
+            gaze_direction, head_yaw, emotion, is_using_phone, posture_score, timestamp
         )
         
         # 3. Xác định dominant state (ưu tiên: dazed > bored > distracted)
@@ -327,18 +314,18 @@ class AdvancedStateDetector:
             'blink_count_10s': blink_count_10s,
             'dominant_state': dominant_state,
             'warning_message': warning,
-            'boredom_counter': self.boredom_counter,
-            'dazed_counter': self.dazed_counter,
-            'distraction_counter': self.severe_distraction_counter
+            'boredom_seconds': round(self.boredom.held, 2),
+            'dazed_seconds': round(self.dazed.held, 2),
+            'distraction_seconds': round(self.severe_distraction.held, 2)
         }
     
     def reset(self):
-        """Reset tất cả counters"""
-        self.boredom_counter = 0
-        self.dazed_counter = 0
-        self.severe_distraction_counter = 0
+        """Reset tất cả trạng thái"""
+        self.boredom.reset()
+        self.dazed.reset()
+        self.severe_distraction.reset()
         self.is_bored = False
         self.is_dazed = False
         self.is_severely_distracted = False
         self.blink_count = 0
-        self.last_blink_time = time.time()
+        self.last_blink_time = time.monotonic()
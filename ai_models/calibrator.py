@@ -1,34 +1,37 @@
 import time 
-import math 
-from typing import List, Optional
+from typing import Dict, Iterable, Optional
 from ai_models.user_profile import UserProfile, CalibrationData
+from ai_models.streaming_stats import RunningStats, Reservoir
+
+# Thứ tự chỉ số trong add_sample (cũng là thứ tự cột của reservoir)
+METRICS = ('ear', 'head_tilt', 'shoulder_angle', 'distance', 'head_pitch', 'ipd')
+MAD_TO_STD = 1.4826   # σ ≈ 1.4826 × MAD với phân phối chuẩn
 
 
 class Calibrator:
-    """Bộ hiệu chuẩn - thu thập dữ liệu baseline trong 10 giây"""
+    """Bộ hiệu chuẩn - thu thập dữ liệu baseline trong 10 giây
+
+    Mean / std / min / max tính dần mỗi mẫu (Welford) → bộ nhớ không tăng theo thời gian,
+    finish() trả kết quả ngay. robust=True: thêm median / MAD từ reservoir cố định;
+    baseline EAR dùng median / MAD (chớp mắt kéo mean xuống và làm std phình ra).
+    """
     
-    def __init__(self, duration: float = 10.0):
+    def __init__(self, duration: float = 10.0, robust: bool = True, reservoir_size: int = 512):
         self.duration = duration
+        self.robust = robust
         
-        # Buffers cho các mẫu dữ liệu
-        self.ear_samples: List[float] = []
-        self.head_tilt_samples: List[float] = []
-        self.shoulder_angle_samples: List[float] = []
-        self.distance_samples: List[float] = []
-        self.head_pitch_samples: List[float] = []
-        self.ipd_samples: List[float] = []
+        self.stats: Dict[str, RunningStats] = {name: RunningStats() for name in METRICS}
+        self.reservoir = Reservoir(reservoir_size, len(METRICS)) if robust else None
         
         self.is_calibrating: bool = False
         self.start_time: Optional[float] = None
         self.progress: float = 0.0
 
     def reset(self):
-        self.ear_samples.clear()
-        self.head_tilt_samples.clear()
-        self.shoulder_angle_samples.clear()
-        self.distance_samples.clear()
-        self.head_pitch_samples.clear()
-        self.ipd_samples.clear()
+        for stats in self.stats.values():
+            stats.reset()
+        if self.reservoir is not None:
+            self.reservoir.reset()
         self.is_calibrating = False
         self.start_time = None
         self.progress = 0.0
@@ -41,16 +44,15 @@ class Calibrator:
 
     def add_sample(self, ear_avg: float, head_tilt: float, shoulder_angle: float, 
                    distance: float, head_pitch: float = 0.0, ipd: float = 0.0):
-        """Thêm mẫu dữ liệu vào buffer"""
+        """Cộng mẫu vào thống kê (O(1), không giữ mẫu)"""
         if not self.is_calibrating:
             return
         
-        self.ear_samples.append(ear_avg)
-        self.head_tilt_samples.append(head_tilt)
-        self.shoulder_angle_samples.append(shoulder_angle)
-        self.distance_samples.append(distance)
-        self.head_pitch_samples.append(head_pitch)
-        self.ipd_samples.append(ipd)
+        row = (ear_avg, head_tilt, shoulder_angle, distance, head_pitch, ipd)
+        for name, value in zip(METRICS, row):
+            self.stats[name].push(value)
+        if self.reservoir is not None:
+            self.reservoir.push(row)
         
         elapsed = time.time() - self.start_time
         self.progress = min(elapsed / self.duration, 1.0)
@@ -61,38 +63,56 @@ class Calibrator:
         return time.time() - self.start_time >= self.duration
 
     @staticmethod
-    def calculate_statistics(samples: List[float]) -> CalibrationData:
-        """Tính mean, std, min, max từ danh sách mẫu"""
-        if len(samples) == 0:
+    def _to_calibration(stats: RunningStats, median: float = 0.0,
+                        mad: float = 0.0) -> CalibrationData:
+        if stats.count == 0:
             return CalibrationData()
-        
-        n = len(samples)
-        mean = sum(samples) / n
-        variance = sum((x - mean) ** 2 for x in samples) / n
-        std = math.sqrt(variance)
-        
         return CalibrationData(
-            mean=mean,
-            std=std,
-            min_val=min(samples),
-            max_val=max(samples),
-            sample_count=n
+            mean=stats.mean,
+            std=stats.std,
+            min_val=stats.min,
+            max_val=stats.max,
+            sample_count=stats.count,
+            median=median,
+            mad=mad
         )
 
+    @classmethod
+    def calculate_statistics(cls, samples: Iterable[float]) -> CalibrationData:
+        """Tính mean, std, min, max từ dãy mẫu (1 lượt duy nhất)"""
+        stats = RunningStats()
+        for value in samples:
+            stats.push(value)
+        return cls._to_calibration(stats)
+
     def finish(self) -> Optional[UserProfile]:
         """Hoàn thành calibration và tạo UserProfile"""
-        if len(self.ear_samples) < 30:
+        if self.stats['ear'].count < 30:
             print("❌ Không đủ mẫu dữ liệu (cần ít nhất 30)")
             return None
         
+        medians, mads = [0.0] * len(METRICS), [0.0] * len(METRICS)
+        if self.reservoir is not None:
+            medians = self.reservoir.median().tolist()
+            mads = self.reservoir.mad().tolist()
+        data = {
+            name: self._to_calibration(self.stats[name], median, mad)
+            for name, median, mad in zip(METRICS, medians, mads)
+        }
+        ear = data['ear']
+        if self.robust and ear.mad > 0:
+            # Baseline EAR robust: median / MAD không bị các lần chớp mắt (EAR ~0) kéo lệch
+            ear.mean = ear.median
+            ear.std = MAD_TO_STD * ear.mad
+        
         profile = UserProfile(
             is_calibrated=True,
-            ear_data=self.calculate_statistics(self.ear_samples),
-            head_tilt_data=self.calculate_statistics(self.head_tilt_samples),
-            shoulder_angle_data=self.calculate_statistics(self.shoulder_angle_samples),
-            distance_data=self.calculate_statistics(self.distance_samples),
-            head_pitch_data=self.calculate_statistics(self.head_pitch_samples),
-            ipd_data=self.calculate_statistics(self.ipd_samples)
+            ear_data=ear,
+            head_tilt_data=data['head_tilt'],
+            shoulder_angle_data=data['shoulder_angle'],
+            distance_data=data['distance'],
+            head_pitch_data=data['head_pitch'],
+            ipd_data=data['ipd']
         )
         
         self.is_calibrating = False
@@ -1,5 +1,9 @@
 import math
-from typing import Tuple
+import time
+from typing import Tuple, Optional
+
+from ai_models.duration_state import DurationState
+from ai_models.streaming_stats import TimeWindowStats
 
 
 class DrowsinessDetector:
@@ -9,31 +13,43 @@ class DrowsinessDetector:
     LEFT_EYE = {'upper': 386, 'lower': 374, 'left': 263, 'right': 362}
     RIGHT_EYE = {'upper': 159, 'lower': 145, 'left': 133, 'right': 33}
     
-    def __init__(self, ear_threshold: float = 0.2, consec_frames: int = 20):
+    # Cửa sổ đo chuyển động đầu cho microsleep (giây) và lượng lịch sử tối thiểu
+    HEAD_HISTORY_SECONDS = 1.0
+    HEAD_HISTORY_MIN_SECONDS = 0.33
+
+    def __init__(self, ear_threshold: float = 0.2, closed_seconds: float = 0.67,
+                 microsleep_seconds: float = 3.0):
+        """
+        Args:
+            ear_threshold: EAR dưới ngưỡng = mắt nhắm
+            closed_seconds: nhắm mắt liên tục bao lâu thì buồn ngủ (~20 frame ở 30 FPS)
+            microsleep_seconds: microsleep kéo dài bao lâu thì cảnh báo (~90 frame ở 30 FPS)
+        """
         self.ear_threshold = ear_threshold
-        self.consec_frames = consec_frames
-        self.eye_closed_counter = 0
+        self.eyes_closed = DurationState(closed_seconds)
         self.is_drowsy = False
-        self.micro_threshold_frame = 90
-        self.microsleep_max_frams = 300
-        self.microsleep_counter = 0
+        self.microsleep = DurationState(microsleep_seconds)
         self.is_microsleep = False
 
         self.last_head_pitch = 0.0
-        self.head_pitch_history = [] # lưu 30 frame gần nhất 
+        self.head_pitch_history = TimeWindowStats(self.HEAD_HISTORY_SECONDS)
         self.head_movememt_threshold = 5.0
 
     @staticmethod
     def calculate_distance(p1, p2) -> float:
-        """Khoảng cách Euclidean 3D giữa 2 điểm"""
-        return math.sqrt((p1.x - p2.x)**2 + (p1.y - p2.y)**2 + (p1.z - p2.z)**2)
+        """Khoảng cách Euclidean 3D giữa 2 điểm (x, y, z)"""
+        return math.dist(p1, p2)
+
+    def calculate_ear(self, points, eye_points: dict) -> float:
+        """EAR = vertical_distance / horizontal_distance
 
-    def calculate_ear(self, landmarks, eye_points: dict) -> float:
-        """EAR = vertical_distance / horizontal_distance"""
-        upper = landmarks[eye_points['upper']]
-        lower = landmarks[eye_points['lower']]
-        left = landmarks[eye_points['left']]
-        right = landmarks[eye_points['right']]
+        Args:
+            points: mảng landmarks (N, 3) - LandmarkArray.points
+        """
+        upper, lower, left, right = points[[
+            eye_points['upper'], eye_points['lower'],
+            eye_points['left'], eye_points['right']
+        ]].tolist()
         
         vertical = self.calculate_distance(upper, lower)
         horizontal = self.calculate_distance(left, right)
@@ -45,52 +61,58 @@ class DrowsinessDetector:
     def detect_microsleep(self, ear_avg: float,
                           head_pitch: float,
                           head_yaw: float,
-                          head_roll: float) -> Tuple[bool, int]:
+                          head_roll: float,
+                          timestamp: Optional[float] = None) -> Tuple[bool, float]:
         """phát hiện microslepp qua: 
             ear thấp kéo dài 
             đầu cúi dần
             không chuyyeenr động đầu
+
+        timestamp: capture_ts của frame (giây); None = bây giờ
+        Returns: (is_microsleep, số giây đã kéo dài)
         """     
+        now = time.monotonic() if timestamp is None else timestamp
         eyes_closed = ear_avg < 0.18
-        self.head_pitch_history.append(head_pitch)
-        if len(self.head_pitch_history) > 30:
-            self.head_pitch_history.pop(0)
+        history = self.head_pitch_history
+        history.push(head_pitch, now)
         head_movement = 0
-        if len(self.head_pitch_history) >= 10:
-            head_movement = max(self.head_pitch_history) - min(self.head_pitch_history)
+        if history.span >= self.HEAD_HISTORY_MIN_SECONDS:
+            head_movement = history.range
         is_head_stable = head_movement < self.head_movememt_threshold
         is_head_drooping = head_pitch > 15
-        if eyes_closed and is_head_stable and is_head_drooping:
-            self.microsleep_counter += 1
-        else:
-            self.microsleep_counter = 0
-            self.is_microsleep = False
-            return False, 0
-        if self.microsleep_counter >= self.micro_threshold_frame:
-            self.is_microsleep = True
-            return True, self.microsleep_counter
-        return False, 0
-    def process(self, face_landmarks) -> Tuple[float, float, bool]:
-        """Xử lý face landmarks và trả về (ear_left, ear_right, is_drowsy)"""
+        self.is_microsleep = self.microsleep.update(
+            eyes_closed and is_head_stable and is_head_drooping, now)
+        if self.is_microsleep:
+            return True, self.microsleep.held
+        return False, 0.0
+    def process(self, face_landmarks,
+                ears: Optional[Tuple[float, float]] = None,
+                timestamp: Optional[float] = None) -> Tuple[float, float, bool]:
+        """Xử lý face landmarks và trả về (ear_left, ear_right, is_drowsy)
+        
+        Args:
+            face_landmarks: LandmarkArray của Face Landmarker
+            ears: (ear_left, ear_right) đã tính sẵn bởi feature_extractor (optional)
+            timestamp: capture_ts của frame (giây); None = bây giờ
+        """
         if face_landmarks is None:
             return 0.0, 0.0, False
         
-        landmarks = face_landmarks.landmark
-        ear_left = self.calculate_ear(landmarks, self.LEFT_EYE)
-        ear_right = self.calculate_ear(landmarks, self.RIGHT_EYE)
+        if ears is not None:
+            ear_left, ear_right = ears
+        else:
+            points = face_landmarks.points
+            ear_left = self.calculate_ear(points, self.LEFT_EYE)
+            ear_right = self.calculate_ear(points, self.RIGHT_EYE)
         ear_avg = (ear_left + ear_right) / 2.0
 
-        if ear_avg < self.ear_threshold:
-            self.eye_closed_counter += 1
-        else:
-            self.eye_closed_counter = 0
-            self.is_drowsy = False
-            
-        if self.eye_closed_counter >= self.consec_frames:
-            self.is_drowsy = True
+        self.is_drowsy = self.eyes_closed.update(ear_avg < self.ear_threshold, timestamp)
             
         return ear_left, ear_right, self.is_drowsy
 
     def reset(self):
-        self.eye_closed_counter = 0
+        self.eyes_closed.reset()
         self.is_drowsy = False
+        self.microsleep.reset()
+        self.is_microsleep = False
+        self.head_pitch_history.reset()
@@ -0,0 +1,55 @@
+"""
+Duration State - Trạng thái theo THỜI GIAN thay vì đếm frame
+- Điều kiện phải giữ đủ `on_seconds` giây mới bật cảnh báo → ý nghĩa không đổi theo
+  AI FPS, frame skipping hay preset (đếm frame: 30 frame = 1s ở 30 FPS nhưng 3s ở 10 FPS)
+- Thời gian lấy từ capture_ts của frame (time.monotonic) hoặc thời điểm trong video
+  (offline analyzer); không truyền → lúc gọi
+- Cùng 1 frame gọi nhiều lần (main loop vẽ lại result cũ) → không cộng thêm thời gian
+"""
+import time
+from typing import Optional
+
+
+class DurationState:
+    """1 điều kiện cần giữ liên tục trong khoảng thời gian cho trước"""
+
+    def __init__(self, on_seconds: float, recovery: Optional[float] = None,
+                 max_gap: float = 1.0):
+        """
+        Args:
+            on_seconds: thời gian giữ điều kiện để bật (giây)
+            recovery: None → điều kiện sai là về 0 ngay; k → mỗi giây sai trừ k giây đã giữ
+                (hồi phục dần, thay cho counter giảm 2-3 đơn vị / frame)
+            max_gap: khoảng giữa 2 lần update tối đa được tính (mất mặt, tạm dừng...)
+        """
+        self.on_seconds = on_seconds
+        self.recovery = recovery
+        self.max_gap = max_gap
+        self.held = 0.0          # Số giây đã giữ điều kiện
+        self.active = False
+        self._last_ts: Optional[float] = None
+
+    def update(self, condition: bool, timestamp: Optional[float] = None) -> bool:
+        """Cập nhật với điều kiện ở thời điểm timestamp (giây) → đã bật chưa
+
+        Khoảng thời gian từ lần update trước được tính theo điều kiện của lần này.
+        """
+        now = time.monotonic() if timestamp is None else timestamp
+        dt = 0.0
+        if self._last_ts is not None:
+            dt = min(max(0.0, now - self._last_ts), self.max_gap)
+        self._last_ts = now
+
+        if condition:
+            self.held += dt
+        elif self.recovery is None:
+            self.held = 0.0
+        else:
+            self.held = max(0.0, self.held - self.recovery * dt)
+        self.active = self.held >= self.on_seconds
+        return self.active
+
+    def reset(self):
+        self.held = 0.0
+        self.active = False
+        self._last_ts = None
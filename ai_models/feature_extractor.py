@@ -0,0 +1,128 @@
+"""
+Feature Extractor - Tính TẤT CẢ đặc trưng hình học mỗi frame trong 1 lượt NumPy
+Thay cho các phép math.sqrt / atan2 rời rạc trong:
+- DrowsinessDetector.calculate_ear (EAR trái/phải)
+- GazeTracker._get_iris_position (gaze ratio)
+- PostureAnalyzer.calculate_head_pitch/roll/yaw, calculate_face_distance (IPD)
+"""
+import math
+from typing import Optional
+import numpy as np
+
+from ai_models.drowsiness_detector import DrowsinessDetector
+from ai_models.gaze_tracker import (
+    LEFT_EYE_OUTER, LEFT_EYE_INNER, RIGHT_EYE_OUTER, RIGHT_EYE_INNER,
+    LEFT_IRIS_CENTER, RIGHT_IRIS_CENTER
+)
+from ai_models.posture_analyzer import FaceMeshLandmarks
+
+
+# ============ LAYOUT VECTOR ĐẶC TRƯNG (cố định) ============
+FEATURE_EAR_LEFT = 0
+FEATURE_EAR_RIGHT = 1
+FEATURE_EAR_AVG = 2
+FEATURE_GAZE_RATIO = 3
+FEATURE_HEAD_PITCH = 4
+FEATURE_HEAD_ROLL = 5
+FEATURE_HEAD_YAW = 6
+FEATURE_FACE_DISTANCE = 7
+NUM_FACE_FEATURES = 8
+
+FEATURE_NAMES = (
+    'ear_left', 'ear_right', 'ear_avg', 'gaze_ratio',
+    'head_pitch', 'head_roll', 'head_yaw', 'face_distance_ipd'
+)
+
+# Số landmarks khi có iris (Face Landmarker trả về 478 điểm)
+NUM_LANDMARKS_WITH_IRIS = 478
+
+
+def _build_index_tables() -> np.ndarray:
+    """Tạo bảng index 1 lần khi import
+
+    Trả về mảng index [A..., B...] để lấy TẤT CẢ điểm cần thiết bằng 1 lần take:
+    hiệu vector D[k] = points[A[k]] - points[B[k]]
+    """
+    le, re = DrowsinessDetector.LEFT_EYE, DrowsinessDetector.RIGHT_EYE
+    pairs = [
+        # 0-3: EAR (3D) - dọc/ngang mắt trái, dọc/ngang mắt phải
+        (le['upper'], le['lower']),
+        (le['left'], le['right']),
+        (re['upper'], re['lower']),
+        (re['left'], re['right']),
+        # 4: 2 khóe mắt ngoài - dùng cho IPD (2D) và head roll
+        (FaceMeshLandmarks.RIGHT_EYE_OUTER, FaceMeshLandmarks.LEFT_EYE_OUTER),
+        # 5: cằm - trán - head pitch
+        (FaceMeshLandmarks.CHIN, FaceMeshLandmarks.FOREHEAD),
+        # 6-7: mũi - má trái/phải - head yaw
+        (FaceMeshLandmarks.NOSE_TIP, FaceMeshLandmarks.LEFT_CHEEK),
+        (FaceMeshLandmarks.NOSE_TIP, FaceMeshLandmarks.RIGHT_CHEEK),
+        # 8-11: gaze - offset/độ rộng mắt trái, offset/độ rộng mắt phải
+        (LEFT_IRIS_CENTER, LEFT_EYE_OUTER),
+        (LEFT_EYE_INNER, LEFT_EYE_OUTER),
+        (RIGHT_EYE_OUTER, RIGHT_IRIS_CENTER),
+        (RIGHT_EYE_OUTER, RIGHT_EYE_INNER),
+    ]
+    return np.array([p[0] for p in pairs] + [p[1] for p in pairs], dtype=np.intp)
+
+
+_PAIR_INDEX = _build_index_tables()
+_NUM_PAIRS = len(_PAIR_INDEX) // 2
+
+
+def extract_face_features(points: np.ndarray,
+                          out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Tính vector đặc trưng khuôn mặt từ mảng landmarks (N, 3)
+
+    1 lần take (gather) + 1 phép trừ vector cho toàn bộ 12 cặp điểm,
+    sau đó chỉ còn vài phép sqrt/atan2 trên số thực Python.
+
+    Args:
+        points: LandmarkArray.points của Face Landmarker
+        out: mảng (NUM_FACE_FEATURES,) float64 để ghi kết quả (tránh cấp phát)
+
+    Returns:
+        np.ndarray: vector theo layout FEATURE_* ở trên
+    """
+    if out is None:
+        out = np.empty(NUM_FACE_FEATURES, dtype=np.float64)
+
+    has_iris = points.shape[0] >= NUM_LANDMARKS_WITH_IRIS
+    # Không có iris: 'clip' giữ được 1 lần take, gaze bị bỏ qua bên dưới
+    p = points.take(_PAIR_INDEX, axis=0, mode='raise' if has_iris else 'clip')
+    (ear_lv, ear_lh, ear_rv, ear_rh, eyes, face, nose_l, nose_r,
+     l_off, l_width, r_off, r_width) = (p[:_NUM_PAIRS] - p[_NUM_PAIRS:]).tolist()
+
+    # EAR = dọc / ngang (3D, ngang = 0 → 0.0)
+    h_left = math.sqrt(ear_lh[0] ** 2 + ear_lh[1] ** 2 + ear_lh[2] ** 2)
+    h_right = math.sqrt(ear_rh[0] ** 2 + ear_rh[1] ** 2 + ear_rh[2] ** 2)
+    ear_left = (math.sqrt(ear_lv[0] ** 2 + ear_lv[1] ** 2 + ear_lv[2] ** 2) / h_left
+                if h_left != 0 else 0.0)
+    ear_right = (math.sqrt(ear_rv[0] ** 2 + ear_rv[1] ** 2 + ear_rv[2] ** 2) / h_right
+                 if h_right != 0 else 0.0)
+
+    # Pitch: atan2(độ sâu cằm-trán, chiều cao mặt); roll: góc đường 2 khóe mắt
+    pitch = math.degrees(math.atan2(face[2], abs(face[1]))) if face[1] != 0 else 0.0
+    roll = math.degrees(math.atan2(eyes[1], eyes[0]))
+
+    # Yaw: (dist_right - dist_left) / total * 45
+    dist_left, dist_right = abs(nose_l[0]), abs(nose_r[0])
+    total = dist_left + dist_right
+    yaw = (dist_right - dist_left) / total * 45 if total != 0 else 0.0
+
+    # Gaze ratio: trung bình 2 mắt, kẹp [0, 1]
+    if has_iris:
+        left_ratio = l_off[0] / l_width[0] if abs(l_width[0]) >= 0.001 else 0.5
+        right_ratio = r_off[0] / r_width[0] if abs(r_width[0]) >= 0.001 else 0.5
+        gaze = min(1.0, max(0.0, (left_ratio + right_ratio) / 2.0))
+    else:
+        gaze = 0.5
+
+    out[:] = (ear_left, ear_right, (ear_left + ear_right) / 2.0, gaze,
+              pitch, roll, yaw, math.sqrt(eyes[0] ** 2 + eyes[1] ** 2))
+    return out
+
+
+def features_to_dict(features: np.ndarray) -> dict:
+    """Vector đặc trưng → dict {tên: giá trị} (debug / log)"""
+    return dict(zip(FEATURE_NAMES, features.tolist()))
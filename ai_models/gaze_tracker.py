@@ -1,5 +1,7 @@
 from typing import Tuple, Optional
 
+from ai_models.duration_state import DurationState
+
 
 # MediaPipe Face Mesh Landmarks
 LEFT_EYE_OUTER = 33      # Góc ngoài mắt trái
@@ -20,29 +22,33 @@ class GazeTracker:
     
     def __init__(self, left_threshold: float = 0.35, 
                  right_threshold: float = 0.65, 
-                 distraction_frames: int = 30):
+                 distraction_seconds: float = 1.0):
         self.left_threshold = left_threshold
         self.right_threshold = right_threshold
-        self.distraction_frames = distraction_frames
         
-        # Trạng thái
-        self.distraction_counter = 0
+        # Trạng thái: nhìn lệch liên tục distraction_seconds giây (~30 frame ở 30 FPS)
+        self.looking_away = DurationState(distraction_seconds)
         self.is_distracted = False
         self.current_direction = "CENTER"
         self.current_ratio = 0.5
 
     def _calculate_distance(self, p1, p2) -> float:
-        return ((p1.x - p2.x) ** 2 + (p1.y - p2.y) ** 2) ** 0.5
+        return ((p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2) ** 0.5
 
-    def _get_iris_position(self, landmarks) -> float:
+    def _get_iris_position(self, points) -> float:
         """Tính vị trí tương đối của iris trong mắt (0-1)
         
+        Args:
+            points: mảng landmarks (N, 3) - LandmarkArray.points
+        
         Returns:
             float: Gaze ratio (0.5 = nhìn thẳng)
         """
-        left_iris_x = landmarks[LEFT_IRIS_CENTER].x
-        left_eye_outer_x = landmarks[LEFT_EYE_OUTER].x
-        left_eye_inner_x = landmarks[LEFT_EYE_INNER].x
+        (left_iris_x, left_eye_outer_x, left_eye_inner_x,
+         right_iris_x, right_eye_outer_x, right_eye_inner_x) = points[[
+            LEFT_IRIS_CENTER, LEFT_EYE_OUTER, LEFT_EYE_INNER,
+            RIGHT_IRIS_CENTER, RIGHT_EYE_OUTER, RIGHT_EYE_INNER
+        ], 0].tolist()
         
         left_eye_width = left_eye_inner_x - left_eye_outer_x
         if abs(left_eye_width) < 0.001:  
@@ -50,9 +56,6 @@ class GazeTracker:
         else:
             left_iris_offset = left_iris_x - left_eye_outer_x
             left_ratio = left_iris_offset / left_eye_width
-        right_iris_x = landmarks[RIGHT_IRIS_CENTER].x
-        right_eye_outer_x = landmarks[RIGHT_EYE_OUTER].x
-        right_eye_inner_x = landmarks[RIGHT_EYE_INNER].x
         
         right_eye_width = right_eye_outer_x - right_eye_inner_x  
         if abs(right_eye_width) < 0.001:
@@ -71,26 +74,28 @@ class GazeTracker:
         else:
             return "CENTER"
 
-    def process(self, face_landmarks) -> Tuple[float, str, bool]:
+    def process(self, face_landmarks,
+                gaze_ratio: Optional[float] = None,
+                timestamp: Optional[float] = None) -> Tuple[float, str, bool]:
+        """Args:
+            face_landmarks: LandmarkArray của Face Landmarker
+            gaze_ratio: ratio đã tính sẵn bởi feature_extractor (optional)
+            timestamp: capture_ts của frame (giây); None = bây giờ
+        """
         if face_landmarks is None:
             return 0.5, "CENTER", False
         
-        landmarks = face_landmarks.landmark
-        
-        self.current_ratio = self._get_iris_position(landmarks)
-        direction = self._determine_direction()
-        if direction != "CENTER":
-            self.distraction_counter += 1
+        if gaze_ratio is not None:
+            self.current_ratio = gaze_ratio
         else:
-            self.distraction_counter = 0
-            self.is_distracted = False        
-        if self.distraction_counter >= self.distraction_frames:
-            self.is_distracted = True
+            self.current_ratio = self._get_iris_position(face_landmarks.points)
+        direction = self._determine_direction()
+        self.is_distracted = self.looking_away.update(direction != "CENTER", timestamp)
         self.current_direction = direction
         return self.current_ratio, direction, self.is_distracted
 
     def reset(self):
-        self.distraction_counter = 0
+        self.looking_away.reset()
         self.is_distracted = False
         self.current_direction = "CENTER"
         self.current_ratio = 0.5
\ No newline at end of file
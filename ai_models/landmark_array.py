@@ -0,0 +1,46 @@
+from typing import List, NamedTuple
+import numpy as np
+
+
+class Landmark(NamedTuple):
+    """1 điểm landmark (chỉ dùng cho code cũ truy cập .x/.y/.z)"""
+    x: float
+    y: float
+    z: float
+
+
+class LandmarkArray:
+    """Landmarks lưu trong 1 mảng (N, 3) float32 liên tục
+
+    Thay cho LandmarkList + N object Landmark tạo mới mỗi frame:
+    - Điền 1 lần từ kết quả MediaPipe
+    - Detectors index trực tiếp: points[idx] hoặc points[[i, j, k]]
+    - Cột 0/1/2 = x/y/z (normalized theo ảnh)
+    """
+
+    __slots__ = ('points', '_landmark_cache')
+
+    def __init__(self, points: np.ndarray):
+        self.points = points
+        self._landmark_cache = None
+
+    @classmethod
+    def from_mediapipe(cls, landmarks) -> 'LandmarkArray':
+        """Tạo từ list NormalizedLandmark của MediaPipe Tasks (1 lần copy duy nhất)"""
+        n = len(landmarks)
+        flat = np.fromiter(
+            (v for lm in landmarks for v in (lm.x, lm.y, lm.z)),
+            dtype=np.float32,
+            count=n * 3
+        )
+        return cls(flat.reshape(n, 3))
+
+    def __len__(self) -> int:
+        return self.points.shape[0]
+
+    @property
+    def landmark(self) -> List[Landmark]:
+        """Tương thích API cũ (face_landmarks.landmark[i].x) - chậm, chỉ tạo khi cần"""
+        if self._landmark_cache is None:
+            self._landmark_cache = [Landmark(*row) for row in self.points.tolist()]
+        return self._landmark_cache
@@ -1,5 +1,9 @@
-from collections import deque
-from typing import List, Optional, Dict
+import math
+from typing import List, Optional, Dict, Sequence, Union
+
+import numpy as np
+
+from ai_models.streaming_stats import CountWindowStats
 
 
 class MovingAverageFilter:
@@ -13,13 +17,13 @@ class MovingAverageFilter:
     def __init__(self, window_size: int = 7, method: str = 'ema'):
         self.window_size = window_size
         self.method = method.lower()
-        self.buffer: deque = deque(maxlen=window_size)
+        self.window = CountWindowStats(window_size)   # SMA: tổng trượt, không cộng lại cả cửa sổ
         self.ema_value: Optional[float] = None
         self.alpha = 2 / (window_size + 1)  # Hệ số EMA
         self.sample_count = 0
 
     def reset(self):
-        self.buffer.clear()
+        self.window.reset()
         self.ema_value = None
         self.sample_count = 0
 
@@ -31,8 +35,8 @@ class MovingAverageFilter:
         return self._update_ema(value)
 
     def _update_sma(self, value: float) -> float:
-        self.buffer.append(value)
-        return sum(self.buffer) / len(self.buffer)
+        self.window.push(value)
+        return self.window.mean
 
     def _update_ema(self, value: float) -> float:
         """EMA = α * value + (1 - α) * EMA_prev"""
@@ -44,35 +48,238 @@ class MovingAverageFilter:
 
     def get_current_value(self) -> Optional[float]:
         if self.method == 'sma':
-            return sum(self.buffer) / len(self.buffer) if self.buffer else None
+            return self.window.mean
         return self.ema_value
 
     def is_ready(self) -> bool:
         if self.method == 'sma':
-            return len(self.buffer) >= self.window_size
+            return self.window.full
         return self.ema_value is not None
 
 
 class MultiChannelFilter:
-    """Bộ lọc cho nhiều kênh đồng thời (ear, head_tilt, etc.)"""
-    
-    def __init__(self, channels: List[str], window_size: int = 7, method: str = 'ema'):
-        self.channels = channels
-        self.filters = {ch: MovingAverageFilter(window_size, method) for ch in channels}
+    """Bộ lọc cho nhiều kênh đồng thời (ear, head_tilt, etc.) - trạng thái trong mảng NumPy
 
-    def reset(self):
-        for f in self.filters.values():
-            f.reset()
+    - Mọi kênh cập nhật bằng 1 phép toán vector (không còn 1 MovingAverageFilter / kênh)
+    - method: 'ema', 'sma' hoặc 'one_euro' (One-Euro: đứng yên → lọc mạnh, chuyển động
+      nhanh → cutoff tăng theo tốc độ, ít trễ)
+    - update_array(): nhận thẳng vector đặc trưng (vd. face_features), ghi kết quả vào out
+      (có thể là chính mảng vào) → không tạo dict trung gian
+    - Số mẫu đếm riêng từng kênh; mask của update_array chọn kênh được cập nhật
+      (kênh bị bỏ qua giữ nguyên trạng thái, như 1 MovingAverageFilter không được gọi)
+    - seats > 1: nhiều phiên (ghế) trong cùng process, trạng thái (seats, channels);
+      cập nhật 1 lần cho tất cả hoặc 1 nhóm ghế (tham số seats của update_array)
+    """
 
-    def update(self, values: Dict[str, float]) -> Dict[str, float]:
-        """Cập nhật tất cả kênh và trả về giá trị đã làm mượt"""
-        smoothed = {}
-        for channel, value in values.items():
-            if channel in self.filters:
-                smoothed[channel] = self.filters[channel].update(value)
-            else:
-                smoothed[channel] = value
+    def __init__(self, channels: List[str], window_size: int = 7, method: str = 'ema',
+                 seats: int = 1, min_cutoff: float = 1.0, beta: float = 0.007,
+                 d_cutoff: float = 1.0, rate: float = 30.0):
+        """
+        Args:
+            channels: tên các kênh (thứ tự = thứ tự cột của update_array)
+            window_size: cửa sổ SMA; EMA dùng alpha = 2 / (window_size + 1)
+            seats: số phiên lọc song song
+            min_cutoff, beta, d_cutoff: tham số One-Euro (Hz)
+            rate: tần số mẫu (Hz) khi One-Euro không được truyền timestamp
+        """
+        self.channels = list(channels)
+        self.index = {ch: i for i, ch in enumerate(self.channels)}
+        self.window_size = window_size
+        self.method = method.lower()
+        self.seats = seats
+        self.alpha = 2 / (window_size + 1)  # Hệ số EMA
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.rate = rate
+
+        shape = (seats, len(self.channels))
+        self._value = np.zeros(shape)                   # Giá trị đã lọc gần nhất
+        self._count = np.zeros(shape, dtype=np.int64)   # Số mẫu của từng kênh
+        self._rows = np.arange(seats)[:, None]
+        self._cols = np.arange(len(self.channels))
+        if self.method == 'sma':
+            # Vị trí ghi trong ring của mỗi kênh = count % window_size
+            self._ring = np.zeros((window_size,) + shape)
+            self._sum = np.zeros(shape)
+        elif self.method == 'one_euro':
+            self._dx = np.zeros(shape)              # Đạo hàm đã lọc
+            self._last_ts = np.zeros(shape)
+
+    def reset(self, seat: Optional[int] = None, channel: Optional[str] = None):
+        """Xoá trạng thái của 1 ghế / 1 kênh (None = tất cả)"""
+        index = (slice(None) if seat is None else seat,
+                 slice(None) if channel is None else self.index[channel])
+        self._value[index] = 0.0
+        self._count[index] = 0
+        if self.method == 'sma':
+            self._ring[(slice(None),) + index] = 0.0
+            self._sum[index] = 0.0
+        elif self.method == 'one_euro':
+            self._dx[index] = 0.0
+            self._last_ts[index] = 0.0
+
+    def update_array(self, values: np.ndarray, out: Optional[np.ndarray] = None,
+                     seats: Union[int, Sequence[int], np.ndarray, None] = None,
+                     timestamp: Optional[float] = None,
+                     mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cập nhật các kênh từ vector → giá trị đã làm mượt
+
+        Args:
+            values: (channels,) cho 1 ghế hoặc (k, channels) cho k ghế
+            out: mảng nhận kết quả cùng shape với values (None → mảng mới; values → in place)
+            seats: ghế tương ứng từng hàng (int / danh sách); None → ghế 0 hoặc tất cả ghế
+            timestamp: thời điểm mẫu (giây, capture_ts) cho One-Euro
+            mask: bool cùng shape với values (hoặc (channels,)) - chỉ cập nhật kênh True;
+                kênh False trả giá trị đã lọc gần nhất và không đổi trạng thái
+        """
+        values = np.asarray(values, dtype=np.float64)
+        single = values.ndim == 1
+        x = values.reshape(1, -1) if single else values
+        if seats is None:
+            rows = slice(0, x.shape[0])
+        else:
+            rows = np.atleast_1d(np.asarray(seats, dtype=np.intp))
+        if mask is not None:
+            mask = np.broadcast_to(np.asarray(mask, dtype=bool).reshape(-1, x.shape[1]), x.shape)
+
+        count = self._count[rows]
+        first = None if count.all() else count == 0   # Kênh chưa có mẫu nào
+        if self.method == 'sma':
+            smoothed = self._update_sma(x, rows, count, mask)
+            self._value[rows] = smoothed
+        elif self.method == 'one_euro':
+            smoothed = self._update_one_euro(x, rows, first, timestamp, mask)
+            self._value[rows] = smoothed
+        else:
+            smoothed = self._update_ema(x, rows, first, mask)
+        if mask is None:
+            self._count[rows] += 1
+        else:
+            self._count[rows] += mask
+
+        if out is None:
+            return (smoothed[0] if single else smoothed).copy()
+        out[...] = smoothed[0] if single else smoothed
+        return out
+
+    def _update_ema(self, x: np.ndarray, rows, first: Optional[np.ndarray],
+                    mask: Optional[np.ndarray]) -> np.ndarray:
+        """EMA = α * value + (1 - α) * EMA_prev; mẫu đầu tiên của kênh = chính nó"""
+        if mask is None and isinstance(rows, slice):
+            smoothed = self._value[rows]   # View → cập nhật thẳng vào trạng thái
+            smoothed += self.alpha * (x - smoothed)
+            if first is not None:
+                np.copyto(smoothed, x, where=first)
+            return smoothed
+        previous = self._value[rows]
+        smoothed = previous + self.alpha * (x - previous)
+        if first is not None:
+            np.copyto(smoothed, x, where=first)
+        if mask is not None:
+            smoothed = np.where(mask, smoothed, previous)
+        self._value[rows] = smoothed
         return smoothed
 
-    def get_filter(self, channel: str) -> Optional[MovingAverageFilter]:
-        return self.filters.get(channel)
+    def _update_sma(self, x: np.ndarray, rows, count: np.ndarray,
+                    mask: Optional[np.ndarray]) -> np.ndarray:
+        """Tổng trượt trong ring buffer: + mẫu mới - mẫu rời cửa sổ"""
+        seat = self._rows[rows] if isinstance(rows, slice) else rows[:, None]
+        pos = count % self.window_size
+        leaving = self._ring[pos, seat, self._cols]
+        total = self._sum[rows] + x - leaving
+        smoothed = total / np.minimum(count + 1, self.window_size)
+        if mask is None:
+            self._ring[pos, seat, self._cols] = x
+            self._sum[rows] = total
+            return smoothed
+        self._ring[pos, seat, self._cols] = np.where(mask, x, leaving)
+        self._sum[rows] = np.where(mask, total, self._sum[rows])
+        return np.where(mask, smoothed, self._value[rows])
+
+    def _update_one_euro(self, x: np.ndarray, rows, first: Optional[np.ndarray],
+                         timestamp: Optional[float], mask: Optional[np.ndarray]) -> np.ndarray:
+        if timestamp is None:
+            dt = np.full(x.shape, 1.0 / self.rate)
+        else:
+            dt = timestamp - self._last_ts[rows]
+            dt[dt <= 0] = 1.0 / self.rate   # Mẫu đầu tiên / trùng timestamp
+        previous = self._value[rows]
+        dx = (x - previous) / dt
+        a_d = 1.0 / (1.0 + 1.0 / (2 * math.pi * self.d_cutoff * dt))
+        dx_hat = self._dx[rows] + a_d * (dx - self._dx[rows])
+        cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+        a = 1.0 / (1.0 + 1.0 / (2 * math.pi * cutoff * dt))
+        smoothed = previous + a * (x - previous)
+        if first is not None:
+            np.copyto(smoothed, x, where=first)
+            dx_hat[first] = 0.0
+        if mask is None:
+            self._dx[rows] = dx_hat
+            if timestamp is not None:
+                self._last_ts[rows] = timestamp
+            return smoothed
+        self._dx[rows] = np.where(mask, dx_hat, self._dx[rows])
+        if timestamp is not None:
+            self._last_ts[rows] = np.where(mask, timestamp, self._last_ts[rows])
+        return np.where(mask, smoothed, previous)
+
+    def update(self, values: Dict[str, float], seat: int = 0,
+               timestamp: Optional[float] = None) -> Dict[str, float]:
+        """Cập nhật các kênh có trong values và trả về giá trị đã làm mượt (dict, như code cũ)
+
+        Kênh không có trong values giữ nguyên trạng thái; key lạ trả nguyên giá trị.
+        """
+        vector = np.zeros(len(self.channels))
+        mask = np.zeros(len(self.channels), dtype=bool)
+        for channel, value in values.items():
+            i = self.index.get(channel)
+            if i is not None:
+                vector[i] = value
+                mask[i] = True
+        smoothed = self.update_array(vector, out=vector, seats=seat,
+                                     timestamp=timestamp, mask=mask)
+        return {
+            channel: float(smoothed[self.index[channel]]) if channel in self.index else value
+            for channel, value in values.items()
+        }
+
+    def get_value(self, channel: str, seat: int = 0) -> Optional[float]:
+        """Giá trị đã lọc gần nhất của 1 kênh (None nếu chưa có mẫu)"""
+        i = self.index.get(channel)
+        if i is None or self._count[seat, i] == 0:
+            return None
+        return float(self._value[seat, i])
+
+    def is_ready(self, channel: Optional[str] = None, seat: int = 0) -> bool:
+        """Kênh (None = mọi kênh) đã đủ mẫu: SMA đủ cửa sổ, EMA / One-Euro có ít nhất 1 mẫu"""
+        count = self._count[seat] if channel is None else self._count[seat, self.index[channel]]
+        needed = self.window_size if self.method == 'sma' else 1
+        return bool(np.all(count >= needed))
+
+    def get_filter(self, channel: str, seat: int = 0) -> Optional['ChannelFilter']:
+        """1 kênh với giao diện của MovingAverageFilter (update / get_current_value / ...)"""
+        if channel not in self.index:
+            return None
+        return ChannelFilter(self, channel, seat)
+
+
+class ChannelFilter:
+    """View 1 kênh của MultiChannelFilter - trạng thái nằm trong mảng của bộ lọc cha"""
+
+    def __init__(self, parent: MultiChannelFilter, channel: str, seat: int = 0):
+        self.parent = parent
+        self.channel = channel
+        self.seat = seat
+
+    def update(self, value: float, timestamp: Optional[float] = None) -> float:
+        return self.parent.update({self.channel: value}, self.seat, timestamp)[self.channel]
+
+    def get_current_value(self) -> Optional[float]:
+        return self.parent.get_value(self.channel, self.seat)
+
+    def is_ready(self) -> bool:
+        return self.parent.is_ready(self.channel, self.seat)
+
+    def reset(self):
+        self.parent.reset(self.seat, self.channel)
@@ -1,5 +1,7 @@
 import math 
-from typing import Tuple
+from typing import Tuple, Optional
+
+from ai_models.duration_state import DurationState
 
 
 class FaceMeshLandmarks:
@@ -66,19 +68,19 @@ class PostureAnalyzer:
     
     def __init__(self, 
                  head_tilt_threshold: float = 12.0,
-                 posture_frames: int = 20,
+                 posture_seconds: float = 0.67,
                  neck_threshold: float = 50.0):
         """
         Args:
             head_tilt_threshold: Góc cúi đầu tối đa (độ)
-            posture_frames: Frames liên tục xấu tư thế để cảnh báo
+            posture_seconds: Số giây xấu tư thế liên tục để cảnh báo (~20 frame ở 30 FPS)
             neck_threshold: Điểm neck posture tối thiểu (0-100)
         """
         self.head_tilt_threshold = head_tilt_threshold
-        self.posture_frames = posture_frames
         self.neck_threshold = neck_threshold
         
-        self.bad_posture_counter = 0
+        # Hồi phục nhanh gấp đôi khi tư thế tốt
+        self.bad_posture = DurationState(posture_seconds, recovery=2.0)
         self.is_bad_posture = False
         
         # Lưu metrics gần nhất
@@ -88,9 +90,9 @@ class PostureAnalyzer:
 
     @staticmethod
     def calculate_angle(p1, p2, p3) -> float:
-        """Tính góc giữa 3 điểm"""
-        v1 = [p2.x - p1.x, p2.y - p1.y]
-        v2 = [p3.x - p2.x, p3.y - p2.y]
+        """Tính góc giữa 3 điểm (x, y, ...)"""
+        v1 = [p2[0] - p1[0], p2[1] - p1[1]]
+        v2 = [p3[0] - p2[0], p3[1] - p2[1]]
         
         dot = v1[0]*v2[0] + v1[1]*v2[1]
         mag1 = math.sqrt(v1[0]**2 + v1[1]**2)
@@ -103,25 +105,26 @@ class PostureAnalyzer:
         return math.degrees(math.acos(cos_angle))
 
     def calculate_head_tilt(self, landmarks) -> float:
-        """Tính góc nghiêng đầu từ Pose landmarks"""
-        nose = landmarks[PoseLandmark.NOSE]
-        left_shoulder = landmarks[PoseLandmark.LEFT_SHOULDER]
-        right_shoulder = landmarks[PoseLandmark.RIGHT_SHOULDER]
+        """Tính góc nghiêng đầu từ Pose landmarks (mảng (33, 3))"""
+        nose_y, left_shoulder_y, right_shoulder_y = landmarks[[
+            PoseLandmark.NOSE, PoseLandmark.LEFT_SHOULDER, PoseLandmark.RIGHT_SHOULDER
+        ], 1].tolist()
         
-        mid_shoulder_y = (left_shoulder.y + right_shoulder.y) / 2
-        vertical_diff = abs(nose.y - mid_shoulder_y)
+        mid_shoulder_y = (left_shoulder_y + right_shoulder_y) / 2
+        vertical_diff = abs(nose_y - mid_shoulder_y)
         
-        if nose.y > mid_shoulder_y:
+        if nose_y > mid_shoulder_y:
             return vertical_diff * 100
         return 0
 
     def calculate_shoulder_angle(self, landmarks) -> float:
         """Tính góc nghiêng vai"""
-        left_shoulder = landmarks[PoseLandmark.LEFT_SHOULDER]
-        right_shoulder = landmarks[PoseLandmark.RIGHT_SHOULDER]
+        (left_x, left_y), (right_x, right_y) = landmarks[[
+            PoseLandmark.LEFT_SHOULDER, PoseLandmark.RIGHT_SHOULDER
+        ], :2].tolist()
         
-        dx = right_shoulder.x - left_shoulder.x
-        dy = right_shoulder.y - left_shoulder.y
+        dx = right_x - left_x
+        dy = right_y - left_y
         
         if dx == 0:
             return 0.0
@@ -138,17 +141,17 @@ class PostureAnalyzer:
             - 50 = Cúi nhẹ
             - 0 = Cúi nhiều
         """
-        nose = landmarks[PoseLandmark.NOSE]
-        left_shoulder = landmarks[PoseLandmark.LEFT_SHOULDER]
-        right_shoulder = landmarks[PoseLandmark.RIGHT_SHOULDER]
+        nose_y, left_shoulder_y, right_shoulder_y = landmarks[[
+            PoseLandmark.NOSE, PoseLandmark.LEFT_SHOULDER, PoseLandmark.RIGHT_SHOULDER
+        ], 1].tolist()
         
         # Trung điểm vai
-        mid_shoulder_y = (left_shoulder.y + right_shoulder.y) / 2
+        mid_shoulder_y = (left_shoulder_y + right_shoulder_y) / 2
         
         # Khoảng cách từ mũi đến vai (theo trục Y)
         # Y trong MediaPipe: 0 = trên, 1 = dưới
-        # nose.y < mid_shoulder_y = đầu cao hơn vai (tốt)
-        vertical_distance = mid_shoulder_y - nose.y
+        # nose_y < mid_shoulder_y = đầu cao hơn vai (tốt)
+        vertical_distance = mid_shoulder_y - nose_y
         
         # Convert sang điểm (calibrated thresholds)
         if vertical_distance > 0.20:
@@ -176,13 +179,13 @@ class PostureAnalyzer:
         if face_landmarks is None:
             return 0.0
             
-        forehead = face_landmarks.landmark[FaceMeshLandmarks.FOREHEAD]
-        nose = face_landmarks.landmark[FaceMeshLandmarks.NOSE_TIP]
-        chin = face_landmarks.landmark[FaceMeshLandmarks.CHIN]
+        forehead, nose, chin = face_landmarks.points[[
+            FaceMeshLandmarks.FOREHEAD, FaceMeshLandmarks.NOSE_TIP, FaceMeshLandmarks.CHIN
+        ], :2].tolist()
         
         # Khoảng cách trán-mũi vs mũi-cằm
-        upper = math.sqrt((forehead.x - nose.x)**2 + (forehead.y - nose.y)**2)
-        lower = math.sqrt((nose.x - chin.x)**2 + (nose.y - chin.y)**2)
+        upper = math.dist(forehead, nose)
+        lower = math.dist(nose, chin)
         
         if lower == 0:
             return 0.0
@@ -206,11 +209,12 @@ class PostureAnalyzer:
         if face_landmarks is None:
             return 0.0
             
-        left_eye = face_landmarks.landmark[FaceMeshLandmarks.LEFT_EYE_OUTER]
-        right_eye = face_landmarks.landmark[FaceMeshLandmarks.RIGHT_EYE_OUTER]
+        (left_x, left_y), (right_x, right_y) = face_landmarks.points[[
+            FaceMeshLandmarks.LEFT_EYE_OUTER, FaceMeshLandmarks.RIGHT_EYE_OUTER
+        ], :2].tolist()
         
-        dx = right_eye.x - left_eye.x
-        dy = right_eye.y - left_eye.y
+        dx = right_x - left_x
+        dy = right_y - left_y
         
         # Góc so với đường ngang
         roll_angle = math.degrees(math.atan2(dy, dx))
@@ -228,13 +232,13 @@ class PostureAnalyzer:
         if face_landmarks is None:
             return 0.0
             
-        left_cheek = face_landmarks.landmark[FaceMeshLandmarks.LEFT_CHEEK]
-        right_cheek = face_landmarks.landmark[FaceMeshLandmarks.RIGHT_CHEEK]
-        nose = face_landmarks.landmark[FaceMeshLandmarks.NOSE_TIP]
+        left_cheek_x, right_cheek_x, nose_x = face_landmarks.points[[
+            FaceMeshLandmarks.LEFT_CHEEK, FaceMeshLandmarks.RIGHT_CHEEK, FaceMeshLandmarks.NOSE_TIP
+        ], 0].tolist()
         
         # Khoảng cách từ mũi đến má trái vs má phải
-        dist_left = abs(nose.x - left_cheek.x)
-        dist_right = abs(nose.x - right_cheek.x)
+        dist_left = abs(nose_x - left_cheek_x)
+        dist_right = abs(nose_x - right_cheek_x)
         
         total = dist_left + dist_right
         if total == 0:
@@ -309,12 +313,16 @@ class PostureAnalyzer:
         total = neck_points + head_tilt_points + pitch_points + shoulder_points + roll_points
         return min(100.0, max(0.0, total))
 
-    def process(self, pose_landmarks, face_landmarks=None) -> Tuple[float, float, float, bool]:
+    def process(self, pose_landmarks, face_landmarks=None,
+                head_angles: Optional[Tuple[float, float, float]] = None,
+                timestamp: Optional[float] = None) -> Tuple[float, float, float, bool]:
         """Xử lý và trả về kết quả phân tích tư thế
         
         Args:
-            pose_landmarks: MediaPipe Pose landmarks
-            face_landmarks: MediaPipe Face Mesh landmarks (optional, để tính head pitch/roll)
+            pose_landmarks: Pose landmarks (LandmarkArray)
+            face_landmarks: Face Mesh landmarks (LandmarkArray, optional, để tính head pitch/roll)
+            head_angles: (pitch, roll, yaw) đã tính sẵn bởi feature_extractor (optional)
+            timestamp: capture_ts của frame (giây); None = bây giờ
         
         Returns:
             (head_tilt, shoulder_angle, posture_score, is_bad_posture)
@@ -322,7 +330,7 @@ class PostureAnalyzer:
         if pose_landmarks is None:
             return 0.0, 0.0, 100.0, False
             
-        landmarks = pose_landmarks.landmark
+        landmarks = pose_landmarks.points
         
         # 1. Từ Pose landmarks
         head_tilt = self.calculate_head_tilt(landmarks)
@@ -332,19 +340,20 @@ class PostureAnalyzer:
         # 2. Từ Face Mesh (nếu có)
         head_pitch = 0.0
         head_roll = 0.0
+        head_yaw = 0.0
         if face_landmarks is not None:
-            head_pitch = self.calculate_head_pitch(face_landmarks)
-            head_roll = self.calculate_head_roll(face_landmarks)
+            if head_angles is not None:
+                head_pitch, head_roll, head_yaw = head_angles
+            else:
+                head_pitch = self.calculate_head_pitch(face_landmarks)
+                head_roll = self.calculate_head_roll(face_landmarks)
+                head_yaw = self.calculate_head_yaw(face_landmarks)
         
         # Lưu lại
         self.last_neck_score = neck_score
         self.last_head_pitch = head_pitch
         self.last_head_roll = head_roll
         
-        # 2.5. Tính head_yaw (nếu có face landmarks)
-        head_yaw = 0.0
-        if face_landmarks is not None:
-            head_yaw = self.calculate_head_yaw(face_landmarks)
         self.last_head_yaw = head_yaw
         
         # 3. Tính tổng điểm
@@ -359,15 +368,8 @@ class PostureAnalyzer:
                  abs(head_pitch) > 25 or
                  abs(head_roll) > 15)
         
-        if is_bad:
-            self.bad_posture_counter += 1
-        else:
-            # Hồi phục nhanh khi tư thế tốt
-            self.bad_posture_counter = max(0, self.bad_posture_counter - 2)
-            self.is_bad_posture = False
-            
-        if self.bad_posture_counter >= self.posture_frames:
-            self.is_bad_posture = True
+        # Frame tư thế tốt tắt cảnh báo ngay, thời gian đã giữ thì giảm dần
+        self.is_bad_posture = self.bad_posture.update(is_bad, timestamp) and is_bad
             
         return head_tilt, shoulder_angle, posture_score, self.is_bad_posture
 
@@ -376,11 +378,11 @@ class PostureAnalyzer:
         
         Returns: Góc pitch (độ) - Dương = cúi, Âm = ngẩng
         """
-        forehead = face_landmarks.landmark[FaceMeshLandmarks.FOREHEAD]
-        chin = face_landmarks.landmark[FaceMeshLandmarks.CHIN]
-        nose = face_landmarks.landmark[FaceMeshLandmarks.NOSE_TIP]
-        face_height = chin.y - forehead.y
-        depth_diff = chin.z - forehead.z
+        (_, forehead_y, forehead_z), (_, chin_y, chin_z) = face_landmarks.points[[
+            FaceMeshLandmarks.FOREHEAD, FaceMeshLandmarks.CHIN
+        ]].tolist()
+        face_height = chin_y - forehead_y
+        depth_diff = chin_z - forehead_z
         
         if face_height == 0:
             return 0.0
@@ -399,13 +401,11 @@ class PostureAnalyzer:
         if face_landmarks is None:
             return 0.15
             
-        left_eye = face_landmarks.landmark[FaceMeshLandmarks.LEFT_EYE_OUTER]
-        right_eye = face_landmarks.landmark[FaceMeshLandmarks.RIGHT_EYE_OUTER]
+        left_eye, right_eye = face_landmarks.points[[
+            FaceMeshLandmarks.LEFT_EYE_OUTER, FaceMeshLandmarks.RIGHT_EYE_OUTER
+        ], :2].tolist()
         
-        return math.sqrt(
-            (left_eye.x - right_eye.x) ** 2 +
-            (left_eye.y - right_eye.y) ** 2
-        )
+        return math.dist(left_eye, right_eye)
 
     def get_posture_details(self) -> dict:
         """Trả về chi tiết các metrics tư thế"""
@@ -415,11 +415,11 @@ class PostureAnalyzer:
             'head_roll': round(self.last_head_roll, 1),
             'head_yaw': round(getattr(self, 'last_head_yaw', 0.0), 1),
             'is_bad_posture': self.is_bad_posture,
-            'bad_counter': self.bad_posture_counter
+            'bad_seconds': round(self.bad_posture.held, 2)
         }
 
     def reset(self):
-        self.bad_posture_counter = 0
+        self.bad_posture.reset()
         self.is_bad_posture = False
         self.last_neck_score = 75.0
         self.last_head_pitch = 0.
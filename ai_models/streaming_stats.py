@@ -0,0 +1,237 @@
+"""
+Streaming Stats - Thống kê trượt (sum, mean, variance, min, max) O(1) mỗi lần cập nhật
+- Giá trị nằm trong ring buffer (deque); vào / ra cửa sổ cập nhật tổng và phương sai
+  theo Welford (cộng / trừ 1 mẫu) → không cộng lại cả cửa sổ mỗi frame
+- Min / max: deque đơn điệu (mỗi giá trị vào / ra tối đa 1 lần → O(1) khấu hao)
+- CountWindowStats: N mẫu gần nhất; TimeWindowStats: các mẫu trong `seconds` giây gần nhất
+  (timestamp = capture_ts của frame, cùng đồng hồ với DurationState)
+- RunningStats: toàn bộ luồng (Welford, không cửa sổ); Reservoir: mẫu cố định cho median / MAD
+"""
+import math
+import random
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+import numpy as np
+
+
+class WindowStats:
+    """Phần chung: thống kê trên các giá trị đang nằm trong cửa sổ"""
+
+    def __init__(self):
+        self._values: Deque[float] = deque()
+        self._seq = 0            # Số thứ tự của mẫu kế tiếp (deque min / max lưu theo số này)
+        self._mins: Deque[Tuple[int, float]] = deque()   # Giá trị tăng dần
+        self._maxs: Deque[Tuple[int, float]] = deque()   # Giá trị giảm dần
+        self._mean = 0.0
+        self._m2 = 0.0           # Tổng bình phương độ lệch (Welford)
+        self._sum = 0.0
+
+    def reset(self):
+        self._values.clear()
+        self._mins.clear()
+        self._maxs.clear()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._sum = 0.0
+
+    def _push(self, value: float):
+        value = float(value)
+        seq = self._seq
+        self._seq += 1
+        self._values.append(value)
+        self._sum += value
+        n = len(self._values)
+        delta = value - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (value - self._mean)
+
+        mins = self._mins
+        while mins and mins[-1][1] >= value:
+            mins.pop()
+        mins.append((seq, value))
+        maxs = self._maxs
+        while maxs and maxs[-1][1] <= value:
+            maxs.pop()
+        maxs.append((seq, value))
+
+    def _pop_oldest(self):
+        value = self._values.popleft()
+        oldest = self._seq - len(self._values) - 1   # Số thứ tự của mẫu vừa bỏ
+        n = len(self._values)
+        if n == 0:
+            self._mean = self._m2 = self._sum = 0.0
+        else:
+            self._sum -= value
+            delta = value - self._mean
+            self._mean -= delta / n
+            self._m2 = max(0.0, self._m2 - delta * (value - self._mean))
+        if self._mins and self._mins[0][0] <= oldest:
+            self._mins.popleft()
+        if self._maxs and self._maxs[0][0] <= oldest:
+            self._maxs.popleft()
+
+    @property
+    def count(self) -> int:
+        return len(self._values)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._mean if self._values else None
+
+    @property
+    def variance(self) -> float:
+        """Phương sai tổng thể (chia n) của các mẫu trong cửa sổ"""
+        n = len(self._values)
+        return self._m2 / n if n else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def min(self) -> Optional[float]:
+        return self._mins[0][1] if self._mins else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return self._maxs[0][1] if self._maxs else None
+
+    @property
+    def range(self) -> float:
+        """max - min (0 khi chưa có mẫu)"""
+        return self._maxs[0][1] - self._mins[0][1] if self._values else 0.0
+
+
+class CountWindowStats(WindowStats):
+    """Thống kê trên `size` mẫu gần nhất"""
+
+    def __init__(self, size: int):
+        super().__init__()
+        self.size = size
+
+    @property
+    def full(self) -> bool:
+        return len(self._values) >= self.size
+
+    def push(self, value: float):
+        self._push(value)
+        if len(self._values) > self.size:
+            self._pop_oldest()
+
+
+class TimeWindowStats(WindowStats):
+    """Thống kê trên các mẫu trong `seconds` giây gần nhất"""
+
+    def __init__(self, seconds: float):
+        super().__init__()
+        self.seconds = seconds
+        self._timestamps: Deque[float] = deque()
+
+    def reset(self):
+        super().reset()
+        self._timestamps.clear()
+
+    @property
+    def span(self) -> float:
+        """Khoảng thời gian giữa mẫu cũ nhất và mới nhất trong cửa sổ (giây)"""
+        return self._timestamps[-1] - self._timestamps[0] if self._timestamps else 0.0
+
+    def push(self, value: float, timestamp: Optional[float] = None):
+        """timestamp: giây (capture_ts của frame); None = time.monotonic()"""
+        now = time.monotonic() if timestamp is None else timestamp
+        self._push(value)
+        self._timestamps.append(now)
+        self.expire(now)
+
+    def expire(self, now: float):
+        """Bỏ các mẫu cũ hơn `seconds` giây so với now"""
+        timestamps = self._timestamps
+        while timestamps and now - timestamps[0] > self.seconds:
+            timestamps.popleft()
+            self._pop_oldest()
+
+
+class RunningStats:
+    """Mean / variance / min / max của mọi mẫu đã thấy (Welford) - bộ nhớ O(1)
+
+    Ổn định số học hơn cách tính tổng / tổng bình phương, không cần giữ danh sách mẫu.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def reset(self):
+        self.__init__()
+
+    def push(self, value: float):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def variance(self) -> float:
+        """Phương sai tổng thể (chia n)"""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class Reservoir:
+    """Mẫu ngẫu nhiên đều kích thước cố định của 1 luồng vô hạn (reservoir sampling)
+
+    Mỗi mẫu là 1 hàng `width` giá trị (nhiều chỉ số của cùng 1 frame giữ chung hàng).
+    Dùng cho ước lượng robust (median / MAD) mà không giữ toàn bộ luồng.
+    """
+
+    def __init__(self, size: int, width: int = 1, seed: Optional[int] = None):
+        self.size = size
+        self.seen = 0
+        self._rows = np.empty((size, width))
+        self._rng = random.Random(seed)
+
+    def reset(self):
+        self.seen = 0
+
+    def push(self, row):
+        if self.seen < self.size:
+            self._rows[self.seen] = row
+        else:
+            # Mẫu thứ k được giữ với xác suất size / k
+            slot = self._rng.randrange(self.seen + 1)
+            if slot < self.size:
+                self._rows[slot] = row
+        self.seen += 1
+
+    @property
+    def samples(self) -> np.ndarray:
+        return self._rows[:min(self.seen, self.size)]
+
+    def median(self) -> np.ndarray:
+        """Median từng cột"""
+        samples = self.samples
+        return np.median(samples, axis=0) if len(samples) else np.zeros(self._rows.shape[1])
+
+    def mad(self) -> np.ndarray:
+        """Median absolute deviation từng cột (chưa nhân 1.4826)"""
+        samples = self.samples
+        if not len(samples):
+            return np.zeros(self._rows.shape[1])
+        return np.median(np.abs(samples - np.median(samples, axis=0)), axis=0)
@@ -7,12 +7,14 @@ from dataclasses import dataclass, asdict, field
 
 @dataclass
 class CalibrationData:
-    """Dữ liệu calibration cho 1 chỉ số (mean, std, min, max)"""
+    """Dữ liệu calibration cho 1 chỉ số (mean, std, min, max, median, MAD)"""
     mean: float = 0.0
     std: float = 0.0
     min_val: float = 0.0
     max_val: float = 0.0
     sample_count: int = 0
+    median: float = 0.0   # Ước lượng robust từ reservoir (0 nếu calibrate không robust)
+    mad: float = 0.0      # Median absolute deviation
 
 
 @dataclass
@@ -20,4 +20,57 @@ CREATE TABLE IF NOT EXISTS study_sessions (
 CREATE_INDEXES = [
     "CREATE INDEX IF NOT EXISTS idx_timestamp ON study_sessions(timestamp);",
     "CREATE INDEX IF NOT EXISTS idx_focus_score ON study_sessions(focus_score);",
-]
\ No newline at end of file
+]
+# ============ DATABASE PATH ============
+DB_PATH = "data/study_behavior.db"
+
+# ============ ASYNC WRITER ============
+# Main loop chỉ đẩy kết quả vào queue, thread nền gom thành batch rồi commit 1 lần
+ENABLE_DB_LOGGING = True
+DB_WRITER_QUEUE_SIZE = 512         # Queue có giới hạn (~17s dữ liệu ở 30 results/s)
+DB_WRITER_BATCH_SIZE = 64          # Flush khi đủ N records...
+DB_WRITER_FLUSH_INTERVAL = 1.0     # ...hoặc sau N giây (cái nào đến trước)
+
+# Back-pressure khi disk chậm và queue đầy dần:
+# - 'drop_newest': bỏ record mới khi queue đầy
+# - 'drop_oldest': bỏ record cũ nhất để nhận record mới
+# - 'sample': khi queue vượt high-water mark chỉ nhận 1/N record, đầy thì bỏ record mới
+DB_WRITER_OVERFLOW_POLICY = 'sample'
+DB_WRITER_SAMPLE_EVERY = 3
+DB_WRITER_SAMPLE_HIGH_WATER = 0.5  # Tỷ lệ queue đầy để bắt đầu sampling
+
+# ============ FOCUS LOGS ROLLUP ============
+# Gom raw frames thành bảng focus_logs_1s / focus_logs_1m ngay khi ghi
+ENABLE_ROLLUPS = True
+ROLLUP_BLINK_THRESHOLD = 0.21      # EAR dưới ngưỡng = mắt nhắm (đếm blink)
+
+# Giữ raw frames (study_sessions) trong N giờ, None = giữ mãi
+DB_RAW_RETENTION_HOURS = None
+DB_RETENTION_CHECK_INTERVAL = 600  # Giây giữa 2 lần dọn dữ liệu cũ
+
+# ============ SQLITE TUNING ============
+# WAL: reader (dashboard) và writer (capture loop) không block nhau
+# synchronous=NORMAL: an toàn với WAL, fsync ít hơn nhiều so với FULL
+SQLITE_TUNING_ENABLED = True
+SQLITE_WRITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -16000,           # KB (âm = KiB) ~16 MB page cache
+    'busy_timeout': 5000,           # ms
+    'wal_autocheckpoint': 1000,     # pages
+}
+SQLITE_READ_PRAGMAS = {
+    'mmap_size': 268435456,         # 256 MB memory-mapped reads
+    'cache_size': -16000,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+    'query_only': 'ON',             # Read connection không bao giờ ghi
+}
+# Số prepared statement sqlite3 cache trên mỗi connection (mặc định của Python: 128)
+SQLITE_CACHED_STATEMENTS = 128
+
+# ============ PARQUET EXPORT ============
+EXPORT_DIR = "data/export"
+EXPORT_CHUNK_ROWS = 50000              # Số dòng đọc / ghi mỗi lần (giới hạn bộ nhớ)
+EXPORT_ROLLUP_SETTLE_SECONDS = 120     # Chỉ xuất bucket rollup cũ hơn N giây (bucket đang ghi dở chờ lần sau)
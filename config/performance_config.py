@@ -23,11 +23,39 @@ PROCESSING_WIDTH = 256
 PROCESSING_HEIGHT = 192
 PROCESSING_SCALE = 0.5  # Scale factor từ camera resolution
 
+# Face ROI tracking: Face Landmarker chạy trên vùng cắt quanh mặt (từ frame gốc)
+# thay vì cả frame thu nhỏ → landmarks chính xác hơn, ít pixel hơn; mất mặt → cả frame
+FACE_ROI_TRACKING = False
+FACE_ROI_SIZE = 192          # Cạnh ảnh ROI đưa vào landmarker (pixel)
+FACE_ROI_PADDING = 0.35      # Nới bbox mặt mỗi bên (tỉ lệ cạnh mặt)
+FACE_ROI_SMOOTHING = 0.6     # EMA vị trí ROI (0 = bám ngay, gần 1 = ổn định hơn)
+
 # Frame skipping để tăng FPS - TĂNG MẠNH
 FACE_PROCESS_INTERVAL = 3
 POSE_PROCESS_INTERVAL = 6
 BLENDSHAPE_PROCESS_INTERVAL = 3  # TĂNG: 2→3 frames
 
+# Motion gate (core/motion_gate.py): thay modulo FACE_PROCESS_INTERVAL bằng phát hiện chuyển động
+# Ngồi yên → dùng lại landmarks trong cache; cử động → detect ngay frame đó
+# Pose vẫn theo POSE_PROCESS_INTERVAL nhưng bỏ qua khi cả frame đứng yên
+MOTION_GATING = False
+MOTION_THRESHOLD = 4.0          # Chênh lệch xám trung bình (0-255) coi là có cử động
+MOTION_MAX_STALE_FRAMES = 15    # Cache không cũ quá N frame dù ngồi yên
+MOTION_THUMBNAIL_SIZE = 32      # Cạnh thumbnail xám để so sánh (pixel)
+
+# Face + pose cùng tick chạy song song trên 2 worker thread (core/parallel_landmarks.py)
+# Chỉ có lợi khi CPU >= 2 nhân; bên nào quá hạn chờ thì tick đó dùng cache
+PARALLEL_LANDMARKS = False
+PARALLEL_DEADLINE_MS = 60       # Chờ tối đa cho cả 2 landmarker (ms)
+
+# Running mode của landmarker (core/live_stream.py)
+# 'video': AI thread chờ từng lần detect, timestamp tự đếm +33 ms / frame
+# 'live_stream': detect_async + callback, timestamp = thời điểm capture thật; AI thread
+#   không chờ inference (face ROI tracking / chạy song song không dùng ở mode này)
+AI_RUNNING_MODE = 'video'
+LIVE_MAX_IN_FLIGHT = 2          # Số frame tối đa đang chờ kết quả async
+LIVE_DEADLINE_MS = 500          # Chờ callback tối đa; quá hạn → coi như MediaPipe bỏ frame
+
 # Advanced features interval
 ADVANCED_STATE_INTERVAL = 20
 # EMOTION_UPDATE_INTERVAL = 45  # ĐÃ TẮT: Không dùng emotion detection nữa
@@ -62,6 +90,11 @@ IMPORTANT_BLENDSHAPES = [
 # ============ QUEUE SETTINGS ============
 FRAME_QUEUE_SIZE = 2
 RESULT_QUEUE_SIZE = 2
+# Frame pool (core/frame_pool.py): camera đọc vào buffer dùng lại, không cấp phát mỗi frame
+# Cần >= frame đang lưu hành: camera + latest (display) + queue AI + AI đang xử lý
+# + result mới nhất + main đang copy → FRAME_QUEUE_SIZE + 5, dư 1
+ENABLE_FRAME_POOL = True
+FRAME_POOL_SIZE = 8
 
 # ============ DISPLAY SETTINGS ============
 DISPLAY_WIDTH = 640   # Resolution hiển thị (có thể khác processing)
@@ -76,6 +109,16 @@ ENABLE_SMART_RESIZE = True    # Resize thông minh (1 lần thay vì nhiều l
 # Performance monitoring
 SHOW_FPS = True
 SHOW_PERFORMANCE_METRICS = False  # Chi tiết timing mỗi component
+# Tracing (core/tracing.py) - chỉ ghi khi SHOW_PERFORMANCE_METRICS bật
+TRACE_BUFFER_SIZE = 8192           # Số span giữ lại mỗi thread (ring buffer)
+TRACE_DIR = "data/traces"          # Phím 't' ghi Chrome trace JSON vào đây
+TRACE_SUMMARY_SECONDS = 10         # In p50/p95/p99 của N giây gần nhất (0 = không in)
+# Metrics endpoint (core/metrics.py) - Prometheus scrape http://HOST:PORT/metrics
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"         # "0.0.0.0" để dashboard của lớp scrape từ máy khác
+METRICS_PORT = 9108
+METRICS_NAMESPACE = "sls"
+METRICS_SEAT_ID = None             # Label seat; None = hostname
 
 # ============ FEATURE FLAGS ============
 # Tắt features không cần thiết để tăng FPS
@@ -86,7 +129,72 @@ ENABLE_ADVANCED_STATES = True
 ENABLE_EMOTION_DETECTION = False  # ĐÃ TẮT - Không phân tích cảm xúc
 ENABLE_BLENDSHAPES = True  # Vẫn bật để dùng cho các tính năng khác (nếu cần)
 
+# ============ OFFLINE / BATCH ANALYSIS ============
+# Chấm điểm lại video đã ghi (utils/batch_analyze.py)
+OFFLINE_NUM_WORKERS = 0        # 0 = số CPU core
+OFFLINE_CHUNK_SECONDS = 10     # Độ dài mỗi đoạn video giao cho 1 worker
+
+# ============ ADAPTIVE QUALITY ============
+# AI thread tự giảm / tăng chất lượng để giữ AI FPS mục tiêu trên mọi máy
+ADAPTIVE_QUALITY_ENABLED = True
+AI_TARGET_FPS = 15
+QUALITY_WINDOW_SECONDS = 1.0          # Đo FPS / latency theo cửa sổ 1 giây
+# Hysteresis: quá tải khi AI bận >= 90% thời gian mà vẫn dưới target,
+# còn dư khi chỉ bận <= 55% → 2 ngưỡng cách xa nhau để không dao động
+QUALITY_DOWNGRADE_UTILIZATION = 0.90
+QUALITY_UPGRADE_UTILIZATION = 0.55
+QUALITY_DOWNGRADE_WINDOWS = 2         # Số cửa sổ quá tải liên tiếp trước khi giảm
+QUALITY_UPGRADE_WINDOWS = 5           # Số cửa sổ dư liên tiếp trước khi tăng
+QUALITY_COOLDOWN_SECONDS = 3.0        # Không đổi level trong N giây sau lần đổi trước
+QUALITY_MAX_UPGRADE_BACKOFF = 8       # Tăng lên rồi bị giảm ngay → chờ lâu hơn (x2, tối đa x8)
+QUALITY_START_LEVEL = 0
+
+# Mỗi level = các giá trị ghi đè lên config ở trên (level 0 = giữ nguyên config)
+# Chỉ ghi đè khi nhẹ hơn config hiện tại: interval lấy max, kích thước lấy min, cờ lấy AND
+# Level càng cao càng nhẹ
+QUALITY_LEVELS = [
+    {},
+    {
+        'ENABLE_BLENDSHAPES': False,
+    },
+    {
+        'ENABLE_BLENDSHAPES': False,
+        'POSE_PROCESS_INTERVAL': 8,
+    },
+    {
+        'ENABLE_BLENDSHAPES': False,
+        'POSE_PROCESS_INTERVAL': 8,
+        'FACE_PROCESS_INTERVAL': 4,
+        'PROCESSING_WIDTH': 224,
+        'PROCESSING_HEIGHT': 168,
+    },
+    {
+        'ENABLE_BLENDSHAPES': False,
+        'ENABLE_POSE_DETECTION': False,
+        'FACE_PROCESS_INTERVAL': 4,
+        'PROCESSING_WIDTH': 224,
+        'PROCESSING_HEIGHT': 168,
+    },
+    {
+        'ENABLE_BLENDSHAPES': False,
+        'ENABLE_POSE_DETECTION': False,
+        'FACE_PROCESS_INTERVAL': 5,
+        'PROCESSING_WIDTH': 192,
+        'PROCESSING_HEIGHT': 144,
+    },
+]
+
+# ============ RUNTIME CONFIG ============
+# Đổi preset khi đang chạy: sửa file JSON này (utils/performance_preset.py live ...)
+# hoặc nhấn 'p' trong cửa sổ chính
+RUNTIME_CONFIG_FILE = "config/runtime_config.json"
+RUNTIME_CONFIG_WATCH = True
+RUNTIME_CONFIG_POLL_SECONDS = 1.0
+
 # ============ PRESETS ============
+PRESET_NAMES = ('high_performance', 'balanced', 'high_accuracy', 'web_mvp', 'web_full')
+
+
 def get_preset(preset_name: str) -> dict:
     """Lấy preset configuration
     
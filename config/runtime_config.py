@@ -0,0 +1,224 @@
+"""
+Runtime Config - Cấu hình performance trong bộ nhớ, đổi được khi đang chạy
+- Snapshot = performance_config + get_preset(ACTIVE_PRESET) (+ override), chỉ đọc
+- Đổi preset / giá trị → tạo snapshot mới và swap nguyên tử
+  (không sửa performance_config.py, không restart, không mất tracking state)
+- Camera thread, AI thread, main loop lấy config.current mỗi vòng lặp
+- Nguồn thay đổi: phím 'p' (preset tiếp theo), file JSON được watch, hoặc API
+  (apply_preset / update)
+
+File JSON (RUNTIME_CONFIG_FILE):
+    {"preset": "web_mvp", "overrides": {"FACE_PROCESS_INTERVAL": 2}}
+"""
+import json
+import os
+import threading
+import types
+from typing import Callable, Dict, List, Optional, Set
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import performance_config as perf
+
+# Option lúc tạo landmarker → đổi thì phải tạo lại model (chỉ khi thực sự đổi)
+FACE_MODEL_KEYS = (
+    'ENABLE_BLENDSHAPES', 'FACE_NUM_FACES',
+    'FACE_DETECTION_CONFIDENCE', 'FACE_PRESENCE_CONFIDENCE', 'FACE_TRACKING_CONFIDENCE',
+)
+POSE_MODEL_KEYS = (
+    'POSE_DETECTION_CONFIDENCE', 'POSE_PRESENCE_CONFIDENCE', 'POSE_TRACKING_CONFIDENCE',
+)
+# Thuộc tính camera → camera thread gọi lại cap.set()
+CAMERA_KEYS = (
+    'CAMERA_WIDTH', 'CAMERA_HEIGHT', 'CAMERA_FPS',
+    'CAMERA_MANUAL_EXPOSURE', 'CAMERA_EXPOSURE_VALUE', 'CAMERA_BRIGHTNESS', 'CAMERA_GAIN',
+)
+# Chỉ có hiệu lực lúc khởi động (kích thước queue / frame pool, running mode của landmarker đã tạo)
+STARTUP_ONLY_KEYS = ('FRAME_QUEUE_SIZE', 'RESULT_QUEUE_SIZE', 'ENABLE_FRAME_POOL', 'FRAME_POOL_SIZE',
+                     'AI_RUNNING_MODE', 'LIVE_MAX_IN_FLIGHT', 'LIVE_DEADLINE_MS')
+
+
+def _base_values() -> Dict:
+    """Tất cả hằng số viết hoa trong performance_config"""
+    return {
+        name: value for name, value in vars(perf).items()
+        if name.isupper() and not isinstance(value, (types.ModuleType, types.FunctionType))
+    }
+
+
+class ConfigSnapshot:
+    """1 phiên bản cấu hình, chỉ đọc: snapshot.FACE_PROCESS_INTERVAL"""
+
+    __slots__ = ('_values', 'preset', 'overrides', 'version')
+
+    def __init__(self, values: Dict, preset: str, overrides: Dict, version: int):
+        self._values = types.MappingProxyType(dict(values))
+        self.preset = preset
+        self.overrides = types.MappingProxyType(dict(overrides))
+        self.version = version
+
+    def __getattr__(self, name: str):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def get(self, name: str, default=None):
+        return self._values.get(name, default)
+
+    def as_dict(self) -> Dict:
+        return dict(self._values)
+
+    def changed_keys(self, other: 'ConfigSnapshot') -> Set[str]:
+        """Các key có giá trị khác giữa 2 snapshot"""
+        keys = set(self._values) | set(other._values)
+        return {k for k in keys if self._values.get(k) != other._values.get(k)}
+
+
+class RuntimeConfig:
+    """Giữ snapshot hiện tại và swap nguyên tử khi có thay đổi
+
+    Đọc (current) không cần lock: thay 1 reference là nguyên tử trong CPython,
+    mỗi vòng lặp của thread đọc 1 snapshot nhất quán.
+    """
+
+    def __init__(self, preset: str = None, overrides: Dict = None):
+        self._lock = threading.Lock()
+        self._listeners: List[Callable] = []
+        self._watcher: Optional['ConfigFileWatcher'] = None
+        self._current = self._build(preset or perf.ACTIVE_PRESET, overrides or {}, 1)
+
+    @staticmethod
+    def _build(preset: str, overrides: Dict, version: int) -> ConfigSnapshot:
+        if preset not in perf.PRESET_NAMES:
+            raise ValueError(f"Preset '{preset}' không tồn tại, có: {', '.join(perf.PRESET_NAMES)}")
+        values = _base_values()
+        values.update(perf.get_preset(preset))
+        unknown = [k for k in overrides if k not in values]
+        if unknown:
+            raise ValueError(f"Không có config: {', '.join(unknown)}")
+        values.update(overrides)
+        return ConfigSnapshot(values, preset, overrides, version)
+
+    @property
+    def current(self) -> ConfigSnapshot:
+        return self._current
+
+    def subscribe(self, callback: Callable[[ConfigSnapshot, ConfigSnapshot, Set[str]], None]):
+        """callback(old, new, changed_keys) - gọi từ thread đã thực hiện thay đổi"""
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _swap(self, preset: str, overrides: Dict) -> ConfigSnapshot:
+        with self._lock:
+            old = self._current
+            new = self._build(preset, overrides, old.version + 1)
+            changed = new.changed_keys(old)
+            if not changed and new.preset == old.preset:
+                return old
+            self._current = new
+        for callback in list(self._listeners):
+            try:
+                callback(old, new, changed)
+            except Exception as e:
+                print(f"⚠️  Config listener lỗi: {e}")
+        return new
+
+    # ============ API ============
+
+    def apply_preset(self, preset: str, overrides: Dict = None) -> ConfigSnapshot:
+        """Chuyển sang preset khác (bỏ các override cũ)"""
+        return self._swap(preset, overrides or {})
+
+    def update(self, **values) -> ConfigSnapshot:
+        """Ghi đè 1 vài giá trị trên preset hiện tại"""
+        current = self._current
+        overrides = dict(current.overrides)
+        overrides.update(values)
+        return self._swap(current.preset, overrides)
+
+    def reset_overrides(self) -> ConfigSnapshot:
+        return self._swap(self._current.preset, {})
+
+    def next_preset(self) -> ConfigSnapshot:
+        """Preset kế tiếp trong PRESET_NAMES (phím 'p')"""
+        names = list(perf.PRESET_NAMES)
+        current = self._current.preset
+        index = (names.index(current) + 1) % len(names) if current in names else 0
+        return self.apply_preset(names[index])
+
+    def load_file(self, path: str) -> ConfigSnapshot:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return self.apply_preset(data.get('preset', self._current.preset),
+                                 data.get('overrides', {}))
+
+    # ============ FILE WATCH ============
+
+    def watch_file(self, path: str = None, interval: float = None):
+        """Theo dõi file JSON, áp dụng mỗi khi file thay đổi"""
+        if self._watcher is not None:
+            return
+        self._watcher = ConfigFileWatcher(
+            self, path or perf.RUNTIME_CONFIG_FILE,
+            interval or perf.RUNTIME_CONFIG_POLL_SECONDS
+        )
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+
+class ConfigFileWatcher(threading.Thread):
+    """Thread poll mtime của file config (không cần thư viện watch riêng)"""
+
+    def __init__(self, config: RuntimeConfig, path: str, interval: float = 1.0):
+        super().__init__()
+        self.daemon = True
+        self.config = config
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._last_mtime = None
+
+    def _check(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return  # Chưa có file
+        if mtime == self._last_mtime:
+            return
+        self._last_mtime = mtime
+        try:
+            snapshot = self.config.load_file(self.path)
+            print(f"🔄 Runtime config từ {self.path}: preset={snapshot.preset} "
+                  f"(v{snapshot.version})")
+        except (ValueError, OSError) as e:
+            print(f"⚠️  Bỏ qua {self.path}: {e}")
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._check()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_instance: Optional[RuntimeConfig] = None
+_instance_lock = threading.Lock()
+
+
+def get_runtime_config() -> RuntimeConfig:
+    """RuntimeConfig dùng chung cho cả process (tạo khi cần)"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = RuntimeConfig()
+    return _instance
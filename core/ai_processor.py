@@ -1,32 +1,54 @@
-import cv2 
 import threading
 import time
 from queue import Queue, Empty
-import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import performance_config as perf
+from config.runtime_config import (
+    RuntimeConfig, ConfigSnapshot, get_runtime_config, FACE_MODEL_KEYS, POSE_MODEL_KEYS
+)
+from core.quality_controller import AdaptiveQualityController, QualityEvent, lighter_setting
+from core.tracing import get_tracer
+from core.frame_pool import FrameEnvelope
+from core.preprocess import Preprocessor
+from core.face_roi import FaceRoiTracker
+from core.motion_gate import MotionGate
+from core.parallel_landmarks import ParallelLandmarks
+from core.live_stream import LiveStreamBackend
+from core.metrics import (
+    FRAMES_SKIPPED, FRAMES_DROPPED, RESULT_CACHE_HITS, DETECTOR_LATENCY, FRAME_AGE, PIPELINE_FPS,
+    QUALITY_LEVEL
+)
 from ai_models.drowsiness_detector import DrowsinessDetector
 from ai_models.posture_analyzer import PostureAnalyzer
 from ai_models.focus_calculator import FocusCalculator
+from ai_models.landmark_array import LandmarkArray
+from ai_models.feature_extractor import (
+    extract_face_features, FEATURE_EAR_LEFT, FEATURE_EAR_RIGHT,
+    FEATURE_HEAD_PITCH, FEATURE_HEAD_ROLL, FEATURE_HEAD_YAW, FEATURE_FACE_DISTANCE
+)
 
 
 class AIProcessorThread(threading.Thread):
     """Thread xử lý AI: Face Mesh + Pose detection"""
     
-    def __init__(self, frame_queue: Queue, result_queue: Queue):
+    def __init__(self, frame_queue: Queue, result_queue: Queue,
+                 runtime_config: RuntimeConfig = None):
         super().__init__()
         self.daemon = True
         self.frame_queue = frame_queue
         self.result_queue = result_queue
+        # Snapshot config dùng cho frame hiện tại (đổi giữa 2 frame khi có hot-swap)
+        self.runtime_config = runtime_config or get_runtime_config()
+        self.config: ConfigSnapshot = self.runtime_config.current
 
         self.running = False
         self.face_landmarker = None
+        self.roi_face_landmarker = None   # Riêng cho ROI: tracking state theo toạ độ vùng cắt
         self.pose_landmarker = None
 
         self.drowsiness_detector = None
@@ -48,53 +70,164 @@ class AIProcessorThread(threading.Thread):
         
         # Thread-safe latest result cho main thread
         self._latest_result = None
+        self._latest_frame_ref: FrameEnvelope = None  # Giữ buffer của result['frame']
         self._result_lock = threading.Lock()
         
         # Monotonic timestamp counter cho VIDEO mode (tránh lỗi tracking)
         self._timestamp_counter = 0
         self._timestamp_interval_ms = 33  # ~30fps interval
 
+        # Adaptive quality: level hiện tại ghi đè 1 số giá trị config
+        self.quality_controller = (AdaptiveQualityController(self.config.AI_TARGET_FPS)
+                                   if self.config.ADAPTIVE_QUALITY_ENABLED else None)
+        self._overrides: Dict = (self.quality_controller.overrides()
+                                 if self.quality_controller else {})
+        self._applied_level = self.quality_controller.level if self.quality_controller else 0
+        # Option đã dùng để tạo landmarker hiện tại (chỉ tạo lại khi thay đổi)
+        self._face_model_options = None
+        self._pose_model_options = None
+        self.stage_ms: Dict[str, float] = {}    # Thời gian từng stage của frame gần nhất
+        self.tracer = get_tracer()                # Span chi tiết (khi SHOW_PERFORMANCE_METRICS)
+        # Resize + đổi kênh vào buffer dùng lại (chỉ thread này dùng)
+        self.preprocessor = Preprocessor(self.tracer)
+        # Face ROI tracking: vùng cắt quanh mặt ở frame gốc (FACE_ROI_TRACKING)
+        self.roi_preprocessor = Preprocessor()
+        self.face_roi = FaceRoiTracker(self.config.FACE_ROI_SIZE, self.config.FACE_ROI_PADDING,
+                                       self.config.FACE_ROI_SMOOTHING)
+        # Motion gate: landmarker chỉ chạy khi vùng mặt / frame thay đổi (MOTION_GATING)
+        self.motion_gate = MotionGate(self.config.MOTION_THRESHOLD,
+                                      self.config.MOTION_MAX_STALE_FRAMES,
+                                      self.config.MOTION_THUMBNAIL_SIZE)
+        # Face / pose song song trên 2 worker (PARALLEL_LANDMARKS), thread tạo khi dùng lần đầu
+        self.parallel = ParallelLandmarks(('face', 'pose'), self.tracer)
+        self._last_pose_landmarks = None   # Pose không nằm trong cached_result
+        # AI_RUNNING_MODE='live_stream': tạo trong run() → _process_frame gọi trực tiếp
+        # (offline analyzer, benchmark) luôn là VIDEO mode đồng bộ
+        self.live_stream: Optional[LiveStreamBackend] = None
+
+    def _setting(self, name: str):
+        """Giá trị config hiệu lực: runtime config, quality level chỉ được làm nhẹ hơn"""
+        value = getattr(self.config, name)
+        if name in self._overrides:
+            return lighter_setting(name, self._overrides[name], value)
+        return value
+
+    def _model_options(self, keys) -> tuple:
+        return tuple(self._setting(k) for k in keys)
+
+    def reset_state(self):
+        """Xóa cache và trạng thái detectors (bắt đầu đoạn video / phiên mới)"""
+        self.cached_result = None
+        self.processing_frame_count = 0
+        self.face_roi.reset()
+        self.motion_gate.reset()
+        self._last_pose_landmarks = None
+        if self.drowsiness_detector:
+            self.drowsiness_detector.reset()
+        if self.posture_analyzer:
+            self.posture_analyzer.reset()
+        if self.focus_calculator:
+            self.focus_calculator.reset()
+
     def get_latest_result(self):
-        """Lấy AI result mới nhất - thread-safe, không block"""
+        """Lấy AI result mới nhất - thread-safe, không block
+
+        result['frame'] có thể bị camera ghi đè khi có result mới; cần đọc frame thì dùng
+        acquire_latest_result().
+        """
         with self._result_lock:
             return self._latest_result
+
+    def acquire_latest_result(self) -> Tuple[Optional[Dict], Optional[FrameEnvelope]]:
+        """(result mới nhất, frame của nó đã retain()) - người gọi release() frame khi xong"""
+        with self._result_lock:
+            frame_ref = self._latest_frame_ref
+            return self._latest_result, frame_ref.retain() if frame_ref is not None else None
+
+    def _build_face_landmarker(self, result_callback=None):
+        """1 Face Landmarker mới theo config hiệu lực (có callback → LIVE_STREAM mode)"""
+        face_base_options = python.BaseOptions(
+            model_asset_path='models/face_landmarker.task'
+        )
+
+        face_options = vision.FaceLandmarkerOptions(
+            base_options=face_base_options,
+            output_face_blendshapes=self._setting('ENABLE_BLENDSHAPES'),  # ← Config / quality level
+            output_facial_transformation_matrixes=False,
+            num_faces=self._setting('FACE_NUM_FACES'),
+            min_face_detection_confidence=self._setting('FACE_DETECTION_CONFIDENCE'),
+            min_face_presence_confidence=self._setting('FACE_PRESENCE_CONFIDENCE'),
+            min_tracking_confidence=self._setting('FACE_TRACKING_CONFIDENCE'),
+            # VIDEO mode cho tracking tốt hơn; LIVE_STREAM khi chạy async
+            running_mode=(vision.RunningMode.LIVE_STREAM if result_callback
+                          else vision.RunningMode.VIDEO),
+            result_callback=result_callback
+        )
+
+        return vision.FaceLandmarker.create_from_options(face_options)
+
+    def _create_face_landmarker(self):
+        """Tạo Face Landmarker theo config hiệu lực (tạo lại khi option model đổi)"""
+        landmarker = self._build_face_landmarker(
+            self.live_stream.on_face if self.live_stream else None
+        )
+        if self.face_landmarker:
+            self.face_landmarker.close()
+            if self.live_stream:
+                self.live_stream.abandon(face=True, pose=False)
+        self.face_landmarker = landmarker
+        # Landmarker cho ROI tạo lại cùng option (nếu đang có)
+        if self.roi_face_landmarker:
+            self._create_roi_face_landmarker()
+        self._face_model_options = self._model_options(FACE_MODEL_KEYS)
+
+    def _create_roi_face_landmarker(self):
+        """Face Landmarker riêng cho FACE_ROI_TRACKING
+
+        VIDEO mode nhớ vị trí mặt của lần detect trước (toạ độ normalized của ảnh trước đó).
+        Dùng chung với cả frame thì vị trí đó sai khi chuyển sang vùng cắt → mất mặt
+        ngay lần detect ROI đầu tiên, fallback cả frame lại làm sai tiếp lần sau.
+        """
+        landmarker = self._build_face_landmarker()
+        if self.roi_face_landmarker:
+            self.roi_face_landmarker.close()
+        self.roi_face_landmarker = landmarker
+
+    def _create_pose_landmarker(self):
+        pose_base_options = python.BaseOptions(
+            model_asset_path='models/pose_landmarker_lite.task'
+        )
+
+        pose_options = vision.PoseLandmarkerOptions(
+            base_options=pose_base_options,
+            running_mode=(vision.RunningMode.LIVE_STREAM if self.live_stream
+                          else vision.RunningMode.VIDEO),
+            result_callback=self.live_stream.on_pose if self.live_stream else None,
+            min_pose_detection_confidence=self._setting('POSE_DETECTION_CONFIDENCE'),
+            min_pose_presence_confidence=self._setting('POSE_PRESENCE_CONFIDENCE'),
+            min_tracking_confidence=self._setting('POSE_TRACKING_CONFIDENCE')
+        )
+
+        landmarker = vision.PoseLandmarker.create_from_options(pose_options)
+        if self.pose_landmarker:
+            self.pose_landmarker.close()
+            if self.live_stream:
+                self.live_stream.abandon(face=False, pose=True)
+        self.pose_landmarker = landmarker
+        self._pose_model_options = self._model_options(POSE_MODEL_KEYS)
+
     def _init_models(self) -> bool:
         try:
             print("🔄 Đang khởi tạo AI models...")
 
             # === MEDIAPIPE FACE LANDMARKER với BLENDSHAPES ===
-            face_base_options = python.BaseOptions(
-                model_asset_path='models/face_landmarker.task'
-            )
-
-            face_options = vision.FaceLandmarkerOptions(
-                base_options=face_base_options,
-                output_face_blendshapes=perf.ENABLE_BLENDSHAPES,  # ← Dùng config flag
-                output_facial_transformation_matrixes=False,
-                num_faces=perf.FACE_NUM_FACES,
-                min_face_detection_confidence=perf.FACE_DETECTION_CONFIDENCE,
-                min_face_presence_confidence=perf.FACE_PRESENCE_CONFIDENCE,
-                min_tracking_confidence=perf.FACE_TRACKING_CONFIDENCE,
-                running_mode=vision.RunningMode.VIDEO  # VIDEO mode cho tracking tốt hơn
-            )
-
-            self.face_landmarker = vision.FaceLandmarker.create_from_options(face_options)
+            self._create_face_landmarker()
+            if self._setting('FACE_ROI_TRACKING') and not self.live_stream:
+                self._create_roi_face_landmarker()
 
             # === MEDIAPIPE POSE LANDMARKER (Tasks API) - CHỈ NẾU ENABLE ===
-            if perf.ENABLE_POSE_DETECTION:
-                pose_base_options = python.BaseOptions(
-                    model_asset_path='models/pose_landmarker_lite.task'
-                )
-
-                pose_options = vision.PoseLandmarkerOptions(
-                    base_options=pose_base_options,
-                    running_mode=vision.RunningMode.VIDEO,  # VIDEO mode
-                    min_pose_detection_confidence=perf.POSE_DETECTION_CONFIDENCE,
-                    min_pose_presence_confidence=perf.POSE_PRESENCE_CONFIDENCE,
-                    min_tracking_confidence=perf.POSE_TRACKING_CONFIDENCE
-                )
-
-                self.pose_landmarker = vision.PoseLandmarker.create_from_options(pose_options)
+            if self._setting('ENABLE_POSE_DETECTION'):
+                self._create_pose_landmarker()
             else:
                 self.pose_landmarker = None
                 print("⚠️  Pose detection đã tắt để tăng FPS")
@@ -102,9 +235,9 @@ class AIProcessorThread(threading.Thread):
             self.posture_analyzer = PostureAnalyzer()
             self.focus_calculator = FocusCalculator()
             
-            if perf.ENABLE_BLENDSHAPES:
+            if self._setting('ENABLE_BLENDSHAPES'):
                 print("✅ AI models khởi tạo thành công (với Blendshapes!)")
-            elif perf.ENABLE_POSE_DETECTION:
+            elif self._setting('ENABLE_POSE_DETECTION'):
                 print("✅ AI models khởi tạo thành công (không Blendshapes)")
             else:
                 print("✅ AI models khởi tạo thành công (chỉ Face detection - MAX FPS!)")
@@ -115,219 +248,589 @@ class AIProcessorThread(threading.Thread):
             traceback.print_exc()
             return False
 
-    def _process_frame(self, frame) -> Optional[Dict]:
+    def _sync_models(self):
+        """Tạo lại landmarker CHỈ khi option lúc tạo model thực sự thay đổi
+
+        Các thay đổi khác (interval, resolution...) áp dụng ngay từ frame sau,
+        giữ nguyên tracking state của MediaPipe.
+        """
+        # Job trễ hạn trên worker phải xong trước khi đóng landmarker cũ
+        self.parallel.wait_idle()
         try:
-            self.processing_frame_count += 1
-            
-            # FRAME SKIPPING: Chỉ process mỗi N frames (nếu bật)
-            if perf.ENABLE_FRAME_SKIPPING:
-                should_process_face = (self.processing_frame_count % perf.FACE_PROCESS_INTERVAL == 0)
-                should_process_pose = (
-                    perf.ENABLE_POSE_DETECTION and
-                    (self.processing_frame_count % perf.POSE_PROCESS_INTERVAL == 0)
+            if self._model_options(FACE_MODEL_KEYS) != self._face_model_options:
+                self._create_face_landmarker()
+                print("🔄 Face landmarker đã tạo lại theo config mới")
+            if (self._setting('FACE_ROI_TRACKING') and self.roi_face_landmarker is None and
+                    not self.live_stream):
+                # ROI tắt thì giữ nguyên landmarker để bật lại nhanh
+                self._create_roi_face_landmarker()
+            if self._setting('ENABLE_POSE_DETECTION') and (
+                    self.pose_landmarker is None or
+                    self._model_options(POSE_MODEL_KEYS) != self._pose_model_options):
+                # Pose tắt thì giữ nguyên landmarker để bật lại nhanh
+                self._create_pose_landmarker()
+                print("🔄 Pose landmarker đã tạo lại theo config mới")
+        except Exception as e:
+            print(f"⚠️  Không áp dụng được config model mới: {e}")
+
+    def _apply_quality_level(self):
+        """Áp dụng quality level mới (chạy trong AI thread, giữa 2 frame)"""
+        controller = self.quality_controller
+        self._overrides = controller.overrides()
+        self._applied_level = controller.level
+        self._sync_models()
+
+    def _apply_config(self, snapshot: ConfigSnapshot):
+        """Chuyển sang snapshot config mới (chạy trong AI thread, giữa 2 frame)"""
+        self.config = snapshot
+        if self.quality_controller:
+            self.quality_controller.target_fps = snapshot.AI_TARGET_FPS
+        self.face_roi.configure(snapshot.FACE_ROI_SIZE, snapshot.FACE_ROI_PADDING,
+                                snapshot.FACE_ROI_SMOOTHING)
+        self.motion_gate.configure(snapshot.MOTION_THRESHOLD, snapshot.MOTION_MAX_STALE_FRAMES,
+                                   snapshot.MOTION_THUMBNAIL_SIZE)
+        self._sync_models()
+
+    def _on_quality_event(self, event: QualityEvent):
+        arrow = "⬇️" if event.level > event.previous_level else "⬆️"
+        print(f"{arrow}  Quality level {event.previous_level} → {event.level} ({event.reason}): "
+              f"AI {event.fps:.1f} FPS, bận {event.utilization:.0%}, "
+              f"{event.latency_ms:.1f} ms/frame")
+
+    def _prepare_full(self, frame):
+        """Cả frame → mp.Image ở PROCESSING_WIDTH x PROCESSING_HEIGHT"""
+        t_stage = time.perf_counter()
+        size = Preprocessor.target_size(frame,
+                                        self._setting('PROCESSING_WIDTH'),
+                                        self._setting('PROCESSING_HEIGHT'),
+                                        self._setting('ENABLE_SMART_RESIZE'))
+        mp_image = self.preprocessor.run(frame, size).mp_image
+        self.stage_ms['preprocess'] = (time.perf_counter() - t_stage) * 1000
+        return mp_image
+
+    def _detect_face_roi(self, frame, timestamp_ms: int):
+        """Face Landmarker trên vùng cắt quanh mặt → (result, box) hoặc (None, None) nếu mất mặt"""
+        box = self.face_roi.crop_box(frame.shape)
+        x0, y0, x1, y1 = box
+        # frame[y0:y1, x0:x1] là view, resize đọc thẳng từ frame gốc
+        prepared = self.roi_preprocessor.run(frame[y0:y1, x0:x1], self.face_roi.target_size(box))
+        result = self.roi_face_landmarker.detect_for_video(prepared.mp_image, timestamp_ms)
+        if not result.face_landmarks:
+            return None, None
+        return result, box
+
+    def _detect_face(self, frame, mp_image, use_roi: bool, timestamp_ms: int):
+        """Face Landmarker trên ROI (nếu dùng), mất mặt / không ROI → cả frame
+
+        Trả (face_result, roi_box); roi_box None nếu kết quả từ cả frame.
+        Không đổi state của tracker → chạy được trên worker của PARALLEL_LANDMARKS.
+        """
+        if use_roi:
+            face_result, roi_box = self._detect_face_roi(frame, timestamp_ms)
+            if face_result is not None:
+                return face_result, roi_box
+        if mp_image is None:
+            mp_image = self._prepare_full(frame)
+        # VIDEO mode cần timestamp tăng dần cho lần detect thứ 2 trong tick
+        face_timestamp = timestamp_ms + 1 if use_roi else timestamp_ms
+        return self.face_landmarker.detect_for_video(mp_image, face_timestamp), None
+
+    def _detect_parallel(self, frame, mp_image, use_roi: bool, timestamp_ms: int):
+        """Face + pose song song, chờ tối đa PARALLEL_DEADLINE_MS
+
+        Trả (face_out, pose_result); bên trễ hạn là None (dùng cache).
+        """
+        jobs = self.parallel.wait({
+            'face': self.parallel.submit('face', self._detect_face,
+                                         frame, mp_image, use_roi, timestamp_ms),
+            'pose': self.parallel.submit('pose', self.pose_landmarker.detect_for_video,
+                                         mp_image, timestamp_ms),
+        }, self._setting('PARALLEL_DEADLINE_MS'))
+        face_job, pose_job = jobs['face'], jobs['pose']
+        if face_job is not None:
+            self.stage_ms['face'] = face_job.elapsed_ms
+        if pose_job is not None:
+            self.stage_ms['pose'] = pose_job.elapsed_ms
+        return (face_job.result if face_job else None), (pose_job.result if pose_job else None)
+
+    def _schedule(self, frame):
+        """Landmarker nào chạy ở frame này → (should_process_face, should_process_pose)"""
+        pose_enabled = self._setting('ENABLE_POSE_DETECTION')
+        # Worker song song còn chạy job trễ hạn → chưa gọi lại được landmarker đó.
+        # Kiểm tra trước motion gate: gate chỉ dời mốc so sánh khi landmarker chạy thật
+        face_busy = self.parallel.busy('face')
+        pose_busy = self.parallel.busy('pose')
+
+        # FRAME SKIPPING: Chỉ process mỗi N frames (nếu bật)
+        if self._setting('ENABLE_FRAME_SKIPPING') and self._setting('MOTION_GATING'):
+            # Theo chuyển động thay vì modulo: vùng mặt lần trước / cả frame cho pose
+            with self.tracer.span('motion_gate'):
+                face_box = self.face_roi.crop_box(frame.shape) if self.face_roi.active else None
+                should_process_face = (not face_busy and
+                                       self.motion_gate.should_run('face', frame, face_box))
+                should_process_pose = pose_enabled and not pose_busy and self.motion_gate.should_run(
+                    'pose', frame, eligible=(
+                        self.processing_frame_count % self._setting('POSE_PROCESS_INTERVAL') == 0
+                    )
                 )
-            else:
-                should_process_face = True
-                should_process_pose = perf.ENABLE_POSE_DETECTION
-            
+        elif self._setting('ENABLE_FRAME_SKIPPING'):
+            should_process_face = not face_busy and (
+                self.processing_frame_count % self._setting('FACE_PROCESS_INTERVAL') == 0
+            )
+            should_process_pose = (
+                pose_enabled and not pose_busy and
+                (self.processing_frame_count % self._setting('POSE_PROCESS_INTERVAL') == 0)
+            )
+        else:
+            should_process_face = not face_busy
+            should_process_pose = pose_enabled and not pose_busy
+        if not should_process_face:
+            FRAMES_SKIPPED.labels(stage='face').inc()
+        if pose_enabled and not should_process_pose:
+            FRAMES_SKIPPED.labels(stage='pose').inc()
+        return should_process_face, should_process_pose
+
+    def _cached_copy(self, frame) -> Dict:
+        cached = self.cached_result.copy()
+        cached['frame'] = frame  # Update frame mới
+        cached['timestamp'] = time.time()
+        return cached
+
+    def _process_frame(self, frame, timestamp: Optional[float] = None) -> Optional[Dict]:
+        """timestamp: thời điểm capture của frame (giây, monotonic / thời điểm trong video)
+        cho detector theo thời gian; None = lúc xử lý"""
+        try:
+            self.processing_frame_count += 1
+            self.stage_ms = {}
+            should_process_face, should_process_pose = self._schedule(frame)
+
             # Nếu cả 2 đều skip, dùng cached result
             if (
-                perf.ENABLE_RESULT_CACHING and
+                self._setting('ENABLE_RESULT_CACHING') and
                 not should_process_face and
                 not should_process_pose and
                 self.cached_result
             ):
-                cached = self.cached_result.copy()
-                cached['frame'] = frame  # Update frame mới
-                cached['timestamp'] = time.time()
-                return cached
+                RESULT_CACHE_HITS.inc()
+                return self._cached_copy(frame)
             
-            # Smart resize - chỉ resize 1 lần với config
-            if perf.ENABLE_SMART_RESIZE:
-                frame_small = cv2.resize(frame, 
-                                        (perf.PROCESSING_WIDTH, perf.PROCESSING_HEIGHT),
-                                        interpolation=cv2.INTER_LINEAR)
+            # Preprocess (resize + BGR→RGB) chỉ khi có landmarker dùng frame ở tick này
+            # (vd. chưa có cache mà cả face / pose đều tới lượt skip → bỏ qua)
+            # Face ROI tracking: face dùng vùng cắt riêng, cả frame chỉ cần cho pose
+            use_roi = (should_process_face and self._setting('FACE_ROI_TRACKING') and
+                       self.face_roi.active and self.roi_face_landmarker is not None)
+            mp_image = None
+            if (should_process_face and not use_roi) or (should_process_pose and self.pose_landmarker):
+                mp_image = self._prepare_full(frame)
+            elif use_roi:
+                self.preprocessor.delegate()   # Vùng cắt do roi_preprocessor chuẩn bị
             else:
-                h, w = frame.shape[:2]
-                scale = 320 / max(h, w)
-                new_w, new_h = int(w * scale), int(h * scale)
-                frame_small = cv2.resize(frame, (new_w, new_h))
-
-            # Convert BGR → RGB cho MediaPipe
-            frame_rgb = cv2.cvtColor(frame_small, cv2.COLOR_BGR2RGB)
-
-            # === FACE LANDMARKER (API mới) ===
-            # Phải convert sang MediaPipe Image format
-            mp_image = mp.Image(
-                image_format=mp.ImageFormat.SRGB,
-                data=frame_rgb
-            )
-            
+                self.preprocessor.skip()
+
             # Timestamp monotonic cho VIDEO mode (phải luôn tăng đều)
             self._timestamp_counter += self._timestamp_interval_ms
             timestamp_ms = self._timestamp_counter
 
-            # Extract landmarks và blendshapes
-            face_landmarks = None
-            blendshapes_dict = {}
+            run_pose = should_process_pose and self.pose_landmarker is not None
+            face_out, pose_result = None, None
+            if should_process_face and run_pose and self._setting('PARALLEL_LANDMARKS'):
+                # Face + pose cùng tick → 2 worker song song (mp_image cả frame đã có cho pose)
+                face_out, pose_result = self._detect_parallel(frame, mp_image, use_roi, timestamp_ms)
+            else:
+                if should_process_face:
+                    # Detect face + blendshapes
+                    t_stage = time.perf_counter()
+                    face_out = self._detect_face(frame, mp_image, use_roi, timestamp_ms)
+                    t_done = time.perf_counter()
+                    self.tracer.record('face_detect', t_stage, t_done)
+                    self.stage_ms['face'] = (t_done - t_stage) * 1000
+                if run_pose:
+                    t_stage = time.perf_counter()
+                    pose_result = self.pose_landmarker.detect_for_video(mp_image, timestamp_ms)
+                    t_done = time.perf_counter()
+                    self.tracer.record('pose_detect', t_stage, t_done)
+                    self.stage_ms['pose'] = (t_done - t_stage) * 1000
+
+            return self._build_result(frame, face_out, pose_result, run_pose, use_roi, timestamp)
+        except Exception as e:
+            print(f"❌ Lỗi xử lý frame: {e}")
+            import traceback
+            traceback.print_exc()
+            return None 
+
+    def _build_result(self, frame, face_out, pose_result, run_pose: bool, use_roi: bool,
+                      timestamp: Optional[float] = None) -> Dict:
+        """Kết quả landmarker của 1 frame → result dict (drowsiness, posture, focus...)
+
+        face_out: (face_result, roi_box) hoặc None nếu face không chạy / trễ hạn (dùng cache)
+        run_pose: pose đã được gửi ở frame này (pose_result None → trễ hạn, dùng pose lần trước)
+        timestamp: thời điểm capture (giây) cho drowsiness / posture theo thời gian
+        """
+        # Extract landmarks và blendshapes
+        face_landmarks = None
+        face_features = None
+        blendshapes_dict = {}
+
+        if face_out is not None:
+            DETECTOR_LATENCY.labels(detector='face').observe(self.stage_ms['face'])
+            face_result, roi_box = face_out
+            if use_roi and roi_box is None:
+                self.face_roi.lost()
+            if roi_box is not None:
+                self.face_roi.roi_frames += 1
+            else:
+                self.face_roi.full_frames += 1
+
+            if face_result.face_landmarks and len(face_result.face_landmarks) > 0:
+                # Landmarks (để tương thích với code cũ)
+                face_landmarks = self._convert_landmarks(face_result.face_landmarks[0])
+                if roi_box is not None:
+                    FaceRoiTracker.to_frame(face_landmarks.points, roi_box, frame.shape)
+                # ROI cập nhật cả khi không tracking: motion gate theo dõi vùng mặt này
+                self.face_roi.update(face_landmarks.points, frame.shape)
+                # Tất cả đặc trưng hình học (EAR, gaze, head pose, IPD) trong 1 lượt
+                face_features = extract_face_features(face_landmarks.points)
+
+                # Blendshapes - Selective nếu enable
+                if face_result.face_blendshapes and len(face_result.face_blendshapes) > 0:
+                    blendshapes_list = face_result.face_blendshapes[0]
+                    if self._setting('USE_SELECTIVE_BLENDSHAPES'):
+                        # Chỉ lấy blendshapes quan trọng
+                        important = self._setting('IMPORTANT_BLENDSHAPES')
+                        blendshapes_dict = {
+                            bs.category_name: bs.score
+                            for bs in blendshapes_list
+                            if bs.category_name in important
+                        }
+                    else:
+                        # Lấy tất cả
+                        blendshapes_dict = {
+                            bs.category_name: bs.score
+                            for bs in blendshapes_list
+                        }
+            else:
+                # Không có mặt → bỏ ROI cũ (motion gate quay lại theo dõi cả frame)
+                self.face_roi.reset()
+        elif self.cached_result:
+            # Dùng face data từ cache (skip / worker trễ hạn)
+            face_landmarks = self.cached_result.get('face_landmarks')
+            face_features = self.cached_result.get('face_features')
+            blendshapes_dict = self.cached_result.get('blendshapes', {})
+
+        # === POSE DETECTION (Tasks API) ===
+        pose_landmarks = None
+        if pose_result is not None:
+            DETECTOR_LATENCY.labels(detector='pose').observe(self.stage_ms['pose'])
             
-            if should_process_face:
-                # Detect face + blendshapes
-                face_result = self.face_landmarker.detect_for_video(mp_image, timestamp_ms)
-
-                if face_result.face_landmarks and len(face_result.face_landmarks) > 0:
-                    # Landmarks (để tương thích với code cũ)
-                    face_landmarks = self._convert_landmarks(face_result.face_landmarks[0])
-
-                    # Blendshapes - Selective nếu enable
-                    if face_result.face_blendshapes and len(face_result.face_blendshapes) > 0:
-                        blendshapes_list = face_result.face_blendshapes[0]
-                        if perf.USE_SELECTIVE_BLENDSHAPES:
-                            # Chỉ lấy blendshapes quan trọng
-                            blendshapes_dict = {
-                                bs.category_name: bs.score
-                                for bs in blendshapes_list
-                                if bs.category_name in perf.IMPORTANT_BLENDSHAPES
-                            }
-                        else:
-                            # Lấy tất cả
-                            blendshapes_dict = {
-                                bs.category_name: bs.score
-                                for bs in blendshapes_list
-                            }
-            elif self.cached_result:
-                # Dùng face data từ cache
-                face_landmarks = self.cached_result.get('face_landmarks')
-                blendshapes_dict = self.cached_result.get('blendshapes', {})
-
-            # === POSE DETECTION (Tasks API) ===
-            pose_landmarks = None
-            if should_process_pose and perf.ENABLE_POSE_DETECTION and self.pose_landmarker:
-                pose_result = self.pose_landmarker.detect_for_video(mp_image, timestamp_ms)
-                
-                # Convert pose landmarks sang format cũ để tương thích
-                if pose_result.pose_landmarks and len(pose_result.pose_landmarks) > 0:
-                    pose_landmarks = self._convert_landmarks(pose_result.pose_landmarks[0])
-            elif self.cached_result:
-                # Dùng pose data từ cache (nhưng không lưu trong cached_result, tính lại)
-                pass
-
-            # === XỬ LÝ TIẾP (giữ nguyên phần drowsiness, posture...) ===
-            ear_left, ear_right, is_drowsy = 0.0, 0.0, False
-            if face_landmarks is not None:
-                ear_left, ear_right, is_drowsy = self.drowsiness_detector.process(face_landmarks)
-            ear_avg = (ear_left + ear_right) / 2.0
-
-            # Posture analysis
-            head_tilt, shoulder_angle, posture_score, is_bad_posture = 0.0, 0.0, 100.0, False
-            if pose_landmarks:
+            # Convert pose landmarks sang format cũ để tương thích
+            if pose_result.pose_landmarks and len(pose_result.pose_landmarks) > 0:
+                pose_landmarks = self._convert_landmarks(pose_result.pose_landmarks[0])
+            self._last_pose_landmarks = pose_landmarks
+        elif run_pose:
+            # Worker pose trễ hạn → dùng pose lần trước
+            pose_landmarks = self._last_pose_landmarks
+        elif self.cached_result:
+            # Dùng pose data từ cache (nhưng không lưu trong cached_result, tính lại)
+            pass
+
+        # === XỬ LÝ TIẾP (giữ nguyên phần drowsiness, posture...) ===
+        ear_pair, head_angles = None, None
+        if face_features is not None:
+            ear_pair = (float(face_features[FEATURE_EAR_LEFT]),
+                        float(face_features[FEATURE_EAR_RIGHT]))
+            head_angles = (float(face_features[FEATURE_HEAD_PITCH]),
+                           float(face_features[FEATURE_HEAD_ROLL]),
+                           float(face_features[FEATURE_HEAD_YAW]))
+
+        ear_left, ear_right, is_drowsy = 0.0, 0.0, False
+        if face_landmarks is not None:
+            with self.tracer.span('drowsiness'):
+                ear_left, ear_right, is_drowsy = self.drowsiness_detector.process(
+                    face_landmarks, ears=ear_pair, timestamp=timestamp
+                )
+        ear_avg = (ear_left + ear_right) / 2.0
+
+        # Posture analysis
+        head_tilt, shoulder_angle, posture_score, is_bad_posture = 0.0, 0.0, 100.0, False
+        if pose_landmarks:
+            with self.tracer.span('posture'):
                 head_tilt, shoulder_angle, posture_score, is_bad_posture = \
-                    self.posture_analyzer.process(pose_landmarks, face_landmarks)
+                    self.posture_analyzer.process(pose_landmarks, face_landmarks, head_angles,
+                                                  timestamp=timestamp)
 
-            # Face distance
-            face_distance_ipd = 0.15
-            if face_landmarks is not None:
-                face_distance_ipd = self.posture_analyzer.calculate_face_distance(face_landmarks)
+        # Face distance
+        face_distance_ipd = 0.15
+        if face_features is not None:
+            face_distance_ipd = float(face_features[FEATURE_FACE_DISTANCE])
+        elif face_landmarks is not None:
+            face_distance_ipd = self.posture_analyzer.calculate_face_distance(face_landmarks)
 
-            posture_details = self.posture_analyzer.get_posture_details()
+        posture_details = self.posture_analyzer.get_posture_details()
 
+        with self.tracer.span('focus'):
             focus_score = self.focus_calculator.calculate_focus_score(
                 ear_avg=ear_avg,
                 posture_score=posture_score,
                 emotion=self.current_emotion
             )
 
-            result = {
-                'timestamp': time.time(),
-                'ear_left': round(ear_left, 3),
-                'ear_right': round(ear_right, 3),
-                'ear_avg': round(ear_avg, 3),
-                'head_tilt': round(head_tilt, 2),
-                'shoulder_angle': round(shoulder_angle, 2),
-                'posture_score': round(posture_score, 2),
-                'face_distance_ipd': round(face_distance_ipd, 3),
-                'posture_details': posture_details,
-                'emotion': self.current_emotion,
-                'emotion_confidence': round(self.emotion_confidence, 2),
-                'focus_score': focus_score,
-                'is_drowsy': is_drowsy,
-                'is_bad_posture': is_bad_posture,
-                'face_landmarks': face_landmarks,
-                'blendshapes': blendshapes_dict,  # ← THÊM MỚI
-                'frame': frame
-            }
-            
-            # Cache result cho lần sau
-            if perf.ENABLE_RESULT_CACHING:
-                self.cached_result = result.copy()
-            
-            return result
-        except Exception as e:
-            print(f"❌ Lỗi xử lý frame: {e}")
-            import traceback
-            traceback.print_exc()
-            return None 
-    def _convert_landmarks(self, new_landmarks) :
-        class LandmarkList:
-            def __init__(self, landmarks):
-                self.landmark = landmarks
-        class Landmark:
-            def __init__(self, x, y, z):
-                self.x = x
-                self.y = y
-                self.z = z
-        converted = [
-            Landmark(lm.x, lm.y, lm.z)
-            for lm in new_landmarks
-        ]
-        return LandmarkList(converted)
+        result = {
+            'timestamp': time.time(),
+            'ear_left': round(ear_left, 3),
+            'ear_right': round(ear_right, 3),
+            'ear_avg': round(ear_avg, 3),
+            'head_tilt': round(head_tilt, 2),
+            'shoulder_angle': round(shoulder_angle, 2),
+            'posture_score': round(posture_score, 2),
+            'face_distance_ipd': round(face_distance_ipd, 3),
+            'posture_details': posture_details,
+            'emotion': self.current_emotion,
+            'emotion_confidence': round(self.emotion_confidence, 2),
+            'focus_score': focus_score,
+            'is_drowsy': is_drowsy,
+            'is_bad_posture': is_bad_posture,
+            'face_landmarks': face_landmarks,
+            'face_features': face_features,
+            'blendshapes': blendshapes_dict,  # ← THÊM MỚI
+            'frame': frame
+        }
+        
+        # Cache result cho lần sau (không giữ frame: buffer sẽ được camera dùng lại)
+        if self._setting('ENABLE_RESULT_CACHING'):
+            self.cached_result = result.copy()
+            self.cached_result.pop('frame', None)
+        return result
+
+    def _submit_live(self, item: FrameEnvelope):
+        """LIVE_STREAM: gửi frame cho landmarker rồi trả về ngay (live_stream nhận item)"""
+        frame = item.array
+        self.processing_frame_count += 1
+        should_process_face, should_process_pose = self._schedule(frame)
+        should_process_pose = should_process_pose and self.pose_landmarker is not None
+        live_stream = self.live_stream
+        if ((should_process_face or should_process_pose) and
+                live_stream.in_flight >= live_stream.max_in_flight):
+            # MediaPipe đang bận với đủ frame → frame này dùng cache, giữ latency thấp
+            FRAMES_SKIPPED.labels(stage='live_stream').inc()
+            should_process_face = should_process_pose = False
+
+        if (not (should_process_face or should_process_pose) and
+                live_stream.queued > live_stream.max_in_flight):
+            # Frame skip xếp sau quá nhiều frame đang chờ → bỏ (không giữ buffer của pool)
+            FRAMES_DROPPED.labels(queue='live_stream').inc()
+            item.release()
+            return
+
+        # Timestamp = thời điểm capture thật (frame từ nguồn khác camera thread: lúc nhận)
+        timestamp_ms = live_stream.timestamp_ms(item.capture_ts)
+        live = live_stream.submit(timestamp_ms, item, should_process_face, should_process_pose)
+        if not live.detecting:
+            # Như VIDEO mode: tick dùng cache kết quả không tính vào thống kê preprocess
+            if not (self.cached_result and self._setting('ENABLE_RESULT_CACHING')):
+                self.preprocessor.skip()
+            return
+        try:
+            mp_image = self._prepare_full(frame)
+            if should_process_face:
+                self.face_landmarker.detect_async(mp_image, timestamp_ms)
+            if should_process_pose:
+                self.pose_landmarker.detect_async(mp_image, timestamp_ms)
+        except Exception:
+            live_stream.cancel(live)   # Không có callback → đừng để frame chặn hàng đợi
+            raise
+
+    def _drain_live(self):
+        """LIVE_STREAM: ráp result cho các frame đã đủ callback (đúng thứ tự frame)"""
+        controller = self.quality_controller
+        for live in self.live_stream.poll():
+            item = live.item
+            try:
+                frame = item.array
+                t_frame = time.perf_counter()
+                if (not live.detecting and self.cached_result and
+                        self._setting('ENABLE_RESULT_CACHING')):
+                    RESULT_CACHE_HITS.inc()
+                    result = self._cached_copy(frame)
+                else:
+                    self.stage_ms = {}
+                    face_out = None
+                    if live.face_result is not None:
+                        self.stage_ms['face'] = live.face_ms
+                        face_out = (live.face_result, None)
+                    if live.pose_result is not None:
+                        self.stage_ms['pose'] = live.pose_ms
+                    result = self._build_result(frame, face_out, live.pose_result,
+                                                live.pose, use_roi=False,
+                                                timestamp=item.capture_ts)
+                t_done = time.perf_counter()
+                self.tracer.record('ai_frame', t_frame, t_done)
+                # Latency của frame = chờ inference async + ráp kết quả
+                latency_ms = max(live.face_ms, live.pose_ms) + (t_done - t_frame) * 1000
+                DETECTOR_LATENCY.labels(detector='ai_total').observe(latency_ms)
+                if controller:
+                    controller.record(latency_ms, self.stage_ms)
+                item = self._publish(result, item)
+                self._count_frame()
+            except Exception as e:
+                print(f"❌ Lỗi ráp kết quả LIVE_STREAM: {e}")
+            finally:
+                if item is not None:
+                    item.release()
+
+    def _stamp(self, result: Dict, item: FrameEnvelope):
+        """Gắn metadata capture của frame vào result
+
+        timestamp = lúc capture (không phải lúc AI xử lý xong) → blink rate, DB... không bị
+        lệch theo thời gian chờ queue + inference. latency_ms = capture → result (glass-to-result),
+        queue_ms = capture → AI nhận frame: tách phần trễ do capture / queue với phần inference.
+        """
+        now = time.monotonic()
+        result['timestamp'] = item.capture_time
+        result['capture_ts'] = item.capture_ts
+        result['frame_seq'] = item.seq
+        result['source_id'] = item.source_id
+        result['queue_ms'] = round(item.age_ms(item.dequeue_ts), 2) if item.dequeue_ts else 0.0
+        result['latency_ms'] = round(item.age_ms(now), 2)
+        FRAME_AGE.labels(stage='result').observe(result['latency_ms'])
+
+    def _publish(self, result: Dict, item: FrameEnvelope) -> Optional[FrameEnvelope]:
+        """Đưa result ra cho main thread → trả về item cần release (buffer của result trước)"""
+        self._stamp(result, item)
+        # Lưu latest result cho main thread (luôn có sẵn)
+        # result['frame'] nằm trong buffer của item → giữ tới khi có result mới
+        with self._result_lock:
+            previous = self._latest_frame_ref
+            self._latest_result = result
+            self._latest_frame_ref = item
+
+        # Vẫn put vào queue cho backward compat
+        # (frame trong đó có thể đã bị camera ghi đè khi được đọc)
+        if not self.result_queue.full():
+            self.result_queue.put(result)
+        return previous
+
+    def _count_frame(self):
+        """Tính FPS"""
+        self.frame_count += 1
+        elapsed = time.time() - self.start_time
+        if elapsed >= 1.0:
+            self.fps = self.frame_count / elapsed
+            PIPELINE_FPS.labels(thread='ai').set(self.fps)
+            if self.quality_controller:
+                QUALITY_LEVEL.set(self.quality_controller.level)
+            self.frame_count = 0
+            self.start_time = time.time()
+
+    def _convert_landmarks(self, new_landmarks) -> LandmarkArray:
+        """MediaPipe landmarks → LandmarkArray (1 mảng (N, 3) float32)"""
+        return LandmarkArray.from_mediapipe(new_landmarks)
 
     def run(self):
+        if self.config.AI_RUNNING_MODE == 'live_stream':
+            # Phải có trước khi tạo landmarker (callback của LIVE_STREAM mode)
+            self.live_stream = LiveStreamBackend(self.config.LIVE_MAX_IN_FLIGHT,
+                                                 self.config.LIVE_DEADLINE_MS)
         if not self._init_models():
             return
         
         self.running = True
         self.start_time = time.time()
+        controller = self.quality_controller
+        if controller:
+            controller.add_listener(self._on_quality_event)
+            print(f"✅ Adaptive quality: target {controller.target_fps} FPS, "
+                  f"level {controller.level}/{len(controller.levels) - 1}")
+        live_stream = self.live_stream
+        if live_stream:
+            print(f"✅ LIVE_STREAM mode: tối đa {live_stream.max_in_flight} frame chờ kết quả async")
         print("✅ AI Processor Thread đã khởi động")
         
         while self.running:
+            item = None
             try:
-                frame = self.frame_queue.get(timeout=1)
-                result = self._process_frame(frame)
+                if live_stream:
+                    # Kết quả async đã xong → result, rồi mới nhận frame mới
+                    self._drain_live()
+                # item: FrameEnvelope từ camera (ndarray / PooledFrame từ nguồn khác được
+                # bọc lại, capture = lúc nhận) - thread này giữ 1 tham chiếu
+                # LIVE_STREAM: chờ ngắn để callback xong không phải đợi frame kế tiếp
+                item = FrameEnvelope.wrap(self.frame_queue.get(timeout=0.005 if live_stream else 1))
+                item.dequeue_ts = time.monotonic()
+                FRAME_AGE.labels(stage='dequeue').observe(item.age_ms(item.dequeue_ts))
+                frame = item.array
+                snapshot = self.runtime_config.current
+                if snapshot is not self.config:
+                    self._apply_config(snapshot)
+                if controller and controller.level != self._applied_level:
+                    self._apply_quality_level()
+                if live_stream:
+                    submitted, item = item, None   # live_stream giữ tham chiếu tới khi ráp xong
+                    with self.tracer.span('ai_submit'):
+                        self._submit_live(submitted)
+                    continue
+                t_frame = time.perf_counter()
+                result = self._process_frame(frame, item.capture_ts)
+                t_done = time.perf_counter()
+                self.tracer.record('ai_frame', t_frame, t_done)
+                DETECTOR_LATENCY.labels(detector='ai_total').observe((t_done - t_frame) * 1000)
+                if controller:
+                    controller.record((t_done - t_frame) * 1000, self.stage_ms)
                 
                 if result:
-                    # Lưu latest result cho main thread (luôn có sẵn)
-                    with self._result_lock:
-                        self._latest_result = result
-                    
-                    # Vẫn put vào queue cho backward compat
-                    if not self.result_queue.full():
-                        self.result_queue.put(result)
-                
-                # Tính FPS
-                self.frame_count += 1
-                elapsed = time.time() - self.start_time
-                if elapsed >= 1.0:
-                    self.fps = self.frame_count / elapsed
-                    self.frame_count = 0
-                    self.start_time = time.time()
+                    item = self._publish(result, item)
+                self._count_frame()
                     
             except Empty:
                 continue
             except Exception as e:
                 print(f"❌ Lỗi AI Processor: {e}")
+            finally:
+                if item is not None:
+                    item.release()
         
         self._cleanup()
+        stats = self.preprocessor.get_stats()
+        if stats['frames']:
+            print(f"🖼️  Preprocess: {stats['prepared']}/{stats['frames']} frame, "
+                  f"{stats['avg_ms']:.2f} ms/frame, tiết kiệm {stats['saved_ms_per_frame']:.2f} ms/frame "
+                  f"({stats['skipped']} frame không cần landmarker)")
+        roi_stats = self.roi_preprocessor.get_stats()
+        if roi_stats['prepared']:
+            print(f"🖼️  Preprocess face ROI: {roi_stats['prepared']} vùng cắt, "
+                  f"{roi_stats['avg_ms']:.2f} ms/vùng ({stats['delegated']} tick chỉ cần ROI)")
+        if self._setting('FACE_ROI_TRACKING'):
+            roi = self.face_roi.get_stats()
+            print(f"🎯 Face ROI: {roi['roi_frames']} frame trong ROI, {roi['full_frames']} cả frame, "
+                  f"mất mặt {roi['losses']} lần")
+        if live_stream:
+            live = live_stream.get_stats()
+            print(f"📡 LIVE_STREAM: {live['completed']}/{live['submitted']} frame có kết quả, "
+                  f"{live['avg_ms']:.1f} ms gửi → kết quả, thiếu callback {live['missed']} lần "
+                  f"(quá hạn {live['timed_out']})")
+        if self._setting('MOTION_GATING'):
+            for name, gate in self.motion_gate.get_stats().items():
+                print(f"🏃 Motion gate [{name}]: bỏ qua {gate['skipped']} frame ({gate['skip_ratio']:.0%}), "
+                      f"chạy {gate['motion']} lần do cử động, {gate['stale']} lần do cache cũ")
+        for name, worker in self.parallel.get_stats().items():
+            if worker['jobs']:
+                print(f"🔀 Song song [{name}]: {worker['jobs']} lần, {worker['avg_ms']:.1f} ms/lần, "
+                      f"trễ hạn {worker['late']} lần")
         print("🛑 AI Processor Thread đã dừng")
 
     def stop(self):
         self.running = False
 
     def _cleanup(self):
+        self.parallel.wait_idle()
+        self.parallel.stop()
         if self.face_landmarker:
             self.face_landmarker.close()
+        if self.roi_face_landmarker:
+            self.roi_face_landmarker.close()
         if self.pose_landmarker:
             self.pose_landmarker.close()
+        if self.live_stream:
+            self.live_stream.close()   # Landmarker đã đóng → bỏ frame còn chờ
 
     def get_fps(self) -> float:
         return self.fps
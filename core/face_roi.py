@@ -0,0 +1,112 @@
+"""
+Face ROI - Cắt vùng quanh khuôn mặt ở frame gốc trước khi chạy Face Landmarker
+- ROI = bounding box landmarks lần trước + padding, hình vuông, làm mượt (EMA + deadband)
+  để vùng cắt không rung theo từng frame
+- Cắt từ frame độ phân giải gốc (view, không copy) → resize về FACE_ROI_SIZE
+  → nhiều pixel khuôn mặt hơn so với cả frame thu nhỏ 256x192, mà ít pixel phải xử lý hơn
+- Landmarks trong ROI được đổi về toạ độ normalized của cả frame (downstream không đổi)
+- Mất mặt trong ROI → bỏ ROI, tick đó detect lại trên cả frame
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+Box = Tuple[int, int, int, int]   # x0, y0, x1, y1 (pixel, x1/y1 không tính)
+
+
+class FaceRoiTracker:
+    """Giữ ROI khuôn mặt qua các frame (chỉ dùng trong AI thread)"""
+
+    def __init__(self, output_size: int = 192, padding: float = 0.35,
+                 smoothing: float = 0.6, deadband: float = 0.05, min_size: int = 96):
+        self.output_size = output_size
+        self.padding = padding        # Thêm mỗi bên, theo tỉ lệ cạnh bbox mặt
+        self.smoothing = smoothing    # 0 = bám ngay, gần 1 = rất mượt
+        self.deadband = deadband      # Thay đổi < deadband * cạnh ROI → giữ nguyên ROI
+        self.min_size = min_size      # Cạnh ROI nhỏ nhất (pixel frame gốc)
+        self.roi: Optional[np.ndarray] = None   # [x0, y0, x1, y1] float, có thể ra ngoài frame
+        self.roi_frames = 0
+        self.full_frames = 0
+        self.losses = 0
+
+    @property
+    def active(self) -> bool:
+        return self.roi is not None
+
+    def configure(self, output_size: int, padding: float, smoothing: float):
+        self.output_size = output_size
+        self.padding = padding
+        self.smoothing = smoothing
+
+    def reset(self):
+        self.roi = None
+
+    def lost(self):
+        """Không thấy mặt trong ROI → quay lại detect cả frame"""
+        self.roi = None
+        self.losses += 1
+
+    def crop_box(self, frame_shape: Tuple[int, ...]) -> Box:
+        """ROI hiện tại, dịch vào trong frame (giữ hình vuông nếu frame đủ lớn)"""
+        h, w = frame_shape[:2]
+        x0, y0, x1, y1 = self.roi
+        side = min(x1 - x0, w, h)
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        x0 = int(round(min(max(cx - side / 2, 0), w - side)))
+        y0 = int(round(min(max(cy - side / 2, 0), h - side)))
+        side = int(round(side))
+        return x0, y0, min(x0 + side, w), min(y0 + side, h)
+
+    def target_size(self, box: Box) -> Tuple[int, int]:
+        """Kích thước ảnh đưa vào landmarker (giữ tỉ lệ, không phóng to quá ROI)"""
+        bw, bh = box[2] - box[0], box[3] - box[1]
+        side = min(self.output_size, max(bw, bh))
+        scale = side / max(bw, bh)
+        return max(1, int(round(bw * scale))), max(1, int(round(bh * scale)))
+
+    @staticmethod
+    def to_frame(points: np.ndarray, box: Box, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """Landmarks normalized theo ROI → normalized theo cả frame (sửa tại chỗ)"""
+        h, w = frame_shape[:2]
+        x0, y0, x1, y1 = box
+        bw, bh = x1 - x0, y1 - y0
+        points[:, 0] = (x0 + points[:, 0] * bw) / w
+        points[:, 1] = (y0 + points[:, 1] * bh) / h
+        points[:, 2] *= bw / w   # z của MediaPipe cùng thang với x
+        return points
+
+    def update(self, points: np.ndarray, frame_shape: Tuple[int, ...]):
+        """Cập nhật ROI từ landmarks (normalized theo cả frame) vừa detect"""
+        h, w = frame_shape[:2]
+        xs = points[:, 0] * w
+        ys = points[:, 1] * h
+        fx0, fx1 = float(xs.min()), float(xs.max())
+        fy0, fy1 = float(ys.min()), float(ys.max())
+        face_side = max(fx1 - fx0, fy1 - fy0)
+        side = max(face_side * (1 + 2 * self.padding), self.min_size)
+        cx, cy = (fx0 + fx1) / 2, (fy0 + fy1) / 2
+        target = np.array([cx - side / 2, cy - side / 2, cx + side / 2, cy + side / 2])
+
+        if self.roi is None:
+            self.roi = target
+            return
+        roi = self.roi
+        # Mặt sắp ra khỏi ROI (chuyển động nhanh) → nhảy thẳng tới ROI mới
+        margin = face_side * self.padding * 0.5
+        if (fx0 - margin < roi[0] or fy0 - margin < roi[1] or
+                fx1 + margin > roi[2] or fy1 + margin > roi[3]):
+            self.roi = target
+            return
+        # Thay đổi nhỏ → giữ nguyên (ROI ổn định khi ngồi yên)
+        if np.abs(target - roi).max() < self.deadband * (roi[2] - roi[0]):
+            return
+        self.roi = roi + (1 - self.smoothing) * (target - roi)
+
+    def get_stats(self) -> Dict:
+        total = self.roi_frames + self.full_frames
+        return {
+            'roi_frames': self.roi_frames,
+            'full_frames': self.full_frames,
+            'roi_ratio': round(self.roi_frames / total, 3) if total else 0.0,
+            'losses': self.losses,
+        }
@@ -0,0 +1,184 @@
+"""
+Frame Pool - Tái sử dụng buffer frame thay vì cấp phát mới mỗi frame
+- FramePool: N buffer cố định (CAMERA_HEIGHT x CAMERA_WIDTH x 3), camera đọc thẳng vào
+- PooledFrame: đếm tham chiếu; buffer về pool khi mọi bên giữ (queue AI, latest
+  frame cho display, result mới nhất) đều release()
+- Pool hết buffer → cấp phát tạm 1 frame ngoài pool (đếm vào misses), không chặn camera
+- ScratchBuffers: buffer riêng của 1 thread cho resize / cvtColor (dst=...)
+- FrameEnvelope: buffer + thời điểm capture (monotonic), số thứ tự, nguồn - đi cùng frame
+  qua queue AI tới result (latency tính từ lúc capture, không phải lúc AI xử lý xong)
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class PooledFrame:
+    """1 buffer frame có đếm tham chiếu
+
+    Quy ước: ai nhận PooledFrame (acquire / retain) thì phải release() đúng 1 lần.
+    Sau khi release, không được dùng .array nữa (buffer có thể đã bị ghi đè).
+    """
+
+    __slots__ = ('array', '_pool', '_refs')
+
+    def __init__(self, array: np.ndarray, pool: 'FramePool' = None):
+        self.array = array
+        self._pool = pool
+        self._refs = 1
+
+    @property
+    def pooled(self) -> bool:
+        return self._pool is not None
+
+    def retain(self) -> 'PooledFrame':
+        if self._pool is None:
+            self._refs += 1   # Frame ngoài pool: chỉ để cân bằng retain / release
+        else:
+            self._pool._retain(self)
+        return self
+
+    def release(self):
+        if self._pool is None:
+            self._refs -= 1
+        else:
+            self._pool._release(self)
+
+
+class FramePool:
+    """Pool buffer frame kích thước cố định, thread-safe"""
+
+    def __init__(self, shape: Tuple[int, ...], size: int, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.size = size
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._free: List[PooledFrame] = [
+            PooledFrame(np.empty(self.shape, dtype), self) for _ in range(size)
+        ]
+        self.misses = 0    # Số lần pool hết buffer → cấp phát ngoài pool
+
+    def acquire(self) -> PooledFrame:
+        """Lấy 1 buffer (refcount = 1); hết buffer → frame ngoài pool"""
+        with self._lock:
+            if self._free:
+                frame = self._free.pop()
+                frame._refs = 1
+                return frame
+            self.misses += 1
+        return PooledFrame(np.empty(self.shape, self.dtype))
+
+    def resize(self, shape: Tuple[int, ...]):
+        """Đổi kích thước frame (camera trả resolution khác / đổi preset)
+
+        Buffer cũ đang được giữ sẽ bị bỏ khi release, không quay lại pool.
+        """
+        shape = tuple(shape)
+        if shape == self.shape:
+            return
+        with self._lock:
+            self.shape = shape
+            self._free = [PooledFrame(np.empty(shape, self.dtype), self)
+                          for _ in range(self.size)]
+
+    def _retain(self, frame: PooledFrame):
+        with self._lock:
+            frame._refs += 1
+
+    def _release(self, frame: PooledFrame):
+        with self._lock:
+            frame._refs -= 1
+            if frame._refs == 0 and frame.array.shape == self.shape:
+                self._free.append(frame)
+            elif frame._refs < 0:
+                raise RuntimeError("PooledFrame bị release nhiều hơn retain")
+
+    @property
+    def available(self) -> int:
+        return len(self._free)
+
+    def get_stats(self) -> Dict:
+        return {
+            'shape': self.shape,
+            'size': self.size,
+            'available': len(self._free),
+            'in_use': self.size - len(self._free),
+            'misses': self.misses,
+        }
+
+
+class ScratchBuffers:
+    """Buffer tạm theo tên của 1 thread (không chia sẻ giữa các thread)
+
+    buffers.get('small', (h, w, 3)) luôn trả cùng 1 mảng cho cùng shape,
+    chỉ cấp phát lại khi shape đổi (vd. adaptive quality đổi PROCESSING_WIDTH).
+    """
+
+    def __init__(self, dtype=np.uint8):
+        self.dtype = dtype
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def get(self, name: str, shape: Tuple[int, ...]) -> np.ndarray:
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape):
+            buffer = np.empty(shape, self.dtype)
+            self._buffers[name] = buffer
+        return buffer
+
+
+class FrameEnvelope:
+    """1 frame trên pipeline: buffer + metadata lúc capture
+
+    retain() / release() chuyển thẳng cho buffer (cùng quy ước với PooledFrame) nên
+    envelope đi qua queue AI, latest frame, result mới nhất thay cho PooledFrame.
+    Metadata không đổi sau khi tạo → các thread dùng chung 1 envelope.
+    """
+
+    __slots__ = ('buffer', 'seq', 'source_id', 'capture_ts', 'capture_time', 'dequeue_ts')
+
+    def __init__(self, buffer: PooledFrame, seq: int = 0, source_id: str = '',
+                 capture_ts: float = None, capture_time: float = None):
+        self.buffer = buffer
+        self.seq = seq                  # Số thứ tự frame của nguồn (nhảy cóc = frame bị bỏ)
+        self.source_id = source_id
+        # time.monotonic() lúc đọc xong frame: đo khoảng thời gian / latency
+        self.capture_ts = time.monotonic() if capture_ts is None else capture_ts
+        # Epoch cùng thời điểm: timestamp ghi DB / hiển thị
+        self.capture_time = time.time() if capture_time is None else capture_time
+        self.dequeue_ts = 0.0           # time.monotonic() lúc AI thread lấy khỏi queue
+
+    @classmethod
+    def wrap(cls, item, source_id: str = '') -> 'FrameEnvelope':
+        """Item của frame queue (envelope / PooledFrame / ndarray) → envelope
+
+        Nguồn không gắn metadata (test, code cũ) → thời điểm capture = lúc wrap.
+        """
+        if isinstance(item, FrameEnvelope):
+            return item
+        if not isinstance(item, PooledFrame):
+            item = PooledFrame(item)
+        return cls(item, source_id=source_id)
+
+    @property
+    def array(self) -> np.ndarray:
+        return self.buffer.array
+
+    def age_ms(self, now: float = None) -> float:
+        """Thời gian từ lúc capture tới now (time.monotonic, mặc định: bây giờ)"""
+        if now is None:
+            now = time.monotonic()
+        return (now - self.capture_ts) * 1000
+
+    def retain(self) -> 'FrameEnvelope':
+        self.buffer.retain()
+        return self
+
+    def release(self):
+        self.buffer.release()
+
+
+def frame_array(item) -> Optional[np.ndarray]:
+    """ndarray của 1 item trong frame queue (FrameEnvelope, PooledFrame hoặc ndarray thường)"""
+    return item.array if isinstance(item, (FrameEnvelope, PooledFrame)) else item
@@ -0,0 +1,176 @@
+"""
+Live Stream - Face / Pose Landmarker ở LIVE_STREAM mode (detect_async + callback)
+- AI thread chỉ gửi frame (không chờ inference) → camera → AI → MediaPipe luôn có việc
+- Timestamp là thời điểm capture thật của frame (FrameEnvelope.capture_ts, ms) thay vì bộ đếm +33
+- Callback chạy trên thread của MediaPipe: chỉ ghi kết quả, AI thread lấy ra bằng poll()
+  rồi ráp result dict như VIDEO mode (drowsiness / posture / focus không chạy ở callback)
+- Kết quả trả ra đúng thứ tự frame; frame không chạy landmarker (skip) cũng xếp hàng
+- Tự giới hạn số frame đang chờ (LIVE_MAX_IN_FLIGHT); frame skip tới khi hàng đợi đầy
+  thì bỏ luôn (không giữ buffer của frame pool)
+- detect_async có thể bỏ input khi bận (không đảm bảo mỗi frame 1 callback) → frame chờ
+  quá LIVE_DEADLINE_MS coi như thiếu callback, không chặn hàng đợi mãi
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List
+
+from core.frame_pool import FrameEnvelope
+
+
+class LiveFrame:
+    """1 frame đã gửi vào pipeline async, chờ callback của face / pose"""
+
+    __slots__ = ('timestamp_ms', 'item', 'face', 'pose', 'face_result', 'pose_result',
+                 'face_missed', 'pose_missed', 'submitted', 'face_ms', 'pose_ms')
+
+    def __init__(self, timestamp_ms: int, item: FrameEnvelope, face: bool, pose: bool):
+        self.timestamp_ms = timestamp_ms
+        self.item = item            # Buffer frame, giữ tới khi ráp xong result
+        self.face = face            # Có gửi cho face landmarker
+        self.pose = pose
+        self.face_result = None
+        self.pose_result = None
+        self.face_missed = False    # Không có callback (MediaPipe bỏ input, landmarker tạo lại...)
+        self.pose_missed = False
+        self.submitted = time.perf_counter()
+        self.face_ms = 0.0          # Gửi → callback
+        self.pose_ms = 0.0
+
+    @property
+    def detecting(self) -> bool:
+        return self.face or self.pose
+
+    @property
+    def complete(self) -> bool:
+        return ((not self.face or self.face_result is not None or self.face_missed) and
+                (not self.pose or self.pose_result is not None or self.pose_missed))
+
+
+class LiveStreamBackend:
+    """Ghép callback async với frame đã gửi (AI thread gọi submit / poll)"""
+
+    def __init__(self, max_in_flight: int = 2, deadline_ms: float = 500.0):
+        self.max_in_flight = max_in_flight
+        self.deadline_ms = deadline_ms   # Gửi → callback lâu hơn → coi như bị bỏ
+        self._lock = threading.Lock()
+        self._pending: Deque[LiveFrame] = deque()    # Theo thứ tự gửi
+        self._by_timestamp: Dict[int, LiveFrame] = {}
+        self._last_timestamp_ms = -1
+        self.submitted = 0
+        self.completed = 0
+        self.missed = 0
+        self.timed_out = 0
+        self.total_ms = 0.0
+
+    def timestamp_ms(self, capture_ts: float) -> int:
+        """Thời điểm capture (time.monotonic, giây) → ms tăng chặt cho MediaPipe"""
+        timestamp_ms = int(capture_ts * 1000)
+        if timestamp_ms <= self._last_timestamp_ms:
+            timestamp_ms = self._last_timestamp_ms + 1
+        self._last_timestamp_ms = timestamp_ms
+        return timestamp_ms
+
+    @property
+    def in_flight(self) -> int:
+        """Số frame đang chờ inference (không tính frame skip đang xếp hàng)"""
+        with self._lock:
+            return sum(1 for live in self._pending if live.detecting and not live.complete)
+
+    @property
+    def queued(self) -> int:
+        """Tổng số frame đang giữ (chờ inference + frame skip xếp hàng sau)"""
+        return len(self._pending)
+
+    def submit(self, timestamp_ms: int, item: FrameEnvelope, face: bool, pose: bool) -> LiveFrame:
+        """Đăng ký frame trước khi gọi detect_async (backend nhận tham chiếu của item)"""
+        live = LiveFrame(timestamp_ms, item, face, pose)
+        with self._lock:
+            self._pending.append(live)
+            if live.detecting:
+                self._by_timestamp[timestamp_ms] = live
+                self.submitted += 1
+        return live
+
+    def on_face(self, result, image, timestamp_ms: int):
+        """result_callback của face landmarker (thread MediaPipe)"""
+        with self._lock:
+            live = self._by_timestamp.get(timestamp_ms)
+            if live is not None and live.face_result is None:
+                live.face_result = result
+                live.face_ms = (time.perf_counter() - live.submitted) * 1000
+                self._forget(live)
+
+    def on_pose(self, result, image, timestamp_ms: int):
+        """result_callback của pose landmarker (thread MediaPipe)"""
+        with self._lock:
+            live = self._by_timestamp.get(timestamp_ms)
+            if live is not None and live.pose_result is None:
+                live.pose_result = result
+                live.pose_ms = (time.perf_counter() - live.submitted) * 1000
+                self._forget(live)
+
+    def _forget(self, live: LiveFrame):
+        if live.complete:
+            self._by_timestamp.pop(live.timestamp_ms, None)
+
+    def abandon(self, face: bool = True, pose: bool = True):
+        """Landmarker bị đóng / tạo lại → callback còn thiếu sẽ không tới nữa"""
+        with self._lock:
+            for live in self._pending:
+                if face and live.face and live.face_result is None:
+                    live.face_missed = True
+                if pose and live.pose and live.pose_result is None:
+                    live.pose_missed = True
+                self._forget(live)
+
+    def cancel(self, live: LiveFrame):
+        """Gửi frame thất bại (detect_async lỗi) → không chờ callback của frame này"""
+        with self._lock:
+            live.face_missed = live.face and live.face_result is None
+            live.pose_missed = live.pose and live.pose_result is None
+            self._forget(live)
+
+    def _expire(self, live: LiveFrame, now: float) -> bool:
+        """Quá deadline mà còn thiếu callback → đánh dấu thiếu (callback tới muộn bị bỏ qua)"""
+        if (now - live.submitted) * 1000 < self.deadline_ms:
+            return False
+        live.face_missed = live.face and live.face_result is None
+        live.pose_missed = live.pose and live.pose_result is None
+        self._forget(live)
+        self.timed_out += 1
+        return True
+
+    def poll(self) -> List[LiveFrame]:
+        """Frame đã đủ kết quả / quá deadline, theo thứ tự gửi (dừng ở frame đầu tiên còn chờ)"""
+        ready = []
+        now = time.perf_counter()
+        with self._lock:
+            while self._pending and (self._pending[0].complete or
+                                     self._expire(self._pending[0], now)):
+                live = self._pending.popleft()
+                if live.detecting:
+                    self.completed += 1
+                    if live.face_missed or live.pose_missed:
+                        self.missed += 1
+                    self.total_ms += max(live.face_ms, live.pose_ms)
+                ready.append(live)
+        return ready
+
+    def close(self):
+        """Bỏ mọi frame còn chờ (release buffer)"""
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+            self._by_timestamp.clear()
+        for live in pending:
+            live.item.release()
+
+    def get_stats(self) -> Dict:
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'missed': self.missed,
+            'timed_out': self.timed_out,
+            'avg_ms': round(self.total_ms / self.completed, 2) if self.completed else 0.0,
+        }
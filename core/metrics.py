@@ -0,0 +1,321 @@
+"""
+Metrics - Counter / Gauge / Histogram cho pipeline, xuất theo Prometheus text format
+- Ghi metric luôn bật (1 lock nhỏ / lần ghi), HTTP endpoint bật theo METRICS_ENABLED
+- GET http://METRICS_HOST:METRICS_PORT/metrics → Prometheus scrape được
+- Mọi metric có label seat=METRICS_SEAT_ID để phân biệt các máy trong 1 lớp học
+
+Metric của pipeline được khai báo ở cuối file (FRAMES_CAPTURED, DB_BATCH_SIZE...)
+để các thread chỉ cần import và ghi.
+"""
+import math
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import performance_config as perf
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Latency (ms): đủ chi tiết quanh ngưỡng 1 frame ở 15-30 FPS
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 15, 20, 30, 50, 75, 100, 150, 250, 500, 1000)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Metric có thể có label; mỗi tổ hợp label là 1 child riêng"""
+
+    kind = ''
+    family_suffix = ''   # Hậu tố tên trong # HELP / # TYPE (phải trùng tên sample)
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], '_Metric'] = {}
+
+    def _new_child(self) -> '_Metric':
+        raise NotImplementedError
+
+    def labels(self, *values, **kwvalues) -> '_Metric':
+        if kwvalues:
+            values = tuple(kwvalues[n] for n in self.labelnames)
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} cần label {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> List[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        """[(suffix, tên label thêm, giá trị label thêm, value)] của 1 child"""
+        raise NotImplementedError
+
+    def collect(self) -> List[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        if not self.labelnames:
+            return self._samples()
+        samples = []
+        for key, child in sorted(self._children.items()):
+            for suffix, names, values, value in child._samples():
+                samples.append((suffix, self.labelnames + names, key + values, value))
+        return samples
+
+
+class Counter(_Metric):
+    """Chỉ tăng (frames captured, frames dropped...)"""
+
+    kind = 'counter'
+    family_suffix = '_total'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+
+    def _new_child(self):
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1):
+        if amount < 0:
+            raise ValueError("Counter chỉ tăng")
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def _samples(self):
+        return [('_total', (), (), self._value)]
+
+
+class Gauge(_Metric):
+    """Giá trị tức thời (FPS, độ sâu queue, quality level)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_child(self):
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Tính giá trị lúc scrape (vd. queue.qsize)"""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception:
+                return math.nan
+        return self._value
+
+    def _samples(self):
+        return [('', (), (), self.value)]
+
+
+class Histogram(_Metric):
+    """Phân bố giá trị theo bucket cộng dồn (latency, kích thước batch)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)   # Bucket cuối = +Inf
+        self._sum = 0.0
+
+    def _new_child(self):
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def _samples(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            samples.append(('_bucket', ('le',), (_format_value(bound),), cumulative))
+        samples.append(('_sum', (), (), total))
+        samples.append(('_count', (), (), cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Tập các metric của process, render ra Prometheus text format"""
+
+    def __init__(self, namespace: str = None, const_labels: Dict[str, str] = None):
+        self.namespace = namespace if namespace is not None else perf.METRICS_NAMESPACE
+        self.const_labels = dict(const_labels or {})
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames, **kwargs) -> _Metric:
+        full_name = f"{self.namespace}_{name}" if self.namespace else name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = cls(full_name, documentation, labelnames, **kwargs)
+                self._metrics[full_name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{full_name} đã đăng ký là {metric.kind}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS_MS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        const_names = tuple(self.const_labels)
+        const_values = tuple(self.const_labels.values())
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            samples = metric.collect()
+            if not samples:
+                continue
+            family = metric.name + metric.family_suffix
+            lines.append(f"# HELP {family} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {family} {metric.kind}")
+            for suffix, names, values, value in samples:
+                labels = _format_labels(const_names + names, const_values + values)
+                lines.append(f"{metric.name}{suffix}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# ============ HTTP ENDPOINT ============
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Không in mỗi lần scrape
+
+
+class MetricsServer:
+    """HTTP server nền phục vụ /metrics"""
+
+    def __init__(self, registry: MetricsRegistry = None, host: str = None, port: int = None):
+        self.registry = registry or REGISTRY
+        self.host = host or perf.METRICS_HOST
+        self.port = perf.METRICS_PORT if port is None else port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': self.registry})
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        except OSError as e:
+            print(f"⚠️  Không mở được metrics endpoint {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]  # port=0 → port được cấp
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"📈 Metrics: http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# ============ PIPELINE METRICS ============
+
+REGISTRY = MetricsRegistry(const_labels={'seat': perf.METRICS_SEAT_ID or socket.gethostname()})
+
+FRAMES_CAPTURED = REGISTRY.counter('frames_captured', "Frame đọc được từ nguồn")
+FRAMES_DROPPED = REGISTRY.counter(
+    'frames_dropped', "Frame bị bỏ vì queue đầy", ('queue',))
+FRAMES_SKIPPED = REGISTRY.counter(
+    'frames_skipped', "Frame không chạy landmarker do FACE/POSE_PROCESS_INTERVAL", ('stage',))
+RESULT_CACHE_HITS = REGISTRY.counter(
+    'result_cache_hits', "Frame trả về kết quả cache (không chạy model nào)")
+DETECTOR_LATENCY = REGISTRY.histogram(
+    'detector_latency_ms', "Thời gian chạy từng detector (ms)", ('detector',))
+FRAME_AGE = REGISTRY.histogram(
+    'frame_age_ms', "Tuổi frame tính từ lúc capture: AI nhận frame (dequeue) / có result (result)",
+    ('stage',))
+PIPELINE_FPS = REGISTRY.gauge('fps', "FPS hiện tại của từng thread", ('thread',))
+QUALITY_LEVEL = REGISTRY.gauge('quality_level', "Mức adaptive quality hiện tại (0 = cao nhất)")
+DB_BATCH_SIZE = REGISTRY.histogram(
+    'db_batch_size', "Số record trong mỗi batch ghi DB", buckets=BATCH_SIZE_BUCKETS)
+DB_RECORDS_WRITTEN = REGISTRY.counter('db_records_written', "Record đã ghi vào DB")
+DB_RECORDS_DROPPED = REGISTRY.counter(
+    'db_records_dropped', "Record không được ghi (queue đầy / lấy mẫu)", ('reason',))
+DB_ERRORS = REGISTRY.counter('db_errors', "Batch ghi DB thất bại")
+DB_QUEUE_DEPTH = REGISTRY.gauge('db_queue_depth', "Số record đang chờ ghi DB")
@@ -0,0 +1,126 @@
+"""
+Motion Gate - Chỉ chạy landmarker khi vùng ảnh của nó thực sự thay đổi
+- Thumbnail xám nhỏ (MOTION_THUMBNAIL_SIZE) của vùng mặt (ROI lần detect trước) / cả frame
+- So với thumbnail lúc landmarker chạy lần trước: chênh lệch trung bình > MOTION_THRESHOLD
+  → detect ngay; ngồi yên → dùng lại landmarks trong cache
+- Cache không bao giờ cũ quá MOTION_MAX_STALE_FRAMES frame (mất mặt, ánh sáng đổi chậm...)
+- Rẻ: 2 bước resize vào buffer dùng lại → vài chục micro giây / vùng
+"""
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from core.frame_pool import ScratchBuffers
+
+Box = Tuple[int, int, int, int]   # x0, y0, x1, y1 (pixel)
+
+
+class _Region:
+    """Trạng thái gate của 1 landmarker (face / pose)"""
+
+    __slots__ = ('reference', 'box', 'stale', 'score', 'runs', 'skips')
+
+    def __init__(self):
+        self.reference: Optional[np.ndarray] = None   # Thumbnail lúc chạy lần trước
+        self.box: Optional[Box] = None
+        self.stale = 0          # Số frame liên tiếp đã dùng lại cache
+        self.score = 0.0        # Chênh lệch lần đo gần nhất
+        self.runs = {'first': 0, 'motion': 0, 'stale': 0}
+        self.skips = 0
+
+
+class MotionGate:
+    """Quyết định frame nào cần chạy landmarker (chỉ dùng trong AI thread)"""
+
+    def __init__(self, threshold: float = 4.0, max_stale_frames: int = 15,
+                 thumbnail_size: int = 32):
+        self.threshold = threshold              # Chênh lệch xám trung bình (0-255)
+        self.max_stale_frames = max_stale_frames
+        self.thumbnail_size = thumbnail_size
+        self._buffers = ScratchBuffers()
+        self._regions: Dict[str, _Region] = {}
+
+    def configure(self, threshold: float, max_stale_frames: int, thumbnail_size: int):
+        if thumbnail_size != self.thumbnail_size:
+            self.reset()   # Thumbnail cũ khác kích thước → không so được
+        self.threshold = threshold
+        self.max_stale_frames = max_stale_frames
+        self.thumbnail_size = thumbnail_size
+
+    def reset(self):
+        """Quên mốc so sánh → lần gọi tới luôn chạy landmarker"""
+        for region in self._regions.values():
+            region.reference = None
+            region.box = None
+            region.stale = 0
+
+    def _thumbnail(self, frame: np.ndarray, box: Optional[Box]) -> np.ndarray:
+        if box is not None:
+            x0, y0, x1, y1 = box
+            frame = frame[y0:y1, x0:x1]
+        size = self.thumbnail_size
+        # INTER_LINEAR về 2x (chỉ đọc vài pixel nguồn) rồi INTER_AREA 2:1 (đường nhanh hệ số nguyên)
+        # → mỗi pixel thumbnail trung bình ~16 mẫu, đủ khử nhiễu cảm biến; INTER_AREA thẳng
+        # từ frame gốc chậm hơn ~10 lần
+        sample = cv2.resize(frame, (size * 2, size * 2),
+                            dst=self._buffers.get('sample', (size * 2, size * 2, 3)),
+                            interpolation=cv2.INTER_LINEAR)
+        small = cv2.resize(sample, (size, size),
+                           dst=self._buffers.get('small', (size, size, 3)),
+                           interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY,
+                            dst=self._buffers.get('gray', (size, size)))
+
+    def should_run(self, name: str, frame: np.ndarray, box: Optional[Box] = None,
+                   eligible: bool = True) -> bool:
+        """True → chạy landmarker `name` ở frame này (frame thành mốc so sánh mới)
+
+        box: vùng cần theo dõi (None = cả frame)
+        eligible: False khi chưa tới lượt (vd. POSE_PROCESS_INTERVAL) → chỉ chạy nếu cache quá cũ
+        """
+        region = self._regions.get(name)
+        if region is None:
+            region = self._regions[name] = _Region()
+
+        if region.reference is None or box != region.box:
+            reason = 'first'    # Chưa có mốc / ROI mặt đã dời (mặt đã di chuyển)
+        elif region.stale + 1 >= self.max_stale_frames:
+            reason = 'stale'
+        elif not eligible:
+            region.stale += 1
+            region.skips += 1
+            return False
+        else:
+            reason = None
+
+        thumbnail = self._thumbnail(frame, box)
+        if reason is None:
+            region.score = cv2.norm(thumbnail, region.reference, cv2.NORM_L1) / thumbnail.size
+            if region.score <= self.threshold:
+                region.stale += 1
+                region.skips += 1
+                return False
+            reason = 'motion'
+
+        if region.reference is None or region.reference.shape != thumbnail.shape:
+            region.reference = thumbnail.copy()
+        else:
+            np.copyto(region.reference, thumbnail)
+        region.box = box
+        region.stale = 0
+        region.runs[reason] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Dict]:
+        stats = {}
+        for name, region in self._regions.items():
+            runs = sum(region.runs.values())
+            total = runs + region.skips
+            stats[name] = {
+                **region.runs,
+                'skipped': region.skips,
+                'skip_ratio': round(region.skips / total, 3) if total else 0.0,
+                'last_score': round(region.score, 2),
+            }
+        return stats
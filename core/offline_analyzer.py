@@ -0,0 +1,163 @@
+"""
+Offline Analyzer - Chấm điểm lại video buổi học đã ghi
+- Không camera, không hiển thị → tốc độ chỉ giới hạn bởi CPU
+- Video được chia thành các đoạn, phân phối cho nhiều process
+- Mỗi worker process giữ 1 bộ MediaPipe landmarker riêng
+- Kết quả từng frame được ghi vào database ngay khi mỗi đoạn xong
+"""
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from queue import Queue
+from typing import Iterable, Iterator, Optional, Tuple, List
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import performance_config as perf
+from config import database_config as db_cfg
+from core.ai_processor import AIProcessorThread
+from core.frame_source import VideoFileSource
+from database.db_manager import DatabaseManager, result_to_record
+from database.rollup import RollupAggregator
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# AIProcessorThread (không start thread) của worker process hiện tại
+_worker_processor: Optional[AIProcessorThread] = None
+
+
+def analyze_frames(processor: AIProcessorThread,
+                   frames: Iterable,
+                   fps: float,
+                   start_epoch: float,
+                   first_frame_index: int = 0) -> Iterator[dict]:
+    """Chạy logic của AIProcessorThread như 1 hàm thường trên dãy frame
+
+    Args:
+        processor: AIProcessorThread đã _init_models() (không cần start)
+        frames: iterable các frame BGR
+        fps: FPS của video (để tính timestamp thật)
+        start_epoch: thời điểm bắt đầu ghi video (epoch giây)
+        first_frame_index: index của frame đầu tiên trong video
+
+    Yields:
+        dict: result giống AIProcessorThread, timestamp = thời điểm ghi frame
+    """
+    processor._timestamp_interval_ms = max(1, int(round(1000.0 / fps)))
+    for offset, frame in enumerate(frames):
+        # Detector theo thời gian chạy theo thời điểm trong video (không theo tốc độ xử lý)
+        video_time = (first_frame_index + offset) / fps
+        result = processor._process_frame(frame, video_time)
+        if result is None:
+            continue
+        result['timestamp'] = start_epoch + video_time
+        yield result
+
+
+def _init_worker():
+    """Khởi tạo 1 lần cho mỗi worker process: tạo landmarkers riêng"""
+    global _worker_processor
+    os.chdir(PROJECT_ROOT)  # Đường dẫn model là tương đối
+    processor = AIProcessorThread(Queue(maxsize=1), Queue(maxsize=1))
+    if not processor._init_models():
+        raise RuntimeError("Không khởi tạo được AI models trong worker")
+    _worker_processor = processor
+
+
+def _analyze_chunk(task: Tuple) -> Tuple[int, List[Tuple]]:
+    """Worker: xử lý 1 đoạn [start_frame, end_frame) và trả về các DB record"""
+    video_path, start_frame, end_frame, fps, start_epoch, session_id = task
+    processor = _worker_processor
+    # Mỗi đoạn bắt đầu với trạng thái sạch (đoạn trước có thể là chỗ khác của video)
+    processor.reset_state()
+
+    source = VideoFileSource(video_path, pace='fast',
+                             start_frame=start_frame, end_frame=end_frame)
+    if not source.open():
+        return start_frame, []
+    try:
+        records = [
+            result_to_record(result, session_id)
+            for result in analyze_frames(processor, source.frames(),
+                                         fps, start_epoch, start_frame)
+        ]
+    finally:
+        source.release()
+    return start_frame, records
+
+
+class OfflineAnalyzer:
+    """Phân tích video đã ghi trên nhiều CPU core, ghi kết quả vào SQLite"""
+
+    def __init__(self, db_path: str = "data/study_behavior.db",
+                 num_workers: int = None,
+                 chunk_seconds: float = None):
+        self.num_workers = num_workers or perf.OFFLINE_NUM_WORKERS or os.cpu_count() or 1
+        self.chunk_seconds = chunk_seconds or perf.OFFLINE_CHUNK_SECONDS
+        self.db_manager = DatabaseManager(db_path)
+        self.db_manager.connect()
+        self.db_manager.create_tables()
+        # 'spawn': MediaPipe không an toàn với fork sau khi đã có thread
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+
+    @staticmethod
+    def probe_video(video_path: str) -> Tuple[float, int]:
+        """Lấy (fps, tổng số frame) của video; số frame <= 0 nếu container không báo"""
+        return VideoFileSource.probe(video_path)
+
+    def _make_tasks(self, video_path: str, fps: float, total: int,
+                    start_epoch: float, session_id: str) -> List[Tuple]:
+        if total <= 0:
+            # Không biết độ dài → 1 đoạn duy nhất đọc tới hết
+            return [(video_path, 0, None, fps, start_epoch, session_id)]
+        chunk = max(1, int(self.chunk_seconds * fps))
+        return [
+            (video_path, start, min(start + chunk, total), fps, start_epoch, session_id)
+            for start in range(0, total, chunk)
+        ]
+
+    def analyze(self, video_path: str,
+                session_id: Optional[str] = None,
+                start_epoch: Optional[float] = None) -> int:
+        """Phân tích 1 video, trả về số record đã ghi
+
+        Args:
+            video_path: đường dẫn video
+            session_id: mặc định = tên file (không đuôi)
+            start_epoch: thời điểm bắt đầu ghi; mặc định = mtime - độ dài video
+        """
+        video_path = os.path.abspath(video_path)
+        fps, total = self.probe_video(video_path)
+        if session_id is None:
+            session_id = os.path.splitext(os.path.basename(video_path))[0]
+        if start_epoch is None:
+            duration = total / fps if total > 0 else 0.0
+            start_epoch = os.path.getmtime(video_path) - duration
+
+        tasks = self._make_tasks(video_path, fps, total, start_epoch, session_id)
+        print(f"🎞️  {os.path.basename(video_path)}: {total} frames @ {fps:.1f} FPS "
+              f"→ {len(tasks)} đoạn / {self.num_workers} workers")
+
+        t0 = time.time()
+        written = 0
+        futures = [self._executor.submit(_analyze_chunk, task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), start=1):
+            _, records = future.result()
+            # Ghi ngay khi mỗi đoạn xong (1 commit / đoạn, kèm rollup)
+            # Mỗi đoạn 1 aggregator mới: các đoạn về không theo thứ tự
+            rollup = (RollupAggregator(db_cfg.ROLLUP_BLINK_THRESHOLD)
+                      if db_cfg.ENABLE_ROLLUPS else None)
+            written += self.db_manager.insert_records(records, rollup)
+            elapsed = time.time() - t0
+            print(f"  ✅ {done}/{len(tasks)} đoạn - {written} records "
+                  f"({written / elapsed if elapsed > 0 else 0:.1f} frames/s)")
+        return written
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.db_manager.close()
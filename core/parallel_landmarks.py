@@ -0,0 +1,144 @@
+"""
+Parallel Landmarks - Face / Pose Landmarker chạy song song trên 2 worker thread
+- MediaPipe nhả GIL khi chạy graph native → 2 model chạy thật sự song song trên CPU đa nhân
+- AI thread gửi job cho cả 2 rồi chờ có giới hạn (PARALLEL_DEADLINE_MS)
+- Bên nào trễ hạn: tick đó dùng cache; job trễ vẫn chạy nốt trên worker (không huỷ được
+  lời gọi native) và kết quả bị bỏ - worker còn bận thì tick sau bỏ qua landmarker đó
+- Mỗi landmarker chỉ được gọi từ đúng 1 thread tại 1 thời điểm (VIDEO mode cần tuần tự)
+"""
+import threading
+import time
+from queue import Queue
+from typing import Callable, Dict, Optional
+
+
+class LandmarkJob:
+    """1 lần gọi landmarker trên worker thread"""
+
+    __slots__ = ('fn', 'args', 'done', 'result', 'error', 'start', 'end')
+
+    def __init__(self, fn: Callable, args: tuple):
+        self.fn = fn
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.start = 0.0
+        self.end = 0.0
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+
+class LandmarkWorker(threading.Thread):
+    """Worker chạy tuần tự các job của 1 landmarker"""
+
+    def __init__(self, name: str, tracer=None):
+        super().__init__(name=f"landmarks-{name}", daemon=True)
+        self.detector = name
+        self.tracer = tracer
+        self._jobs: Queue = Queue()
+        self._current: Optional[LandmarkJob] = None
+        self.jobs = 0
+        self.late = 0
+        self.total_ms = 0.0
+
+    @property
+    def busy(self) -> bool:
+        job = self._current
+        return job is not None and not job.done.is_set()
+
+    def submit(self, fn: Callable, *args) -> LandmarkJob:
+        job = LandmarkJob(fn, args)
+        self._current = job
+        self._jobs.put(job)
+        return job
+
+    def run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            job.start = time.perf_counter()
+            try:
+                job.result = job.fn(*job.args)
+            except Exception as e:
+                job.error = e
+            job.end = time.perf_counter()
+            if self.tracer is not None:
+                self.tracer.record(f'{self.detector}_detect', job.start, job.end)
+            self.jobs += 1
+            self.total_ms += job.elapsed_ms
+            job.done.set()
+
+    def stop(self):
+        self._jobs.put(None)
+
+
+class ParallelLandmarks:
+    """Điều phối các LandmarkWorker (chỉ AI thread gọi)"""
+
+    def __init__(self, names=('face', 'pose'), tracer=None):
+        self.workers: Dict[str, LandmarkWorker] = {
+            name: LandmarkWorker(name, tracer) for name in names
+        }
+        self._started = False
+
+    def start(self):
+        if not self._started:
+            for worker in self.workers.values():
+                worker.start()
+            self._started = True
+
+    def stop(self, timeout: float = 1.0):
+        if not self._started:
+            return
+        for worker in self.workers.values():
+            worker.stop()
+        for worker in self.workers.values():
+            worker.join(timeout)
+        self._started = False
+
+    def busy(self, name: str) -> bool:
+        """Worker còn chạy job trễ hạn → chưa được gọi landmarker này"""
+        return self.workers[name].busy
+
+    def submit(self, name: str, fn: Callable, *args) -> LandmarkJob:
+        self.start()
+        return self.workers[name].submit(fn, *args)
+
+    def wait(self, jobs: Dict[str, LandmarkJob], timeout_ms: float) -> Dict[str, Optional[LandmarkJob]]:
+        """Chờ chung 1 deadline → {name: job xong} hoặc None nếu trễ hạn
+
+        Lỗi trong job được raise lại ở thread gọi (giống chạy tuần tự).
+        """
+        deadline = time.perf_counter() + timeout_ms / 1000
+        finished: Dict[str, Optional[LandmarkJob]] = {}
+        for name, job in jobs.items():
+            if job.done.wait(max(0.0, deadline - time.perf_counter())):
+                if job.error is not None:
+                    raise job.error
+                finished[name] = job
+            else:
+                self.workers[name].late += 1
+                finished[name] = None
+        return finished
+
+    def wait_idle(self, timeout: float = 1.0):
+        """Chờ job trễ chạy xong (trước khi tạo lại / đóng landmarker)"""
+        deadline = time.perf_counter() + timeout
+        for worker in self.workers.values():
+            job = worker._current
+            if job is not None:
+                job.done.wait(max(0.0, deadline - time.perf_counter()))
+
+    def get_stats(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                'jobs': worker.jobs,
+                'late': worker.late,
+                'avg_ms': round(worker.total_ms / worker.jobs, 2) if worker.jobs else 0.0,
+            }
+            for name, worker in self.workers.items()
+        }
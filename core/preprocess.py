@@ -0,0 +1,118 @@
+"""
+Preprocess - Chuẩn bị frame cho MediaPipe: downscale + BGR→RGB
+- 1 lượt đọc frame camera: resize vào buffer dùng lại, đổi kênh ngay trên buffer nhỏ đó
+  (không tạo frame_small + frame_rgb riêng mỗi frame)
+- mp.Image chỉ tạo khi có landmarker dùng, và dùng chung cho face / pose của cùng frame
+- AI thread chỉ gọi khi ít nhất 1 landmarker chạy ở tick này
+- Thống kê thời gian đã tiết kiệm nhờ bỏ qua những frame không cần preprocess
+  (chỉ tick không landmarker nào dùng frame; tick dùng cache kết quả không tính,
+  tick face chạy trên vùng ROI do roi_preprocessor riêng đo)
+"""
+import time
+from typing import Dict, Tuple
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from core.frame_pool import ScratchBuffers
+
+
+class PreparedFrame:
+    """Frame đã downscale sang RGB cho 1 tick của AI thread"""
+
+    __slots__ = ('rgb', 'source_shape', '_mp_image')
+
+    def __init__(self, rgb: np.ndarray, source_shape: Tuple[int, ...]):
+        self.rgb = rgb
+        self.source_shape = source_shape
+        self._mp_image = None
+
+    @property
+    def mp_image(self) -> mp.Image:
+        """mp.Image (copy dữ liệu 1 lần), tạo khi landmarker đầu tiên cần"""
+        if self._mp_image is None:
+            self._mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=self.rgb)
+        return self._mp_image
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.rgb.shape[1], self.rgb.shape[0]
+
+
+class Preprocessor:
+    """Resize + đổi kênh màu vào buffer dùng lại (chỉ dùng trong 1 thread)"""
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self._buffers = ScratchBuffers()
+        self.frames = 0            # Số tick của AI thread
+        self.prepared = 0          # Số frame thực sự được preprocess
+        self.delegated = 0         # Tick chỉ preprocess vùng cắt (Preprocessor khác, vd. face ROI)
+        self.total_ms = 0.0
+
+    @staticmethod
+    def target_size(frame: np.ndarray, width: int, height: int,
+                    smart_resize: bool = True) -> Tuple[int, int]:
+        if smart_resize:
+            return width, height
+        # Giữ tỉ lệ, cạnh dài 320 (hành vi cũ khi tắt ENABLE_SMART_RESIZE)
+        h, w = frame.shape[:2]
+        scale = 320 / max(h, w)
+        return int(w * scale), int(h * scale)
+
+    def skip(self):
+        """Tick không có landmarker nào dùng frame → không preprocess (tính là tiết kiệm)"""
+        self.frames += 1
+
+    def delegate(self):
+        """Tick không cần cả frame nhưng landmarker dùng vùng cắt đã preprocess ở nơi khác
+        → không tính là tiết kiệm"""
+        self.frames += 1
+        self.delegated += 1
+
+    def run(self, frame: np.ndarray, size: Tuple[int, int]) -> PreparedFrame:
+        self.frames += 1
+        w, h = size
+        t0 = time.perf_counter()
+        rgb = cv2.resize(frame, (w, h), dst=self._buffers.get('rgb', (h, w, 3)),
+                         interpolation=cv2.INTER_LINEAR)
+        t_resized = time.perf_counter()
+        # Đổi kênh tại chỗ trên buffer nhỏ (rẻ, buffer còn nóng trong cache)
+        cv2.cvtColor(rgb, cv2.COLOR_BGR2RGB, dst=rgb)
+        t_done = time.perf_counter()
+        if self.tracer is not None:
+            self.tracer.record('resize', t0, t_resized)
+            self.tracer.record('cvtColor', t_resized, t_done)
+        self.prepared += 1
+        self.total_ms += (t_done - t0) * 1000
+        return PreparedFrame(rgb, frame.shape)
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.prepared if self.prepared else 0.0
+
+    def get_stats(self) -> Dict:
+        """Thời gian tiết kiệm = số tick bỏ qua x thời gian preprocess trung bình"""
+        skipped = self.frames - self.prepared - self.delegated
+        saved_ms = skipped * self.avg_ms
+        return {
+            'frames': self.frames,
+            'prepared': self.prepared,
+            'skipped': skipped,
+            'delegated': self.delegated,
+            'avg_ms': round(self.avg_ms, 3),
+            'saved_ms_total': round(saved_ms, 1),
+            'saved_ms_per_frame': round(saved_ms / self.frames, 3) if self.frames else 0.0,
+        }
+
+    def reset_stats(self):
+        self.frames = self.prepared = self.delegated = 0
+        self.total_ms = 0.0
+
+
+def legacy_preprocess(frame: np.ndarray, size: Tuple[int, int]) -> mp.Image:
+    """Cách cũ (resize + cvtColor ra mảng mới + mp.Image mỗi frame) - để benchmark so sánh"""
+    frame_small = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+    frame_rgb = cv2.cvtColor(frame_small, cv2.COLOR_BGR2RGB)
+    return mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
@@ -0,0 +1,232 @@
+"""
+Adaptive Quality Controller - Điều khiển vòng kín chất lượng xử lý AI
+- Đo AI FPS, độ bận (utilization) và latency từng stage theo cửa sổ thời gian
+- Quá tải → giảm 1 level (tắt blendshapes, giãn interval, giảm resolution, tắt pose...)
+- Dư tài nguyên đủ lâu → tăng lại 1 level
+- Hysteresis: 2 ngưỡng utilization + số cửa sổ liên tiếp + cooldown + backoff
+- Mỗi lần đổi level phát ra 1 QualityEvent cho các listener
+- Override của level so với config hiện tại lấy giá trị nhẹ hơn (lighter_setting)
+  → config đã nhẹ hơn level thì giảm level không làm pipeline nặng lên
+"""
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import performance_config as perf
+
+
+# Override của level chỉ được làm pipeline nhẹ đi so với config hiện tại
+_SIZE_KEYS = ('PROCESSING_WIDTH', 'PROCESSING_HEIGHT')
+
+
+def lighter_setting(name: str, override, current):
+    """Giá trị nhẹ hơn giữa override của level và config hiện tại
+
+    Interval → lớn hơn, kích thước xử lý → nhỏ hơn, cờ bật / tắt → AND (level chỉ tắt,
+    không bật lại tính năng config đã tắt). Key khác → override.
+    """
+    if isinstance(override, bool):
+        return override and bool(current)
+    if name.endswith('_INTERVAL'):
+        return max(override, current)
+    if name in _SIZE_KEYS:
+        return min(override, current)
+    return override
+
+
+@dataclass
+class QualityEvent:
+    """Sự kiện đổi quality level"""
+    timestamp: float
+    previous_level: int
+    level: int
+    reason: str                     # 'overload' | 'headroom' | 'manual'
+    fps: float = 0.0
+    utilization: float = 0.0
+    latency_ms: float = 0.0
+    stage_ms: Dict[str, float] = field(default_factory=dict)
+    overrides: Dict = field(default_factory=dict)
+
+
+class AdaptiveQualityController:
+    """Chọn quality level để AI thread giữ được target FPS
+
+    AI thread gọi record() sau mỗi frame; khi hết 1 cửa sổ đo, controller
+    quyết định giữ / giảm / tăng level. AI thread đọc overrides() để áp dụng.
+    """
+
+    def __init__(self, target_fps: float = None,
+                 levels: List[Dict] = None,
+                 start_level: int = None):
+        self.target_fps = target_fps or perf.AI_TARGET_FPS
+        self.levels = levels if levels is not None else perf.QUALITY_LEVELS
+        if not self.levels:
+            self.levels = [{}]
+        self.window_seconds = perf.QUALITY_WINDOW_SECONDS
+        self.downgrade_utilization = perf.QUALITY_DOWNGRADE_UTILIZATION
+        self.upgrade_utilization = perf.QUALITY_UPGRADE_UTILIZATION
+        self.downgrade_windows = perf.QUALITY_DOWNGRADE_WINDOWS
+        self.upgrade_windows = perf.QUALITY_UPGRADE_WINDOWS
+        self.cooldown_seconds = perf.QUALITY_COOLDOWN_SECONDS
+        self.max_upgrade_backoff = perf.QUALITY_MAX_UPGRADE_BACKOFF
+
+        start = perf.QUALITY_START_LEVEL if start_level is None else start_level
+        self.level = min(max(0, start), len(self.levels) - 1)
+
+        self._listeners: List[Callable[[QualityEvent], None]] = []
+        self.events: deque = deque(maxlen=50)
+
+        # Cửa sổ đo hiện tại
+        self._window_start: Optional[float] = None
+        self._frames = 0
+        self._busy = 0.0
+        self._stage_totals: Dict[str, float] = {}
+        self._stage_counts: Dict[str, int] = {}
+
+        # Hysteresis
+        self._overload_streak = 0
+        self._headroom_streak = 0
+        self._last_change = 0.0
+        self._last_change_reason = None
+        self._upgrade_backoff = 1
+
+        # Số liệu cửa sổ gần nhất (cho HUD / log)
+        self.last_fps = 0.0
+        self.last_utilization = 0.0
+        self.last_latency_ms = 0.0
+        self.last_stage_ms: Dict[str, float] = {}
+
+    # ============ LISTENERS ============
+
+    def add_listener(self, callback: Callable[[QualityEvent], None]):
+        """Đăng ký callback(event) - được gọi từ AI thread khi đổi level"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[QualityEvent], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    # ============ LEVELS ============
+
+    def overrides(self) -> Dict:
+        """Các giá trị config ghi đè của level hiện tại"""
+        return self.levels[self.level]
+
+    def set_level(self, level: int, reason: str = 'manual') -> bool:
+        """Đổi level (thủ công hoặc từ controller). Trả về True nếu level thay đổi"""
+        level = min(max(0, level), len(self.levels) - 1)
+        if level == self.level:
+            return False
+
+        previous = self.level
+        now = time.monotonic()
+        # Vừa tăng lên mà phải giảm ngay → lần sau chờ lâu hơn mới tăng lại
+        if (reason == 'overload' and self._last_change_reason == 'headroom'
+                and now - self._last_change < self.cooldown_seconds * 2):
+            self._upgrade_backoff = min(self._upgrade_backoff * 2, self.max_upgrade_backoff)
+
+        self.level = level
+        self._last_change = now
+        self._last_change_reason = reason
+        self._overload_streak = 0
+        self._headroom_streak = 0
+
+        event = QualityEvent(
+            timestamp=time.time(),
+            previous_level=previous,
+            level=level,
+            reason=reason,
+            fps=round(self.last_fps, 1),
+            utilization=round(self.last_utilization, 2),
+            latency_ms=round(self.last_latency_ms, 1),
+            stage_ms=dict(self.last_stage_ms),
+            overrides=dict(self.levels[level]),
+        )
+        self.events.append(event)
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"⚠️  Quality listener lỗi: {e}")
+        return True
+
+    # ============ MEASUREMENT ============
+
+    def record(self, processing_ms: float, stage_ms: Dict[str, float] = None) -> bool:
+        """Ghi nhận 1 frame đã xử lý. Trả về True nếu level vừa thay đổi
+
+        Args:
+            processing_ms: thời gian xử lý toàn bộ frame
+            stage_ms: thời gian từng stage đã chạy ở frame này (vd. {'face': 8.1})
+        """
+        now = time.monotonic()
+        if self._window_start is None:
+            self._window_start = now
+        self._frames += 1
+        self._busy += processing_ms / 1000.0
+        if stage_ms:
+            for stage, ms in stage_ms.items():
+                self._stage_totals[stage] = self._stage_totals.get(stage, 0.0) + ms
+                self._stage_counts[stage] = self._stage_counts.get(stage, 0) + 1
+
+        elapsed = now - self._window_start
+        if elapsed < self.window_seconds:
+            return False
+        changed = self._evaluate(elapsed, now)
+        self._reset_window(now)
+        return changed
+
+    def _reset_window(self, now: float):
+        self._window_start = now
+        self._frames = 0
+        self._busy = 0.0
+        self._stage_totals.clear()
+        self._stage_counts.clear()
+
+    def _evaluate(self, elapsed: float, now: float) -> bool:
+        self.last_fps = self._frames / elapsed
+        self.last_utilization = min(1.0, self._busy / elapsed)
+        self.last_latency_ms = self._busy * 1000.0 / max(1, self._frames)
+        self.last_stage_ms = {
+            stage: total / self._stage_counts[stage]
+            for stage, total in self._stage_totals.items()
+        }
+
+        # Quá tải: AI bận gần hết thời gian mà vẫn không đạt target
+        # (FPS thấp vì camera chậm thì AI không bận → không tính là quá tải)
+        overloaded = (self.last_fps < self.target_fps and
+                      self.last_utilization >= self.downgrade_utilization)
+        headroom = self.last_utilization <= self.upgrade_utilization
+
+        self._overload_streak = self._overload_streak + 1 if overloaded else 0
+        self._headroom_streak = self._headroom_streak + 1 if headroom else 0
+
+        since_change = now - self._last_change
+        if since_change < self.cooldown_seconds:
+            return False
+        if self._last_change_reason == 'headroom' and since_change >= self.cooldown_seconds * 2:
+            # Level vừa tăng đã giữ ổn định → nới backoff dần
+            self._upgrade_backoff = max(1, self._upgrade_backoff // 2)
+            self._last_change_reason = None
+        if self._overload_streak >= self.downgrade_windows and self.level < len(self.levels) - 1:
+            return self.set_level(self.level + 1, 'overload')
+        if (self._headroom_streak >= self.upgrade_windows * self._upgrade_backoff
+                and self.level > 0):
+            return self.set_level(self.level - 1, 'headroom')
+        return False
+
+    def get_stats(self) -> Dict:
+        return {
+            'level': self.level,
+            'max_level': len(self.levels) - 1,
+            'target_fps': self.target_fps,
+            'fps': self.last_fps,
+            'utilization': self.last_utilization,
+            'latency_ms': self.last_latency_ms,
+            'stage_ms': dict(self.last_stage_ms),
+            'upgrade_backoff': self._upgrade_backoff,
+        }
@@ -0,0 +1,197 @@
+"""
+Tracing - Đo thời gian từng stage (capture, resize, detect, overlay, imshow...)
+- Span rất nhẹ: with tracer.span('face_detect'): ...
+- Mỗi thread ghi vào ring buffer riêng → không cần lock khi ghi
+  (1 slot = 1 tuple, gán tuple là nguyên tử; chỉ thread sở hữu tăng index)
+- Tắt (SHOW_PERFORMANCE_METRICS = False) → span là no-op dùng chung, gần như 0 chi phí
+- Xuất Chrome / Perfetto trace JSON (chrome://tracing, ui.perfetto.dev)
+  và thống kê p50/p95/p99 theo cửa sổ trượt
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import performance_config as perf
+
+SUMMARY_PERCENTILES = (50, 95, 99)
+
+
+class _NullSpan:
+    """Span khi tracing tắt - không làm gì"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('_buffer', '_name', '_start')
+
+    def __init__(self, buffer: '_RingBuffer', name: str):
+        self._buffer = buffer
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self._buffer.add(self._name, self._start, time.perf_counter_ns())
+        return False
+
+
+class _RingBuffer:
+    """Ring buffer của 1 thread: slot = (name, start_ns, end_ns)"""
+
+    def __init__(self, capacity: int, thread: threading.Thread):
+        self.capacity = capacity
+        self.slots: List[Optional[tuple]] = [None] * capacity
+        self.index = 0   # Tổng số span đã ghi (chỉ thread sở hữu tăng)
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+
+    def add(self, name: str, start_ns: int, end_ns: int):
+        self.slots[self.index % self.capacity] = (name, start_ns, end_ns)
+        self.index += 1
+
+    def snapshot(self) -> List[tuple]:
+        """Các span còn trong buffer, cũ → mới (đọc từ thread khác, không khoá)"""
+        end = self.index
+        start = max(0, end - self.capacity)
+        spans = [self.slots[i % self.capacity] for i in range(start, end)]
+        return [s for s in spans if s is not None]
+
+
+class Tracer:
+    """Quản lý ring buffer của các thread và xuất trace / thống kê"""
+
+    def __init__(self, enabled: bool = None, buffer_size: int = None):
+        self.enabled = perf.SHOW_PERFORMANCE_METRICS if enabled is None else enabled
+        self.buffer_size = buffer_size or perf.TRACE_BUFFER_SIZE
+        self._local = threading.local()
+        self._buffers: List[_RingBuffer] = []
+        self._registry_lock = threading.Lock()  # Chỉ dùng khi thread mới ghi lần đầu
+        self._epoch_ns = time.perf_counter_ns()
+
+    def _buffer(self) -> _RingBuffer:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = _RingBuffer(self.buffer_size, threading.current_thread())
+            self._local.buffer = buffer
+            with self._registry_lock:
+                self._buffers.append(buffer)
+        return buffer
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = bool(enabled)
+
+    def span(self, name: str):
+        """Context manager đo 1 stage"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self._buffer(), name)
+
+    def record(self, name: str, start_s: float, end_s: float):
+        """Ghi span đã đo sẵn bằng time.perf_counter() (giây)"""
+        if self.enabled:
+            self._buffer().add(name, int(start_s * 1e9), int(end_s * 1e9))
+
+    def clear(self):
+        with self._registry_lock:
+            for buffer in self._buffers:
+                buffer.slots = [None] * buffer.capacity
+                buffer.index = 0
+
+    # ============ XUẤT ============
+
+    def _all_spans(self):
+        with self._registry_lock:
+            buffers = list(self._buffers)
+        for buffer in buffers:
+            for span in buffer.snapshot():
+                yield buffer, span
+
+    def summary(self, window_seconds: float = None) -> Dict[str, Dict]:
+        """{stage: {count, mean, p50, p95, p99, max}} (ms), chỉ lấy span trong cửa sổ gần nhất"""
+        cutoff = None
+        if window_seconds:
+            cutoff = time.perf_counter_ns() - int(window_seconds * 1e9)
+        durations: Dict[str, List[float]] = {}
+        for _, (name, start_ns, end_ns) in self._all_spans():
+            if cutoff is not None and end_ns < cutoff:
+                continue
+            durations.setdefault(name, []).append((end_ns - start_ns) / 1e6)
+        stats = {}
+        for name, values in sorted(durations.items()):
+            arr = np.asarray(values)
+            stats[name] = {'count': len(values), 'mean': float(arr.mean()),
+                           'max': float(arr.max())}
+            for p, value in zip(SUMMARY_PERCENTILES, np.percentile(arr, SUMMARY_PERCENTILES)):
+                stats[name][f"p{p}"] = float(value)
+        return stats
+
+    def format_summary(self, window_seconds: float = None) -> str:
+        stats = self.summary(window_seconds)
+        if not stats:
+            return "(chưa có span nào - bật SHOW_PERFORMANCE_METRICS)"
+        lines = [f"{'stage':<20}{'n':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"]
+        for name, s in stats.items():
+            lines.append(f"{name:<20}{s['count']:>7}{s['mean']:>9.2f}{s['p50']:>9.2f}"
+                         f"{s['p95']:>9.2f}{s['p99']:>9.2f}{s['max']:>9.2f}")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict:
+        """Trace theo Trace Event Format (span 'X', thời gian tính bằng µs)"""
+        pid = os.getpid()
+        events = []
+        seen_threads = set()
+        for buffer, (name, start_ns, end_ns) in self._all_spans():
+            if buffer.thread_id not in seen_threads:
+                seen_threads.add(buffer.thread_id)
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                               'tid': buffer.thread_id,
+                               'args': {'name': buffer.thread_name}})
+            events.append({
+                'name': name, 'cat': 'pipeline', 'ph': 'X', 'pid': pid,
+                'tid': buffer.thread_id,
+                'ts': (start_ns - self._epoch_ns) / 1000.0,
+                'dur': (end_ns - start_ns) / 1000.0,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path: str = None) -> str:
+        """Ghi Chrome trace JSON, trả về đường dẫn file"""
+        if path is None:
+            stamp = time.strftime('%Y%m%d_%H%M%S')
+            path = os.path.join(perf.TRACE_DIR, f"trace-{stamp}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+
+_instance: Optional[Tracer] = None
+_instance_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Tracer dùng chung cho cả process"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = Tracer()
+    return _instance
@@ -0,0 +1,171 @@
+import threading
+import time
+from queue import Queue, Full, Empty
+from typing import Optional
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import database_config as db_cfg
+from database.db_manager import DatabaseManager, result_to_record
+from database.rollup import RollupAggregator
+from core.metrics import (
+    DB_BATCH_SIZE, DB_RECORDS_WRITTEN, DB_RECORDS_DROPPED, DB_ERRORS, DB_QUEUE_DEPTH
+)
+
+
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'sample')
+
+
+class AsyncDatabaseWriter(threading.Thread):
+    """Thread ghi database nền
+
+    - submit() không bao giờ block main loop
+    - Gom record thành batch theo kích thước HOẶC thời gian, executemany + 1 commit / batch
+    - Queue có giới hạn, xử lý quá tải theo DB_WRITER_OVERFLOW_POLICY
+    - Cập nhật rollup focus_logs_1s / focus_logs_1m trong cùng transaction
+    """
+
+    def __init__(self, session_id: str,
+                 db_path: str = None,
+                 batch_size: int = None,
+                 flush_interval: float = None,
+                 queue_size: int = None,
+                 overflow_policy: str = None):
+        super().__init__()
+        self.daemon = True
+        self.session_id = session_id
+        self.db_path = db_path or db_cfg.DB_PATH
+        self.batch_size = batch_size or db_cfg.DB_WRITER_BATCH_SIZE
+        self.flush_interval = flush_interval or db_cfg.DB_WRITER_FLUSH_INTERVAL
+        self.overflow_policy = overflow_policy or db_cfg.DB_WRITER_OVERFLOW_POLICY
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy phải là 1 trong {OVERFLOW_POLICIES}")
+        self.sample_every = max(1, db_cfg.DB_WRITER_SAMPLE_EVERY)
+        self._queue: Queue = Queue(maxsize=queue_size or db_cfg.DB_WRITER_QUEUE_SIZE)
+        self._sample_high_water = int(self._queue.maxsize * db_cfg.DB_WRITER_SAMPLE_HIGH_WATER)
+        self._sample_counter = 0
+        DB_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+        self.db_manager: Optional[DatabaseManager] = None
+        self.rollup = (RollupAggregator(db_cfg.ROLLUP_BLINK_THRESHOLD)
+                       if db_cfg.ENABLE_ROLLUPS else None)
+        self.retention_hours = db_cfg.DB_RAW_RETENTION_HOURS
+        self._next_retention_check = 0.0
+        self.running = False
+
+        # Thống kê
+        self.written_count = 0
+        self.dropped_count = 0
+        self.sampled_out_count = 0
+        self.batch_count = 0
+        self.error_count = 0
+        self.last_batch_size = 0
+        self.purged_count = 0
+
+    def submit(self, result: dict) -> bool:
+        """Đẩy 1 AI result vào queue (không block). Trả về False nếu bị bỏ"""
+        if self.overflow_policy == 'sample' and self._queue.qsize() >= self._sample_high_water:
+            self._sample_counter += 1
+            if self._sample_counter % self.sample_every != 0:
+                self.sampled_out_count += 1
+                DB_RECORDS_DROPPED.labels(reason='sampled').inc()
+                return False
+
+        record = result_to_record(result, self.session_id)
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except Full:
+            if self.overflow_policy == 'drop_oldest':
+                try:
+                    self._queue.get_nowait()
+                except Empty:
+                    pass
+                try:
+                    self._queue.put_nowait(record)
+                    self.dropped_count += 1  # Record cũ nhất đã bị bỏ
+                    DB_RECORDS_DROPPED.labels(reason='overflow').inc()
+                    return True
+                except Full:
+                    pass
+            self.dropped_count += 1
+            DB_RECORDS_DROPPED.labels(reason='overflow').inc()
+            return False
+
+    def _flush(self, batch: list):
+        if not batch:
+            return
+        written = self.db_manager.insert_records(batch, self.rollup)
+        if written == 0:
+            self.error_count += 1
+            DB_ERRORS.inc()
+        self.written_count += written
+        DB_RECORDS_WRITTEN.inc(written)
+        DB_BATCH_SIZE.observe(len(batch))
+        self.batch_count += 1
+        self.last_batch_size = len(batch)
+
+    def _apply_retention(self):
+        """Định kỳ xóa raw frames quá hạn (rollup được giữ lại)"""
+        if self.retention_hours is None:
+            return
+        now = time.monotonic()
+        if now < self._next_retention_check:
+            return
+        self._next_retention_check = now + db_cfg.DB_RETENTION_CHECK_INTERVAL
+        self.purged_count += self.db_manager.purge_raw_records(self.retention_hours)
+
+    def run(self):
+        try:
+            self.db_manager = DatabaseManager(self.db_path)
+            self.db_manager.connect()
+            self.db_manager.create_tables()
+        except Exception as e:
+            print(f"❌ DB writer không khởi động được: {e}")
+            return
+
+        self.running = True
+        print(f"✅ DB writer started (batch {self.batch_size} / {self.flush_interval}s, "
+              f"policy={self.overflow_policy})")
+
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while self.running or not self._queue.empty():
+            try:
+                timeout = max(0.0, deadline - time.monotonic())
+                batch.append(self._queue.get(timeout=timeout))
+                # Lấy thêm những gì đang có sẵn, không block
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except Empty:
+                pass
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                self._apply_retention()
+
+        self._flush(batch)
+        self.db_manager.close()
+        print(f"🛑 DB writer stopped ({self.written_count} records, "
+              f"{self.dropped_count} dropped, {self.sampled_out_count} sampled out)")
+
+    def stop(self, timeout: float = 5.0):
+        """Dừng thread, ghi nốt phần còn lại trong queue"""
+        self.running = False
+        if self.is_alive():
+            self.join(timeout)
+
+    def get_stats(self) -> dict:
+        return {
+            'written': self.written_count,
+            'dropped': self.dropped_count,
+            'sampled_out': self.sampled_out_count,
+            'batches': self.batch_count,
+            'errors': self.error_count,
+            'last_batch_size': self.last_batch_size,
+            'queue_depth': self._queue.qsize(),
+            'purged': self.purged_count,
+        }
@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import database_config as db_cfg
+
+
+class ConnectionManager:
+    """Quản lý kết nối SQLite đã tuning
+
+    - 1 write connection (WAL, synchronous=NORMAL)
+    - Mỗi thread đọc có read connection riêng (mmap, query_only)
+      → dashboard đọc không block capture loop đang ghi
+    """
+
+    def __init__(self, db_path: str, tuned: bool = None,
+                 write_pragmas: Dict = None, read_pragmas: Dict = None):
+        self.db_path = db_path
+        self.tuned = db_cfg.SQLITE_TUNING_ENABLED if tuned is None else tuned
+        self.write_pragmas = write_pragmas if write_pragmas is not None else db_cfg.SQLITE_WRITE_PRAGMAS
+        self.read_pragmas = read_pragmas if read_pragmas is not None else db_cfg.SQLITE_READ_PRAGMAS
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._local = threading.local()
+        self._read_conns: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _apply_pragmas(conn: sqlite3.Connection, pragmas: Dict):
+        for name, value in pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+
+    def get_write_connection(self) -> sqlite3.Connection:
+        if self._write_conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=db_cfg.SQLITE_CACHED_STATEMENTS)
+            if self.tuned:
+                self._apply_pragmas(conn, self.write_pragmas)
+            self._write_conn = conn
+        return self._write_conn
+
+    def get_read_connection(self) -> sqlite3.Connection:
+        """Read connection của thread hiện tại (tạo khi cần)"""
+        if not self.tuned:
+            # Không tuning: dùng chung write connection như trước
+            return self.get_write_connection()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Chỉ thread này dùng, nhưng close() gọi từ thread khác lúc tắt
+            # → check_same_thread=False để đóng được (không rò connection)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=db_cfg.SQLITE_CACHED_STATEMENTS)
+            self._apply_pragmas(conn, self.read_pragmas)
+            self._local.conn = conn
+            with self._lock:
+                self._read_conns.append(conn)
+        return conn
+
+    def close(self):
+        """Đóng mọi connection (gọi khi các thread đọc đã dừng)"""
+        with self._lock:
+            for conn in self._read_conns:
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Lỗi đóng read connection: {e}")
+            self._read_conns.clear()
+        self._local = threading.local()
+        if self._write_conn is not None:
+            self._write_conn.close()
+            self._write_conn = None
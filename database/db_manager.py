@@ -1,16 +1,56 @@
 import sqlite3
 import os
-from typing import List, Tuple, Optional
-from database.models import CREATE_TABLE_SESSIONS, CREATE_INDEXES, INSERT_SESSION
+import time
+from datetime import datetime, timezone
+from typing import List, Tuple, Optional, Iterable, Union
+from database.connection import ConnectionManager
+from database.models import (
+    CREATE_TABLE_SESSIONS, CREATE_INDEXES, INSERT_SESSION, INSERT_SESSION_WITH_TIMESTAMP,
+    CREATE_ROLLUP_TABLES, CREATE_ROLLUP_INDEXES, ADD_ROLLUP_CHANGE_SEQ,
+    SELECT_ROLLUP, DELETE_SESSIONS_BEFORE,
+    WINDOW_GROUP_BY, WINDOW_QUERIES
+)
+
+
+# Cận mở cho khoảng thời gian. Cột timestamp (DATETIME) có NUMERIC affinity:
+# text như '9999' sẽ bị ép thành số khi so sánh → phải là timestamp đầy đủ
+MIN_TIMESTAMP = '0000-01-01 00:00:00'
+MAX_TIMESTAMP = '9999-12-31 23:59:59'
+
+
+def format_timestamp(ts: float) -> str:
+    """Epoch (giây) → text UTC cùng định dạng CURRENT_TIMESTAMP của SQLite"""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def result_to_record(result: dict, session_id: str) -> Tuple:
+    """AI result dict → tuple theo thứ tự INSERT_SESSION_WITH_TIMESTAMP"""
+    return (
+        format_timestamp(result['timestamp']),
+        result.get('ear_left', 0.0),
+        result.get('ear_right', 0.0),
+        result.get('ear_avg', 0.0),
+        result.get('head_tilt', 0.0),
+        result.get('shoulder_angle', 0.0),
+        result.get('face_distance_ipd', 0.0),
+        result.get('posture_score', 0.0),
+        result.get('emotion', 'neutral'),
+        result.get('emotion_confidence', 0.0),
+        result.get('focus_score', 0.0),
+        int(bool(result.get('is_drowsy', False))),
+        int(bool(result.get('is_bad_posture', False))),
+        session_id
+    )
 
 
 class DatabaseManager:
     """Quản lý SQLite database cho hệ thống"""
     
-    def __init__(self, db_path: str = "data/study_behavior.db"):
+    def __init__(self, db_path: str = "data/study_behavior.db", tuned: bool = None):
         self.db_path = db_path
-        self.conn = None
-        self.cursor = None
+        self.conn = None      # Write connection
+        self.cursor = None    # Write cursor
+        self._connections = ConnectionManager(db_path, tuned)
         self._ensure_db_directory()
 
     def _ensure_db_directory(self):
@@ -20,7 +60,7 @@ class DatabaseManager:
 
     def connect(self):
         try:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn = self._connections.get_write_connection()
             self.cursor = self.conn.cursor()
             print(f"✅ Kết nối database: {self.db_path}")
         except sqlite3.Error as e:
@@ -32,11 +72,23 @@ class DatabaseManager:
             self.cursor.execute(CREATE_TABLE_SESSIONS)
             for idx in CREATE_INDEXES:
                 self.cursor.execute(idx)
+            for table in CREATE_ROLLUP_TABLES:
+                self.cursor.execute(table)
+            self._migrate_rollup_tables()
+            for idx in CREATE_ROLLUP_INDEXES:
+                self.cursor.execute(idx)
             self.conn.commit()
         except sqlite3.Error as e:
             print(f"❌ Lỗi tạo bảng: {e}")
             raise
 
+    def _migrate_rollup_tables(self):
+        """Bảng rollup tạo trước khi có cột change_seq → thêm cột"""
+        for table, alter in ADD_ROLLUP_CHANGE_SEQ.items():
+            columns = {row[1] for row in self.cursor.execute(f"PRAGMA table_info({table})")}
+            if 'change_seq' not in columns:
+                self.cursor.execute(alter)
+
     def insert_record(self, data: Tuple) -> Optional[int]:
         try:
             self.cursor.execute(INSERT_SESSION, data)
@@ -55,18 +107,107 @@ class DatabaseManager:
             print(f"❌ Lỗi batch insert: {e}")
             return 0
 
-    def get_avg_focus_score(self, hours: int = 1) -> Optional[float]:
-        query = f"""
-        SELECT AVG(focus_score) FROM study_sessions
-        WHERE timestamp > datetime('now', '-{hours} hours');
+    def insert_records(self, records: Iterable[Tuple], rollup=None) -> int:
+        """Insert nhiều record (có timestamp) - 1 lần commit cho cả batch
+        
+        Args:
+            records: tuples theo SESSION_RECORD_FIELDS
+            rollup: RollupAggregator (optional) - cập nhật focus_logs_* trong cùng transaction
+        """
+        records = list(records)
+        if not records:
+            return 0
+        try:
+            self.cursor.executemany(INSERT_SESSION_WITH_TIMESTAMP, records)
+            if rollup is not None:
+                for sql, rows in rollup.upsert_statements(records):
+                    self.cursor.executemany(sql, rows)
+            self.conn.commit()
+            return len(records)
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"❌ Lỗi batch insert: {e}")
+            return 0
+
+    def purge_raw_records(self, retention_hours: float) -> int:
+        """Xóa raw frames cũ hơn retention_hours (rollup vẫn giữ nguyên)"""
+        cutoff = format_timestamp(time.time() - retention_hours * 3600)
+        try:
+            self.cursor.execute(DELETE_SESSIONS_BEFORE, (cutoff,))
+            self.conn.commit()
+            return self.cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"❌ Lỗi xóa dữ liệu cũ: {e}")
+            return 0
+
+    def get_focus_timeline(self, session_id: str, resolution: str = '1m',
+                           start: str = '', end: str = '9999') -> List[dict]:
+        """Đọc time-series từ bảng rollup (focus_logs_1s / focus_logs_1m)
+        
+        Args:
+            resolution: '1s' hoặc '1m'
+            start, end: khoảng [start, end) dạng text 'YYYY-MM-DD HH:MM:SS' (UTC)
         """
+        if resolution not in SELECT_ROLLUP:
+            raise ValueError(f"resolution phải là 1 trong {list(SELECT_ROLLUP)}")
         try:
-            self.cursor.execute(query)
-            result = self.cursor.fetchone()
-            return result[0] if result[0] else None
+            cursor = self._read(SELECT_ROLLUP[resolution], (session_id, start, end))
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
         except sqlite3.Error as e:
             print(f"❌ Lỗi query: {e}")
-            return None
+            return []
+
+    def _read(self, query: str, params: Union[Tuple, dict] = ()) -> sqlite3.Cursor:
+        """Chạy query đọc trên read connection của thread hiện tại (không block writer)"""
+        return self._connections.get_read_connection().execute(query, params)
+
+    @staticmethod
+    def _window_bound(value: Union[float, str, None], default: str) -> str:
+        """Epoch (giây) hoặc text UTC → text UTC so sánh được với cột timestamp"""
+        if value is None:
+            return default
+        if isinstance(value, str):
+            return value
+        return format_timestamp(value)
+
+    def get_window_stats(self, start: Union[float, str, None] = None,
+                         end: Union[float, str, None] = None,
+                         session_id: Optional[str] = None,
+                         group_by: Optional[str] = None,
+                         bucket_seconds: int = 60) -> List[dict]:
+        """Thống kê focus / drowsy / posture trong khoảng [start, end)
+
+        Args:
+            start, end: epoch (giây) hoặc text UTC 'YYYY-MM-DD HH:MM:SS'; None = không giới hạn
+            session_id: chỉ lấy 1 session (None = tất cả)
+            group_by: None (1 dòng), 'session' hoặc 'bucket' (mỗi bucket_seconds giây)
+            bucket_seconds: độ dài bucket khi group_by='bucket'
+
+        Returns:
+            list dict: sample_count, avg_focus, drowsy_fraction, bad_posture_fraction
+            (+ session_id hoặc bucket_start tùy group_by)
+        """
+        if group_by not in WINDOW_GROUP_BY:
+            raise ValueError(f"group_by phải là 1 trong {WINDOW_GROUP_BY}")
+        query = WINDOW_QUERIES[(group_by, session_id is not None)]
+        params = {
+            'start': self._window_bound(start, MIN_TIMESTAMP),
+            'end': self._window_bound(end, MAX_TIMESTAMP),
+            'session_id': session_id,
+            'bucket': max(1, int(bucket_seconds)),
+        }
+        try:
+            cursor = self._read(query, params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"❌ Lỗi query: {e}")
+            return []
+
+    def get_avg_focus_score(self, hours: int = 1) -> Optional[float]:
+        rows = self.get_window_stats(start=time.time() - hours * 3600)
+        return rows[0]['avg_focus'] if rows and rows[0]['avg_focus'] else None
 
     def get_session_stats(self, session_id: str) -> dict:
         query = """
@@ -78,8 +219,7 @@ class DatabaseManager:
         FROM study_sessions WHERE session_id = ?;
         """
         try:
-            self.cursor.execute(query, (session_id,))
-            row = self.cursor.fetchone()
+            row = self._read(query, (session_id,)).fetchone()
             return {
                 'avg_focus': row[0],
                 'drowsy_count': row[1],
@@ -92,5 +232,7 @@ class DatabaseManager:
 
     def close(self):
         if self.conn:
-            self.conn.close()
+            self._connections.close()
+            self.conn = None
+            self.cursor = None
             print("✅ Đã đóng kết nối database")
@@ -36,7 +36,10 @@ CREATE TABLE IF NOT EXISTS study_sessions (
 CREATE_INDEXES = [
     "CREATE INDEX IF NOT EXISTS idx_timestamp ON study_sessions(timestamp);",
     "CREATE INDEX IF NOT EXISTS idx_focus_score ON study_sessions(focus_score);",
-    "CREATE INDEX IF NOT EXISTS idx_session_id ON study_sessions(session_id);",
+    # Compound index: thống kê theo session + khoảng thời gian trong session
+    "CREATE INDEX IF NOT EXISTS idx_session_time ON study_sessions(session_id, timestamp);",
+    # idx_session_id cũ là prefix của idx_session_time → thừa, chỉ làm chậm insert
+    "DROP INDEX IF EXISTS idx_session_id;",
 ]
 
 INSERT_SESSION = """
@@ -48,3 +51,154 @@ INSERT INTO study_sessions (
 ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
 """
 
+
+# Thứ tự cột trong 1 record (tuple) của INSERT_SESSION_WITH_TIMESTAMP
+SESSION_RECORD_FIELDS = (
+    'timestamp',
+    'ear_left', 'ear_right', 'ear_avg',
+    'head_tilt_angle', 'shoulder_slope', 'distance_to_screen', 'posture_score',
+    'emotion', 'emotion_confidence', 'focus_score',
+    'is_drowsy', 'is_bad_posture', 'session_id',
+)
+
+# Insert kèm timestamp thật của frame (offline / ghi theo batch)
+# Định dạng giống CURRENT_TIMESTAMP (UTC): 'YYYY-MM-DD HH:MM:SS.fff'
+INSERT_SESSION_WITH_TIMESTAMP = """
+INSERT INTO study_sessions (
+    timestamp,
+    ear_left, ear_right, ear_avg,
+    head_tilt_angle, shoulder_slope, distance_to_screen, posture_score,
+    emotion, emotion_confidence, focus_score,
+    is_drowsy, is_bad_posture, session_id
+) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+
+
+# ============ FOCUS LOGS (time-series rollup) ============
+# Gom raw frames thành bucket 1 giây và 1 phút cho biểu đồ / lịch sử
+# bucket_start: text UTC cùng định dạng timestamp ('YYYY-MM-DD HH:MM:SS')
+# Lưu tổng (sum/count) thay vì trung bình để cộng dồn được qua nhiều batch
+# change_seq: số thứ tự thay đổi tăng dần (mỗi lần insert / update bucket lấy MAX + 1,
+# trong write lock của SQLite → đúng thứ tự commit) cho export incremental
+ROLLUP_TABLES = {
+    '1s': 'focus_logs_1s',
+    '1m': 'focus_logs_1m',
+}
+
+
+def _create_rollup_table(table: str) -> str:
+    return f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    session_id TEXT NOT NULL,
+    bucket_start TEXT NOT NULL,
+    sample_count INTEGER NOT NULL,
+    focus_sum REAL NOT NULL,
+    focus_min REAL,
+    focus_max REAL,
+    drowsy_count INTEGER NOT NULL DEFAULT 0,
+    bad_posture_count INTEGER NOT NULL DEFAULT 0,
+    blink_count INTEGER NOT NULL DEFAULT 0,
+    change_seq INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session_id, bucket_start)
+) WITHOUT ROWID
+"""
+
+
+def _next_change_seq(table: str) -> str:
+    return f"(SELECT COALESCE(MAX(change_seq), 0) + 1 FROM {table})"
+
+
+def _upsert_rollup(table: str) -> str:
+    return f"""
+INSERT INTO {table} (
+    session_id, bucket_start, sample_count,
+    focus_sum, focus_min, focus_max,
+    drowsy_count, bad_posture_count, blink_count, change_seq
+) VALUES (?,?,?,?,?,?,?,?,?, {_next_change_seq(table)})
+ON CONFLICT(session_id, bucket_start) DO UPDATE SET
+    sample_count = sample_count + excluded.sample_count,
+    focus_sum = focus_sum + excluded.focus_sum,
+    focus_min = MIN(focus_min, excluded.focus_min),
+    focus_max = MAX(focus_max, excluded.focus_max),
+    drowsy_count = drowsy_count + excluded.drowsy_count,
+    bad_posture_count = bad_posture_count + excluded.bad_posture_count,
+    blink_count = blink_count + excluded.blink_count,
+    change_seq = excluded.change_seq
+"""
+
+
+def _select_rollup(table: str) -> str:
+    return f"""
+SELECT
+    bucket_start,
+    sample_count,
+    focus_sum / sample_count AS focus_mean,
+    focus_min,
+    focus_max,
+    CAST(drowsy_count AS REAL) / sample_count AS drowsy_fraction,
+    CAST(bad_posture_count AS REAL) / sample_count AS bad_posture_fraction,
+    blink_count
+FROM {table}
+WHERE session_id = ? AND bucket_start >= ? AND bucket_start < ?
+ORDER BY bucket_start
+"""
+
+
+CREATE_ROLLUP_TABLES = [_create_rollup_table(t) for t in ROLLUP_TABLES.values()]
+# DB tạo trước khi có change_seq: thêm cột (dòng cũ = 0 → lần export đầu xuất lại hết)
+ADD_ROLLUP_CHANGE_SEQ = {
+    t: f"ALTER TABLE {t} ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0"
+    for t in ROLLUP_TABLES.values()
+}
+CREATE_ROLLUP_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS idx_{t}_change_seq ON {t}(change_seq);"
+    for t in ROLLUP_TABLES.values()
+]
+UPSERT_ROLLUP = {res: _upsert_rollup(t) for res, t in ROLLUP_TABLES.items()}
+SELECT_ROLLUP = {res: _select_rollup(t) for res, t in ROLLUP_TABLES.items()}
+
+# Xóa raw frames cũ (giữ lại rollup)
+DELETE_SESSIONS_BEFORE = "DELETE FROM study_sessions WHERE timestamp < ?"
+
+
+# ============ WINDOW QUERIES ============
+# Thống kê trong khoảng [start, end) - nhóm theo session hoặc theo bucket N giây
+# Mỗi dạng query là 1 chuỗi SQL cố định, tham số bind theo tên
+# (:start, :end, :session_id, :bucket) → sqlite3 dùng lại prepared statement đã cache
+# Điều kiện so sánh trực tiếp trên cột timestamp → dùng được idx_timestamp / idx_session_time
+WINDOW_GROUP_BY = (None, 'session', 'bucket')
+
+_WINDOW_AGGREGATES = """
+    COUNT(*) AS sample_count,
+    AVG(focus_score) AS avg_focus,
+    AVG(is_drowsy) AS drowsy_fraction,
+    AVG(is_bad_posture) AS bad_posture_fraction"""
+
+_WINDOW_BUCKET = ("datetime(CAST(strftime('%s', timestamp) AS INTEGER) / :bucket * :bucket, "
+                  "'unixepoch')")
+
+
+def _window_query(group_by, by_session: bool) -> str:
+    where = "timestamp >= :start AND timestamp < :end"
+    if by_session:
+        where = "session_id = :session_id AND " + where
+    if group_by is None:
+        return f"SELECT {_WINDOW_AGGREGATES}\nFROM study_sessions\nWHERE {where}"
+    key = "session_id" if group_by == 'session' else f"{_WINDOW_BUCKET} AS bucket_start"
+    column = "session_id" if group_by == 'session' else "bucket_start"
+    return f"""
+SELECT
+    {key},{_WINDOW_AGGREGATES}
+FROM study_sessions
+WHERE {where}
+GROUP BY {column}
+ORDER BY {column}
+"""
+
+
+# {(group_by, lọc theo 1 session): SQL}
+WINDOW_QUERIES = {
+    (group_by, by_session): _window_query(group_by, by_session)
+    for group_by in WINDOW_GROUP_BY
+    for by_session in (False, True)
+}
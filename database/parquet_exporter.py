@@ -0,0 +1,235 @@
+"""
+Parquet Exporter - Xuất dữ liệu SQLite sang Parquet (columnar) cho data mining
+- study_sessions: đọc theo chunk (WHERE id > ? ORDER BY id LIMIT ?) → bộ nhớ giới hạn
+- Ghi partition kiểu Hive: <out>/study_sessions/session_id=.../day=YYYY-MM-DD/*.parquet
+- Incremental: lưu id cuối cùng đã xuất, lần sau chỉ đọc phần mới
+- Rollup (focus_logs_1s / focus_logs_1m) được UPSERT liên tục, kể cả bucket cũ (phân tích
+  lại offline, batch đến trễ) → theo dõi bằng change_seq: mỗi lần export ghi lại trọn
+  các partition (session, ngày) có bucket thay đổi, chỉ gồm các bucket đã "đóng"
+  (cũ hơn EXPORT_ROLLUP_SETTLE_SECONDS)
+
+pandas:  pd.read_parquet("data/export/study_sessions")
+"""
+import json
+import os
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import database_config as db_cfg
+from database.connection import ConnectionManager
+from database.db_manager import format_timestamp
+from database.models import SESSION_RECORD_FIELDS, ROLLUP_TABLES
+
+STATE_FILE = "_export_state.json"
+
+_SESSION_COLUMNS = ('id',) + SESSION_RECORD_FIELDS
+SELECT_SESSIONS_AFTER = f"""
+SELECT {', '.join(_SESSION_COLUMNS)} FROM study_sessions
+WHERE id > ? ORDER BY id LIMIT ?
+"""
+
+_ROLLUP_COLUMNS = ('session_id', 'bucket_start', 'sample_count', 'focus_sum', 'focus_min',
+                   'focus_max', 'drowsy_count', 'bad_posture_count', 'blink_count')
+
+# Kiểu cột cố định (mặc định float64) → mọi file cùng schema kể cả khi 1 chunk toàn NULL
+_COLUMN_TYPES = {
+    'id': 'int64',
+    'timestamp': 'string',
+    'bucket_start': 'string',
+    'emotion': 'string',
+    'session_id': 'string',
+    'is_drowsy': 'int64',
+    'is_bad_posture': 'int64',
+    'sample_count': 'int64',
+    'drowsy_count': 'int64',
+    'bad_posture_count': 'int64',
+    'blink_count': 'int64',
+}
+
+
+def _select_changed_partitions(table: str) -> str:
+    """(session_id, ngày) có bucket đã đóng thay đổi trong khoảng change_seq (?, ?]"""
+    return f"""
+SELECT DISTINCT session_id, substr(bucket_start, 1, 10) FROM {table}
+WHERE change_seq > ? AND change_seq <= ? AND bucket_start < ?
+ORDER BY 1, 2
+"""
+
+
+def _select_first_pending(table: str) -> str:
+    """change_seq nhỏ nhất của bucket chưa đóng (chưa xuất được) sau watermark"""
+    return f"""
+SELECT MIN(change_seq) FROM {table}
+WHERE change_seq > ? AND change_seq <= ? AND bucket_start >= ?
+"""
+
+
+def _select_rollup_partition(table: str) -> str:
+    return f"""
+SELECT {', '.join(_ROLLUP_COLUMNS)} FROM {table}
+WHERE session_id = ? AND bucket_start >= ? AND bucket_start < ? AND bucket_start < ?
+ORDER BY bucket_start
+"""
+
+
+def _import_pyarrow():
+    """Lazy import: pyarrow chỉ cần khi export"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    return pa, pc, pq
+
+
+class ParquetExporter:
+    """Xuất study_sessions (+ rollup nếu có) sang Parquet, phân vùng theo session và ngày"""
+
+    def __init__(self, db_path: str = None,
+                 output_dir: str = None,
+                 chunk_rows: int = None):
+        self.db_path = db_path or db_cfg.DB_PATH
+        self.output_dir = output_dir or db_cfg.EXPORT_DIR
+        self.chunk_rows = chunk_rows or db_cfg.EXPORT_CHUNK_ROWS
+        self.state_path = os.path.join(self.output_dir, STATE_FILE)
+        self._connections = ConnectionManager(self.db_path)
+        self._pa, self._pc, self._pq = _import_pyarrow()
+        self.state = self._load_state()
+
+    # ============ STATE ============
+
+    def _load_state(self) -> Dict:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'study_sessions': 0}
+
+    def _save_state(self):
+        """Ghi state sau mỗi chunk (ghi file tạm rồi rename → không bao giờ hỏng dở)"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def reset(self):
+        """Quên tiến độ: lần export sau xuất lại từ đầu"""
+        self.state = {'study_sessions': 0}
+        self._save_state()
+
+    # ============ HELPERS ============
+
+    def _table_exists(self, conn, table: str) -> bool:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        return row is not None
+
+    def _has_column(self, conn, table: str, column: str) -> bool:
+        return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+    def _to_table(self, columns: Tuple[str, ...], rows: List[Tuple], time_column: str):
+        """Rows → pyarrow Table, thêm cột 'day' và chuyển cột thời gian sang timestamp UTC"""
+        pa, pc = self._pa, self._pc
+        arrays = {
+            name: pa.array(values, type=getattr(pa, _COLUMN_TYPES.get(name, 'float64'))())
+            for name, values in zip(columns, zip(*rows))
+        }
+        time_text = arrays[time_column]
+        arrays['day'] = pc.utf8_slice_codeunits(time_text, 0, 10)
+        # Text đã là UTC: parse thành timestamp không tz rồi gắn nhãn UTC (không đổi giá trị)
+        arrays[time_column] = time_text.cast(pa.timestamp('ms')).cast(pa.timestamp('ms', tz='UTC'))
+        return pa.table(arrays)
+
+    def _write_partitioned(self, table, name: str, part_name: str, replace: bool = False):
+        """replace=True → xoá các partition mà table ghi vào trước khi ghi (ghi lại trọn)"""
+        self._pq.write_to_dataset(
+            table,
+            root_path=os.path.join(self.output_dir, name),
+            partition_cols=['session_id', 'day'],
+            basename_template=part_name + "-{i}.parquet",
+            existing_data_behavior='delete_matching' if replace else 'overwrite_or_ignore',
+        )
+
+    # ============ EXPORT ============
+
+    def export_sessions(self) -> int:
+        """Xuất các dòng study_sessions mới (id > id đã xuất), trả về số dòng"""
+        conn = self._connections.get_read_connection()
+        last_id = self.state.get('study_sessions', 0)
+        exported = 0
+        while True:
+            rows = conn.execute(SELECT_SESSIONS_AFTER, (last_id, self.chunk_rows)).fetchall()
+            if not rows:
+                break
+            first_id, last_id = rows[0][0], rows[-1][0]
+            table = self._to_table(_SESSION_COLUMNS, rows, 'timestamp')
+            # Tên file theo khoảng id → chạy lại sau crash chỉ ghi đè đúng chunk đó
+            self._write_partitioned(table, 'study_sessions', f"part-{first_id:012d}-{last_id:012d}")
+            self.state['study_sessions'] = last_id
+            self._save_state()
+            exported += len(rows)
+        return exported
+
+    def export_rollups(self) -> Dict[str, int]:
+        """Ghi lại các partition rollup có bucket thay đổi từ lần trước, trả về số dòng
+
+        Watermark là change_seq (không phải bucket_start): bucket cũ bị UPSERT sau lần
+        export trước vẫn được xuất. Partition được ghi lại trọn vẹn → không có dòng trùng.
+        """
+        conn = self._connections.get_read_connection()
+        settled = format_timestamp(time.time() - db_cfg.EXPORT_ROLLUP_SETTLE_SECONDS)[:19]
+        exported = {}
+        for resolution, table_name in ROLLUP_TABLES.items():
+            if not self._table_exists(conn, table_name):
+                continue
+            if not self._has_column(conn, table_name, 'change_seq'):
+                print(f"⚠️ {table_name} chưa có cột change_seq "
+                      f"(mở database bằng DatabaseManager để cập nhật schema)")
+                exported[resolution] = 0
+                continue
+            # -1: gồm cả dòng có từ trước khi thêm cột (change_seq = 0);
+            # state cũ lưu bucket_start → xuất lại toàn bộ 1 lần
+            watermark = self.state.get(table_name, -1)
+            if not isinstance(watermark, int):
+                watermark = -1
+
+            # Cùng 1 read transaction → max_seq, danh sách partition và dữ liệu khớp nhau
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            try:
+                max_seq = conn.execute(
+                    f"SELECT COALESCE(MAX(change_seq), 0) FROM {table_name}"
+                ).fetchone()[0]
+                partitions = conn.execute(_select_changed_partitions(table_name),
+                                          (watermark, max_seq, settled)).fetchall()
+                pending = conn.execute(_select_first_pending(table_name),
+                                       (watermark, max_seq, settled)).fetchone()[0]
+                count = 0
+                for session_id, day in partitions:
+                    next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+                    rows = conn.execute(_select_rollup_partition(table_name),
+                                        (session_id, day, next_day, settled)).fetchall()
+                    table = self._to_table(_ROLLUP_COLUMNS, rows, 'bucket_start')
+                    self._write_partitioned(table, table_name, "part", replace=True)
+                    count += len(rows)
+            finally:
+                conn.rollback()
+            # Bucket chưa đóng đã thay đổi → giữ watermark trước nó để lần sau xuất tiếp
+            self.state[table_name] = pending - 1 if pending is not None else max_seq
+            self._save_state()
+            exported[resolution] = count
+        return exported
+
+    def export(self, include_rollups: bool = True) -> Dict:
+        """Export incremental toàn bộ, trả về thống kê"""
+        t0 = time.time()
+        stats = {'study_sessions': self.export_sessions()}
+        if include_rollups:
+            stats['rollups'] = self.export_rollups()
+        stats['seconds'] = time.time() - t0
+        return stats
+
+    def close(self):
+        self._connections.close()
@@ -0,0 +1,83 @@
+"""
+Rollup Aggregator - Gom raw frame records thành bucket 1 giây / 1 phút
+Chạy incremental theo từng batch của AsyncDatabaseWriter:
+mỗi batch → vài dòng UPSERT cộng dồn vào focus_logs_1s / focus_logs_1m
+"""
+from typing import Dict, List, Tuple, Iterable
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.models import SESSION_RECORD_FIELDS, UPSERT_ROLLUP
+
+_TS = SESSION_RECORD_FIELDS.index('timestamp')
+_EAR = SESSION_RECORD_FIELDS.index('ear_avg')
+_FOCUS = SESSION_RECORD_FIELDS.index('focus_score')
+_DROWSY = SESSION_RECORD_FIELDS.index('is_drowsy')
+_BAD_POSTURE = SESSION_RECORD_FIELDS.index('is_bad_posture')
+_SESSION = SESSION_RECORD_FIELDS.index('session_id')
+
+# Độ dài prefix của timestamp text 'YYYY-MM-DD HH:MM:SS.fff' cho mỗi độ phân giải
+_BUCKET_PREFIX = {
+    '1s': (19, ''),      # 'YYYY-MM-DD HH:MM:SS'
+    '1m': (16, ':00'),   # 'YYYY-MM-DD HH:MM' + ':00'
+}
+
+
+class RollupAggregator:
+    """Tổng hợp records thành các dòng rollup (count, sum/min/max focus, drowsy, posture, blink)"""
+
+    def __init__(self, blink_threshold: float = 0.21):
+        self.blink_threshold = blink_threshold
+        # Trạng thái mắt cuối cùng của mỗi session (để đếm blink qua ranh giới batch)
+        self._eye_closed: Dict[str, bool] = {}
+
+    def _is_blink_start(self, session_id: str, ear_avg: float) -> bool:
+        """Blink = EAR vừa chuyển từ mở sang nhắm (EAR = 0 nghĩa là không thấy mặt)"""
+        closed = 0.0 < ear_avg < self.blink_threshold
+        was_closed = self._eye_closed.get(session_id, False)
+        self._eye_closed[session_id] = closed
+        return closed and not was_closed
+
+    def aggregate(self, records: Iterable[Tuple]) -> Dict[str, List[Tuple]]:
+        """Records (theo thứ tự thời gian) → {resolution: [rollup rows]}"""
+        buckets = {res: {} for res in _BUCKET_PREFIX}
+        for record in records:
+            session_id = record[_SESSION]
+            ts = record[_TS]
+            focus = record[_FOCUS] or 0.0
+            blink = 1 if self._is_blink_start(session_id, record[_EAR] or 0.0) else 0
+            drowsy = 1 if record[_DROWSY] else 0
+            bad = 1 if record[_BAD_POSTURE] else 0
+
+            for res, (length, suffix) in _BUCKET_PREFIX.items():
+                key = (session_id, ts[:length] + suffix)
+                acc = buckets[res].get(key)
+                if acc is None:
+                    buckets[res][key] = [1, focus, focus, focus, drowsy, bad, blink]
+                else:
+                    acc[0] += 1
+                    acc[1] += focus
+                    if focus < acc[2]:
+                        acc[2] = focus
+                    if focus > acc[3]:
+                        acc[3] = focus
+                    acc[4] += drowsy
+                    acc[5] += bad
+                    acc[6] += blink
+
+        return {
+            res: [(session_id, bucket, *acc) for (session_id, bucket), acc in rows.items()]
+            for res, rows in buckets.items()
+        }
+
+    def upsert_statements(self, records: Iterable[Tuple]) -> List[Tuple[str, List[Tuple]]]:
+        """[(SQL upsert, rows)] để executemany trong cùng transaction với raw insert"""
+        return [
+            (UPSERT_ROLLUP[res], rows)
+            for res, rows in self.aggregate(records).items()
+            if rows
+        ]
+
+    def reset(self):
+        self._eye_closed.clear()
@@ -1,4 +1,8 @@
 from core.camera_thread import CameraThread
+from core.frame_source import FrameSource, open_source
+from core.tracing import get_tracer
+from core.metrics import MetricsServer, PIPELINE_FPS
+from core.frame_pool import ScratchBuffers
 from core.ai_processor import AIProcessorThread
 from ai_models.gaze_tracker import GazeTracker
 # from ai_models.phone_detector import PhoneDetector  # Đã tắt để tăng FPS
@@ -6,25 +10,39 @@ from ai_models.focus_calculator import FocusCalculator
 from ai_models.calibrator import Calibrator
 from ai_models.adaptive_detector import AdaptiveDetector
 from ai_models.advanced_state_detector import AdvancedStateDetector
+from ai_models.feature_extractor import FEATURE_GAZE_RATIO
 # from ai_models.blendshape_emotion_mapper import BlendshapeEmotionMapper  # Đã TẮT phân tích cảm xúc
 from database.db_manager import DatabaseManager
-from config import performance_config as perf
+from database.async_writer import AsyncDatabaseWriter
+from config import database_config as db_cfg
+from config.runtime_config import get_runtime_config, ConfigSnapshot
 import cv2 
+import numpy as np
 import time
+from datetime import datetime
 from queue import Queue, Empty
 
 class MainApplication:
-    def __init__(self, camera_index: int = 0):
-        self.frame_queue = Queue(maxsize=perf.FRAME_QUEUE_SIZE)
-        self.result_queue = Queue(maxsize=perf.RESULT_QUEUE_SIZE)
-        self.camera_thread = CameraThread(camera_index, self.frame_queue)
-        self.ai_thread = AIProcessorThread(self.frame_queue, self.result_queue)
+    def __init__(self, camera_index: int = 0, source: FrameSource = None):
+        # Config dùng chung, hot-swap được khi đang chạy (phím 'p' / file JSON)
+        self.runtime_config = get_runtime_config()
+        self.config: ConfigSnapshot = self.runtime_config.current
+        self.tracer = get_tracer()
+        self.tracer.set_enabled(self.config.SHOW_PERFORMANCE_METRICS)
+        self.frame_queue = Queue(maxsize=self.config.FRAME_QUEUE_SIZE)
+        self.result_queue = Queue(maxsize=self.config.RESULT_QUEUE_SIZE)
+        self.camera_thread = CameraThread(camera_index, self.frame_queue, self.runtime_config,
+                                          source=source)
+        self.ai_thread = AIProcessorThread(self.frame_queue, self.result_queue, self.runtime_config)
         self.gaze_tracker = GazeTracker()
         self.focus_calculator = FocusCalculator()
         self.advanced_state_detector = AdvancedStateDetector()  # Phát hiện: boredom, dazed, severe distraction
         self.calibrator = Calibrator()
         # self.blendshape_mapper = BlendshapeEmotionMapper()  # ← ĐÃ TẮT phân tích cảm xúc
-        self.db_manager = DatabaseManager()
+        self.db_manager = DatabaseManager(db_cfg.DB_PATH)
+        # Ghi kết quả vào DB ở thread nền (không block main loop)
+        self.session_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.db_writer = AsyncDatabaseWriter(self.session_id) if db_cfg.ENABLE_DB_LOGGING else None
         self.running = False
         self.is_calibrated = False
         self.current_focus_score = 0.0
@@ -33,9 +51,9 @@ class MainApplication:
         self.frame_count = 0
         # Phone detector ĐÃ TẮT
         # self.PHONE_CHECK_INTERVAL = 5
-        self.ADVANCED_STATE_INTERVAL = perf.ADVANCED_STATE_INTERVAL  # Dùng config
-        self.enable_advanced_states = perf.ENABLE_ADVANCED_STATES
-        self.enable_microsleep = perf.ENABLE_MICROSLEEP
+        self.ADVANCED_STATE_INTERVAL = self.config.ADVANCED_STATE_INTERVAL  # Dùng config
+        self.enable_advanced_states = self.config.ENABLE_ADVANCED_STATES
+        self.enable_microsleep = self.config.ENABLE_MICROSLEEP
         # self.last_phone_result = (False, 0.0, [])
         self.last_advanced_states = {
             'is_bored': False,
@@ -50,26 +68,55 @@ class MainApplication:
         self.fps_start_time = time.time()
         self.fps_frame_count = 0
         self.current_fps = 0.0
+        self.last_trace_summary = time.time()
+        self.metrics_server = None
+        self.display_buffers = ScratchBuffers()
+    def _apply_config(self, snapshot: ConfigSnapshot):
+        """Hot-swap config cho main loop"""
+        self.config = snapshot
+        self.ADVANCED_STATE_INTERVAL = snapshot.ADVANCED_STATE_INTERVAL
+        self.enable_advanced_states = snapshot.ENABLE_ADVANCED_STATES
+        self.enable_microsleep = snapshot.ENABLE_MICROSLEEP
+        self.tracer.set_enabled(snapshot.SHOW_PERFORMANCE_METRICS)
+
     def start(self):
         print("Starting Main Application...")
+        print(f"⚙️  Preset: {self.config.preset}")
+        if self.config.RUNTIME_CONFIG_WATCH:
+            self.runtime_config.watch_file()
+        if self.config.METRICS_ENABLED:
+            self.metrics_server = MetricsServer()
+            self.metrics_server.start()
         self.camera_thread.start()
         self.ai_thread.start()
+        if self.db_writer:
+            self.db_writer.start()
         self.running = True
     def stop(self):
         print("Stopping Main Application...")
         self.running = False
         self.camera_thread.stop()
         self.ai_thread.stop()
+        self.runtime_config.stop_watching()
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.db_writer:
+            self.db_writer.stop()
         cv2.destroyAllWindows()
     def run(self):
         self.start()
         
         last_ai_result = None
-        frame_interval = 1.0 / perf.DISPLAY_FPS_LIMIT  # Giới hạn FPS hiển thị
+        last_logged_result = None
         last_frame_time = 0
         
         while self.running:
             now = time.time()
+            snapshot = self.runtime_config.current
+            if snapshot is not self.config:
+                self._apply_config(snapshot)
+            frame_interval = 1.0 / self.config.DISPLAY_FPS_LIMIT  # Giới hạn FPS hiển thị
             
             # Giới hạn FPS hiển thị để không ăn CPU vô ích
             if now - last_frame_time < frame_interval:
@@ -78,10 +125,19 @@ class MainApplication:
             last_frame_time = now
             
             # === 1. LẤY FRAME MỚI NHẤT TỪ CAMERA (luôn có, không block) ===
-            frame = self.camera_thread.get_latest_frame()
-            if frame is None:
+            latest = self.camera_thread.acquire_latest_frame()
+            if self.camera_thread.finished:
+                if latest is not None:
+                    latest.release()
+                break  # Video / thư mục ảnh đã hết
+            if latest is None:
                 time.sleep(0.01)
                 continue
+            # Vẽ HUD trên buffer hiển thị riêng (dùng lại mỗi frame):
+            # buffer của camera có thể đang được AI thread đọc
+            frame = self.display_buffers.get('display', latest.array.shape)
+            np.copyto(frame, latest.array)
+            latest.release()
             
             # === 2. LẤY AI RESULT MỚI NHẤT (không block, dùng cái cũ nếu chưa có mới) ===
             ai_result = self.ai_thread.get_latest_result()
@@ -90,25 +146,56 @@ class MainApplication:
             
             # === 3. XỬ LÝ & HIỂN THỊ (luôn chạy ở tốc độ camera) ===
             if last_ai_result is not None:
-                processed = self.process_frame(last_ai_result, frame)
-                display_frame = self.draw_overlay(frame, processed)
+                with self.tracer.span('main_process'):
+                    processed = self.process_frame(last_ai_result, frame)
+                with self.tracer.span('overlay'):
+                    display_frame = self.draw_overlay(frame, processed)
+                
+                # Chỉ ghi DB khi có AI result MỚI (không ghi lặp ở tốc độ hiển thị)
+                if self.db_writer and last_ai_result is not last_logged_result:
+                    self.db_writer.submit(processed)
+                    last_logged_result = last_ai_result
             else:
                 # Chưa có AI result → hiển thị frame gốc + "Loading..."
-                display_frame = frame.copy()
+                display_frame = frame
                 cv2.putText(display_frame, "Loading AI...", (20, 40),
                            cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 255), 2)
             
-            cv2.imshow("Smart Learning Support System", display_frame)
-            
-            # Xử lý phím bấm
-            key = cv2.waitKey(1) & 0xFF
+            with self.tracer.span('imshow'):
+                cv2.imshow("Smart Learning Support System", display_frame)
+                # Xử lý phím bấm
+                key = cv2.waitKey(1) & 0xFF
+            self._maybe_print_trace_summary(now)
             if key == ord('q'):
                 break
             elif key == ord('c'):
                 self.calibrate()
+            elif key == ord('p'):
+                snapshot = self.runtime_config.next_preset()
+                print(f"⚙️  Preset: {snapshot.preset}")
+            elif key == ord('t'):
+                self.dump_trace()
         
         self.stop()
 
+    def dump_trace(self):
+        """Phím 't': ghi Chrome trace + in p50/p95/p99 các stage"""
+        if not self.tracer.enabled:
+            print("⚠️  Tracing đang tắt (SHOW_PERFORMANCE_METRICS = False)")
+            return
+        path = self.tracer.dump()
+        print(f"🧭 Trace: {path} (mở bằng chrome://tracing hoặc ui.perfetto.dev)")
+        print(self.tracer.format_summary())
+
+    def _maybe_print_trace_summary(self, now: float):
+        interval = self.config.TRACE_SUMMARY_SECONDS
+        if not self.tracer.enabled or not interval:
+            return
+        if now - self.last_trace_summary >= interval:
+            self.last_trace_summary = now
+            print(f"⏱️  Stage timing ({interval}s gần nhất):")
+            print(self.tracer.format_summary(interval))
+
     def calibrate(self):
         """Chạy calibration 10 giây"""
         print("🔄 Bắt đầu calibration - Giữ tư thế bình thường...")
@@ -125,6 +212,7 @@ class MainApplication:
         elapsed = time.time() - self.fps_start_time
         if elapsed >= 1.0:
             self.current_fps = self.fps_frame_count / elapsed
+            PIPELINE_FPS.labels(thread='main').set(self.current_fps)
             self.fps_frame_count = 0
             self.fps_start_time = time.time()
         
@@ -132,10 +220,19 @@ class MainApplication:
         ear_avg = ai_result.get('ear_avg', 0.25)
         posture_score = ai_result.get('posture_score', 100.0)
         face_landmarks = ai_result.get('face_landmarks', None)
+        face_features = ai_result.get('face_features', None)
+        # Detector theo thời gian: dùng lúc capture của frame (vẽ lại result cũ → không tính thêm)
+        capture_ts = ai_result.get('capture_ts')
         
         # === GAZE TRACKING (nhẹ - chạy mỗi frame) ===
         if face_landmarks is not None:
-            gaze_ratio, gaze_dir, is_distracted = self.gaze_tracker.process(face_landmarks)
+            precomputed_gaze = None
+            if face_features is not None:
+                precomputed_gaze = float(face_features[FEATURE_GAZE_RATIO])
+            with self.tracer.span('gaze'):
+                gaze_ratio, gaze_dir, is_distracted = self.gaze_tracker.process(
+                    face_landmarks, gaze_ratio=precomputed_gaze, timestamp=capture_ts
+                )
         else:
             gaze_ratio, gaze_dir, is_distracted = 0.5, "CENTER", False
         
@@ -173,17 +270,19 @@ class MainApplication:
         # Tối ưu: Chỉ chạy advanced state detection khi bật feature
         if self.enable_advanced_states:
             if self.frame_count % self.ADVANCED_STATE_INTERVAL == 0:
-                advanced_states = self.advanced_state_detector.process_all_states(
-                    ear_avg=ear_avg,
-                    emotion=emotion,
-                    emotion_conf=emotion_conf,
-                    head_pitch=head_pitch,
-                    head_roll=head_roll,
-                    head_yaw=head_yaw,
-                    gaze_direction=gaze_dir,
-                    is_using_phone=False,  # Phone detector đã tắt
-                    posture_score=posture_score
-                )
+                with self.tracer.span('advanced_states'):
+                    advanced_states = self.advanced_state_detector.process_all_states(
+                        ear_avg=ear_avg,
+                        emotion=emotion,
+                        emotion_conf=emotion_conf,
+                        head_pitch=head_pitch,
+                        head_roll=head_roll,
+                        head_yaw=head_yaw,
+                        gaze_direction=gaze_dir,
+                        is_using_phone=False,  # Phone detector đã tắt
+                        posture_score=posture_score,
+                        timestamp=capture_ts
+                    )
                 # Lưu kết quả để dùng cho các frame khác
                 self.last_advanced_states = advanced_states
             else:
@@ -201,24 +300,27 @@ class MainApplication:
         
         # Micro-sleep detection
         if self.enable_microsleep and self.ai_thread.drowsiness_detector is not None:
-            is_microsleep, micro_duration = self.ai_thread.drowsiness_detector.detect_microsleep(
-                ear_avg=ear_avg,
-                head_pitch=head_pitch,
-                head_yaw=head_yaw,
-                head_roll=head_roll
-            )
+            with self.tracer.span('microsleep'):
+                is_microsleep, micro_duration = self.ai_thread.drowsiness_detector.detect_microsleep(
+                    ear_avg=ear_avg,
+                    head_pitch=head_pitch,
+                    head_yaw=head_yaw,
+                    head_roll=head_roll,
+                    timestamp=capture_ts
+                )
         else:
-            is_microsleep, micro_duration = False, 0
+            is_microsleep, micro_duration = False, 0.0
         
         # === FOCUS SCORE (chỉ tập trung vào: drowsiness, posture, gaze) ===
-        focus_score = self.focus_calculator.calculate_focus_score(
-            ear_avg=ear_avg,
-            posture_score=posture_score,
-            emotion=emotion,
-            gaze_ratio=gaze_ratio,
-            is_distracted=is_distracted,
-            is_using_phone=False  # Phone detector đã tắt
-        )
+        with self.tracer.span('focus'):
+            focus_score = self.focus_calculator.calculate_focus_score(
+                ear_avg=ear_avg,
+                posture_score=posture_score,
+                emotion=emotion,
+                gaze_ratio=gaze_ratio,
+                is_distracted=is_distracted,
+                is_using_phone=False  # Phone detector đã tắt
+            )
         
         return {
             **ai_result,
@@ -310,7 +412,7 @@ class MainApplication:
                         (w//2 - 200, h//2),
                         cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 4)
 
-                duration_sec = data.get('microsleep_duration', 0) / 30
+                duration_sec = data.get('microsleep_duration', 0.0)
                 cv2.putText(frame, f"Duration: {duration_sec:.1f}s",
                         (w//2 - 100, h//2 + 50),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
@@ -335,14 +437,29 @@ class MainApplication:
         ai_fps = self.ai_thread.get_fps()
         cv2.putText(frame, f"FPS M/C/A: {self.current_fps:.1f}/{camera_fps:.1f}/{ai_fps:.1f}",
                     (w - 300, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        quality = self.ai_thread.quality_controller
+        if quality:
+            cv2.putText(frame, f"Quality: {quality.level}/{len(quality.levels) - 1}",
+                        (w - 300, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        if 'latency_ms' in data:
+            # Capture → result: tổng / phần chờ queue (còn lại là inference)
+            cv2.putText(frame, f"Latency: {data['latency_ms']:.0f} ms (queue {data['queue_ms']:.0f})",
+                        (w - 300, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
         
         # Phím tắt
-        cv2.putText(frame, "Press 'q' to quit, 'c' to calibrate", 
+        cv2.putText(frame, f"'q' quit, 'c' calibrate, 't' trace, 'p' preset ({self.config.preset})", 
                     (10, h - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
         
         return frame
 if __name__ == "__main__":
-    app = MainApplication(camera_index=0)
+    import argparse
+    parser = argparse.ArgumentParser(description="Smart Learning Support System")
+    parser.add_argument('--source', default='0',
+                        help="Index webcam, file video, thư mục ảnh hoặc 'synthetic' (mặc định: 0)")
+    args = parser.parse_args()
+    source = None if args.source.isdigit() else open_source(args.source)
+    app = MainApplication(camera_index=int(args.source) if args.source.isdigit() else 0,
+                          source=source)
     try:
         app.run()
     except KeyboardInterrupt:
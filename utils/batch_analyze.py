@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Script chấm điểm lại video buổi học đã ghi (chạy offline, đa process)
+
+Ví dụ:
+    python utils/batch_analyze.py recordings/*.mp4
+    python utils/batch_analyze.py video.mp4 --workers 4 --db data/rescored.db
+"""
+import sys
+import os
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.offline_analyzer import OfflineAnalyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Phân tích offline video buổi học")
+    parser.add_argument('videos', nargs='+', help="Các file video cần phân tích")
+    parser.add_argument('--db', default="data/study_behavior.db", help="Đường dẫn SQLite")
+    parser.add_argument('--workers', type=int, default=None, help="Số worker process")
+    parser.add_argument('--chunk-seconds', type=float, default=None,
+                        help="Độ dài mỗi đoạn giao cho 1 worker (giây)")
+    parser.add_argument('--session-id', default=None,
+                        help="Session ID (chỉ dùng khi phân tích 1 video)")
+    args = parser.parse_args()
+
+    if args.session_id and len(args.videos) > 1:
+        parser.error("--session-id chỉ dùng được với 1 video")
+
+    analyzer = OfflineAnalyzer(args.db, args.workers, args.chunk_seconds)
+    t0 = time.time()
+    total = 0
+    try:
+        for video in args.videos:
+            total += analyzer.analyze(video, session_id=args.session_id)
+    finally:
+        analyzer.close()
+
+    elapsed = time.time() - t0
+    print("=" * 60)
+    print(f"✅ Xong {len(args.videos)} video - {total} records trong {elapsed:.1f}s")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark SQLite: cấu hình mặc định (journal DELETE, idx_session_id)
+so với tuning profile (WAL, synchronous=NORMAL, mmap, idx_session_time)
+
+Đo:
+- Insert theo batch (rows/s)
+- get_session_stats
+- Truy vấn theo khoảng thời gian (toàn bộ / trong 1 session)
+- Độ trễ đọc khi đang có thread ghi song song
+"""
+import sys
+import os
+import time
+import random
+import tempfile
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db_manager import DatabaseManager, result_to_record
+
+NUM_SESSIONS = 20
+BATCH_SIZE = 64
+
+
+def make_records(num_rows: int, start_epoch: float, span_seconds: float) -> list:
+    """Dữ liệu giả: NUM_SESSIONS chỗ ngồi ghi xen kẽ trong span_seconds"""
+    rng = random.Random(7)
+    step = span_seconds / num_rows
+    return [
+        result_to_record({
+            'timestamp': start_epoch + i * step,
+            'ear_avg': rng.uniform(0.15, 0.35),
+            'posture_score': rng.uniform(30, 100),
+            'focus_score': rng.uniform(20, 100),
+            'is_drowsy': rng.random() < 0.1,
+            'is_bad_posture': rng.random() < 0.2,
+        }, f"seat_{i % NUM_SESSIONS:02d}")
+        for i in range(num_rows)
+    ]
+
+
+def open_db(path: str, tuned: bool) -> DatabaseManager:
+    db = DatabaseManager(path, tuned=tuned)
+    db.connect()
+    db.create_tables()
+    if not tuned:
+        # Schema cũ: chỉ có index đơn trên session_id
+        db.cursor.execute("DROP INDEX IF EXISTS idx_session_time")
+        db.cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_id ON study_sessions(session_id)")
+        db.conn.commit()
+    return db
+
+
+def time_per_call(fn, repeats: int) -> float:
+    """ms / lần gọi (trung vị)"""
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def read_while_writing(db: DatabaseManager, records: list, seconds: float = 2.0) -> tuple:
+    """p50/p95 (ms) của get_session_stats trong lúc thread khác insert liên tục"""
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            db.insert_records(records[i:i + BATCH_SIZE])
+            i = (i + BATCH_SIZE) % max(1, len(records) - BATCH_SIZE)
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    latencies = []
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        t0 = time.perf_counter()
+        db.get_session_stats(f"seat_{random.randrange(NUM_SESSIONS):02d}")
+        latencies.append((time.perf_counter() - t0) * 1000)
+    stop.set()
+    thread.join()
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def run_profile(name: str, tuned: bool, records: list, extra: list, workdir: str) -> dict:
+    path = os.path.join(workdir, f"{name}.db")
+    db = open_db(path, tuned)
+
+    t0 = time.perf_counter()
+    for i in range(0, len(records), BATCH_SIZE):
+        db.insert_records(records[i:i + BATCH_SIZE])
+    insert_rate = len(records) / (time.perf_counter() - t0)
+
+    now = time.time()
+    results = {
+        'insert_rows_per_s': insert_rate,
+        'session_stats_ms': time_per_call(
+            lambda: db.get_session_stats(f"seat_{random.randrange(NUM_SESSIONS):02d}"), 30),
+        'avg_focus_1h_ms': time_per_call(lambda: db.get_avg_focus_score(hours=1), 30),
+        'session_window_ms': time_per_call(
+            lambda: db.get_window_stats(now - 1800, now - 1500,
+                                        session_id=f"seat_{random.randrange(NUM_SESSIONS):02d}"), 30),
+        'bucket_1m_2h_ms': time_per_call(
+            lambda: db.get_window_stats(now - 7200, now, group_by='bucket'), 10),
+    }
+    results['read_under_write_p50_ms'], results['read_under_write_p95_ms'] = \
+        read_while_writing(db, extra)
+    db.close()
+    return results
+
+
+def main():
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    span = 2 * 3600
+    records = make_records(num_rows, time.time() - span, span)
+    extra = make_records(20000, time.time(), 600)
+
+    print("=" * 60)
+    print(f"🗄️  SQLITE BENCHMARK - {num_rows} rows, {NUM_SESSIONS} sessions")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as workdir:
+        baseline = run_profile('default', False, records, extra, workdir)
+        tuned = run_profile('tuned', True, records, extra, workdir)
+
+    print(f"{'metric':<28}{'default':>12}{'tuned':>12}{'ratio':>10}")
+    for key in baseline:
+        a, b = baseline[key], tuned[key]
+        # Insert: cao hơn là tốt; còn lại: thấp hơn là tốt
+        ratio = (b / a) if key.startswith('insert') else (a / b if b else float('inf'))
+        print(f"{key:<28}{a:>12.2f}{b:>12.2f}{ratio:>9.1f}x")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
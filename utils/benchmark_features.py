@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: đường scalar (math.sqrt/atan2 trong từng detector)
+so với feature_extractor (1 lượt NumPy cho EAR, gaze, head pose, IPD)
+"""
+import sys
+import os
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_models.landmark_array import LandmarkArray
+from ai_models.drowsiness_detector import DrowsinessDetector
+from ai_models.gaze_tracker import GazeTracker
+from ai_models.posture_analyzer import PostureAnalyzer
+from ai_models.feature_extractor import (
+    extract_face_features, NUM_FACE_FEATURES, FEATURE_NAMES
+)
+
+
+def make_landmarks(rng: np.random.Generator, count: int) -> list:
+    """Tạo danh sách landmarks ngẫu nhiên (478 điểm như Face Landmarker)"""
+    return [
+        LandmarkArray(rng.random((478, 3), dtype=np.float32) * [1.0, 1.0, 0.1])
+        for _ in range(count)
+    ]
+
+
+def scalar_features(face, drowsiness, gaze, posture) -> list:
+    """Đường cũ: mỗi detector tự tính trên landmarks"""
+    points = face.points
+    return [
+        drowsiness.calculate_ear(points, DrowsinessDetector.LEFT_EYE),
+        drowsiness.calculate_ear(points, DrowsinessDetector.RIGHT_EYE),
+        gaze._get_iris_position(points),
+        posture.calculate_head_pitch(face),
+        posture.calculate_head_roll(face),
+        posture.calculate_head_yaw(face),
+        posture.calculate_face_distance(face),
+    ]
+
+
+def run_benchmark(num_frames: int = 2000, repeats: int = 5):
+    rng = np.random.default_rng(42)
+    faces = make_landmarks(rng, num_frames)
+    drowsiness, gaze, posture = DrowsinessDetector(), GazeTracker(), PostureAnalyzer()
+    out = np.empty(NUM_FACE_FEATURES)
+
+    # Kiểm tra 2 đường cho kết quả giống nhau
+    max_diff = 0.0
+    for face in faces[:200]:
+        ref = scalar_features(face, drowsiness, gaze, posture)
+        vec = extract_face_features(face.points, out)
+        fused = [vec[0], vec[1], vec[3], vec[4], vec[5], vec[6], vec[7]]
+        max_diff = max(max_diff, max(abs(a - b) for a, b in zip(ref, fused)))
+
+    def best_of(fn) -> float:
+        best = float('inf')
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            for face in faces:
+                fn(face)
+            best = min(best, time.perf_counter() - t0)
+        return best / num_frames * 1e6  # µs / frame
+
+    scalar_us = best_of(lambda f: scalar_features(f, drowsiness, gaze, posture))
+    fused_us = best_of(lambda f: extract_face_features(f.points, out))
+
+    print("=" * 60)
+    print("⏱️  FEATURE EXTRACTION BENCHMARK")
+    print("=" * 60)
+    print(f"Frames: {num_frames} x {repeats} lần (lấy lần nhanh nhất)")
+    print(f"Features: {', '.join(FEATURE_NAMES)}")
+    print(f"  [Scalar] {scalar_us:8.2f} µs/frame")
+    print(f"  [Fused ] {fused_us:8.2f} µs/frame")
+    print(f"  → Tăng tốc: x{scalar_us / fused_us:.2f}")
+    print(f"  → Sai lệch lớn nhất: {max_diff:.2e}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    run_benchmark(frames)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark: face + pose landmarker tuần tự so với song song (PARALLEL_LANDMARKS)
+
+Mỗi cấu hình (số nhân CPU x chế độ) chạy trong 1 process riêng, giới hạn nhân bằng
+os.sched_setaffinity TRƯỚC khi tạo model → mọi thread của MediaPipe và worker đều
+chỉ chạy trên các nhân đó. Face + pose chạy mọi frame (tắt frame skipping) để đo đúng
+tick có cả 2 landmarker.
+
+Ví dụ:
+    python utils/benchmark_parallel.py
+    python utils/benchmark_parallel.py --image face.png --cores 2 4 --frames 300
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+from queue import Queue
+from typing import Dict, Optional
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+RESULT_MARKER = "BENCH_RESULT "
+MODES = ('serial', 'parallel')
+
+
+def run_config(cores: int, mode: str, frames: int, image: Optional[str],
+               deadline_ms: float) -> Dict:
+    """Chạy trong process worker: đã giới hạn nhân, tạo AI thread rồi đo _process_frame"""
+    cpus = sorted(os.sched_getaffinity(0))[:cores]
+    os.sched_setaffinity(0, cpus)
+
+    # Import sau khi giới hạn nhân (thread pool native tạo theo affinity hiện tại)
+    from config.runtime_config import RuntimeConfig
+    from core.ai_processor import AIProcessorThread
+    from core.frame_source import SyntheticSource
+    from config import performance_config as perf
+
+    config = RuntimeConfig(overrides={
+        'ENABLE_POSE_DETECTION': True,
+        'ENABLE_FRAME_SKIPPING': False,
+        'MOTION_GATING': False,
+        'ADAPTIVE_QUALITY_ENABLED': False,
+        'PARALLEL_LANDMARKS': mode == 'parallel',
+        'PARALLEL_DEADLINE_MS': deadline_ms,
+    })
+    processor = AIProcessorThread(Queue(), Queue(), config)
+    if not processor._init_models():
+        raise RuntimeError("Không khởi tạo được models (thiếu file trong models/?)")
+
+    source = SyntheticSource(perf.CAMERA_WIDTH, perf.CAMERA_HEIGHT, perf.CAMERA_FPS,
+                             pace='fast', image=image)
+    source.open()
+    warmup = 10
+    frame_ms, face_found = [], 0
+    for index in range(warmup + frames):
+        frame = source.frame_at(index)
+        t0 = time.perf_counter()
+        result = processor._process_frame(frame)
+        elapsed = (time.perf_counter() - t0) * 1000
+        if index < warmup:
+            continue
+        frame_ms.append(elapsed)
+        if result and result.get('face_landmarks') is not None:
+            face_found += 1
+    parallel = processor.parallel.get_stats()
+    processor._cleanup()
+    source.release()
+
+    return {
+        'cores': len(cpus),
+        'mode': mode,
+        'frames': frames,
+        'p50_ms': round(float(np.percentile(frame_ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(frame_ms, 95)), 2),
+        'mean_ms': round(float(np.mean(frame_ms)), 2),
+        'face_rate': round(face_found / frames, 3),
+        'late': {name: stats['late'] for name, stats in parallel.items()},
+    }
+
+
+def _run_in_subprocess(cores: int, mode: str, args) -> Optional[Dict]:
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', f"{cores}:{mode}",
+           '--frames', str(args.frames), '--deadline', str(args.deadline)]
+    if args.image:
+        cmd += ['--image', os.path.abspath(args.image)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=PROJECT_ROOT)
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    print(f"  ❌ {cores} nhân / {mode} thất bại (exit {proc.returncode})")
+    print("\n".join((proc.stdout + proc.stderr).strip().splitlines()[-10:]))
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face + pose tuần tự / song song")
+    parser.add_argument('--cores', type=int, nargs='+', default=[2, 4],
+                        help="Số nhân CPU cho mỗi lượt đo")
+    parser.add_argument('--frames', type=int, default=200, help="Số frame đo mỗi cấu hình")
+    parser.add_argument('--image', default=None, help="Ảnh khuôn mặt (mặc định: frame tổng hợp)")
+    parser.add_argument('--deadline', type=float, default=60.0, help="PARALLEL_DEADLINE_MS")
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        cores, mode = args.worker.split(':')
+        result = run_config(int(cores), mode, args.frames, args.image, args.deadline)
+        print(RESULT_MARKER + json.dumps(result))
+        return
+
+    available = len(os.sched_getaffinity(0))
+    print("=" * 60)
+    print(f"🔀 PARALLEL LANDMARKS BENCHMARK - {args.frames} frame, máy có {available} nhân")
+    print("=" * 60)
+
+    results = []
+    for cores in args.cores:
+        if cores > available:
+            print(f"⚠️  Bỏ qua {cores} nhân (máy chỉ có {available})")
+            continue
+        for mode in MODES:
+            print(f"⏱️  {cores} nhân / {mode}...")
+            result = _run_in_subprocess(cores, mode, args)
+            if result:
+                results.append(result)
+
+    print(f"\n{'cores':<7}{'mode':<10}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}"
+          f"{'face%':>8}{'late face/pose':>16}")
+    for r in results:
+        late = r['late']
+        print(f"{r['cores']:<7}{r['mode']:<10}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+              f"{r['mean_ms']:>9.2f}{r['face_rate'] * 100:>7.0f}%"
+              f"{late.get('face', 0):>9}/{late.get('pose', 0):<6}")
+    for cores in sorted({r['cores'] for r in results}):
+        by_mode = {r['mode']: r for r in results if r['cores'] == cores}
+        if len(by_mode) == len(MODES):
+            speedup = by_mode['serial']['mean_ms'] / by_mode['parallel']['mean_ms']
+            print(f"  → {cores} nhân: song song nhanh hơn x{speedup:.2f} (mean ms/frame)")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
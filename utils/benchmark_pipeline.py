@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end pipeline không cần webcam / màn hình
+CameraThread + FrameSource (video / thư mục ảnh / ảnh / frame tổng hợp) → AIProcessorThread
+→ MainApplication.process_frame + draw_overlay (không imshow)
+
+Mỗi preset chạy trong 1 process riêng (peak RSS, model state độc lập).
+Báo cáo: latency từng stage (p50/p90/p99), end-to-end latency, throughput, peak RSS.
+Kết quả ghi ra JSON (kèm git commit) để so sánh giữa các commit.
+
+Ví dụ:
+    python utils/benchmark_pipeline.py --video fixtures/session.mp4
+    python utils/benchmark_pipeline.py --image face.png --presets balanced web_mvp --seconds 5
+    python utils/benchmark_pipeline.py --set ENABLE_POSE_DETECTION=False --compare old.json
+"""
+import sys
+import os
+import ast
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+from queue import Queue
+from typing import Dict, List, Optional
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from config import performance_config as perf
+
+RESULT_MARKER = "BENCH_RESULT "
+PERCENTILES = (50, 90, 99)
+
+
+# ============ FRAME SOURCE ============
+
+class TimedSource:
+    """Bọc 1 FrameSource: ghi thời gian đọc từng frame
+
+    Latency tính từ capture_ts của FrameEnvelope (CameraThread gắn); nguồn video / thư mục ảnh được lặp lại
+    (benchmark chạy theo thời gian, không theo số frame). Source bên trong chạy
+    'fast', pacing làm ở đây để read_ms chỉ gồm thời gian decode / tạo frame.
+    """
+
+    def __init__(self, source, pace: str = 'realtime'):
+        self.source = source
+        self.pace = pace
+        self._pacer = None
+        self.name = source.name
+        self.is_live = source.is_live
+        self.frame_index = 0
+        self.read_ms: List[float] = []
+        self._stopped = False
+
+    def open(self) -> bool:
+        from core.frame_source import FramePacer
+        if not self.source.open():
+            return False
+        self._pacer = FramePacer(self.source.fps, self.pace)
+        return True
+
+    def read(self, out=None):
+        if self._stopped:
+            return False, None
+        self._pacer.wait()
+        t0 = time.perf_counter()
+        ok, frame = self.source.read(out)
+        t1 = time.perf_counter()
+        if not ok:
+            return False, None
+        self.frame_index += 1
+        self.read_ms.append((t1 - t0) * 1000)
+        return True, frame
+
+    def configure(self, config, changed=None):
+        self.source.configure(config, changed)
+
+    def describe(self) -> str:
+        return self.source.describe()
+
+    def stop(self):
+        self._stopped = True
+
+    def release(self):
+        self.source.release()
+
+
+def make_source(snapshot, video: str = None, image: str = None, folder: str = None,
+                pace: str = 'fast'):
+    """FrameSource theo tham số CLI, kích thước = CAMERA_WIDTH x CAMERA_HEIGHT của preset"""
+    from core.frame_source import VideoFileSource, ImageFolderSource, SyntheticSource
+    size = (snapshot.CAMERA_WIDTH, snapshot.CAMERA_HEIGHT)
+    if video:
+        return VideoFileSource(video, pace=pace, loop=True, size=size)
+    if folder:
+        return ImageFolderSource(folder, snapshot.CAMERA_FPS, pace=pace, loop=True, size=size)
+    # Ảnh tĩnh được dịch nhẹ mỗi frame để tracking không đứng yên hoàn toàn
+    return SyntheticSource(size[0], size[1], snapshot.CAMERA_FPS, pace=pace, image=image)
+
+
+# ============ WORKER (1 preset / process) ============
+
+def _percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {'count': 0}
+    arr = np.asarray(values, dtype=np.float64)
+    stats = {f"p{p}": round(float(np.percentile(arr, p)), 3) for p in PERCENTILES}
+    stats.update(count=len(values), mean=round(float(arr.mean()), 3),
+                 max=round(float(arr.max()), 3))
+    return stats
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_preset(preset: str, overrides: Dict, seconds: float,
+               video: str = None, image: str = None, folder: str = None,
+               pace: str = 'realtime') -> Dict:
+    """Chạy pipeline 1 preset, trả về thống kê"""
+    os.chdir(PROJECT_ROOT)  # Đường dẫn model là tương đối
+    from config.runtime_config import RuntimeConfig
+    from core.camera_thread import CameraThread
+    from core.ai_processor import AIProcessorThread
+    from main import MainApplication
+
+    config = RuntimeConfig(preset, overrides)
+    snapshot = config.current
+    capture = TimedSource(make_source(snapshot, video, image, folder), pace)
+    stage_samples: Dict[str, List[float]] = {}
+    ai_latency: List[float] = []
+    face_found = [0, 0]  # [có mặt, tổng số lần chạy face]
+
+    class BenchAIThread(AIProcessorThread):
+        def _record(self, result, total_ms: float):
+            stage_samples.setdefault('ai_total', []).append(total_ms)
+            for stage, ms in self.stage_ms.items():
+                stage_samples.setdefault(stage, []).append(ms)
+            if 'face' in self.stage_ms:
+                face_found[1] += 1
+                if result is not None and result.get('face_landmarks') is not None:
+                    face_found[0] += 1
+
+        def _process_frame(self, frame, timestamp=None):
+            # VIDEO mode: cả tick (landmarker chạy đồng bộ trong đây)
+            t0 = time.perf_counter()
+            result = super()._process_frame(frame, timestamp)
+            self._record(result, (time.perf_counter() - t0) * 1000)
+            return result
+
+        def _build_result(self, frame, face_out, pose_result, run_pose, use_roi, timestamp=None):
+            # LIVE_STREAM: _drain_live gọi khi callback đủ; stage_ms face / pose = chờ async
+            t0 = time.perf_counter()
+            result = super()._build_result(frame, face_out, pose_result, run_pose, use_roi, timestamp)
+            if self.live_stream:
+                wait_ms = max(self.stage_ms.get('face', 0.0), self.stage_ms.get('pose', 0.0))
+                self._record(result, wait_ms + (time.perf_counter() - t0) * 1000)
+            return result
+
+        def _cached_copy(self, frame):
+            # LIVE_STREAM: frame không chạy landmarker (VIDEO mode đã đo trong _process_frame)
+            t0 = time.perf_counter()
+            result = super()._cached_copy(frame)
+            if self.live_stream:
+                stage_samples.setdefault('ai_total', []).append((time.perf_counter() - t0) * 1000)
+            return result
+
+        def _publish(self, result, item):
+            previous = super()._publish(result, item)   # Gắn latency_ms (capture → result)
+            ai_latency.append(result['latency_ms'])
+            return previous
+
+    frame_queue = Queue(maxsize=snapshot.FRAME_QUEUE_SIZE)
+    result_queue = Queue(maxsize=snapshot.RESULT_QUEUE_SIZE)
+    app = MainApplication()
+    app.runtime_config = config
+    app._apply_config(snapshot)
+    app.db_writer = None
+    app.camera_thread = CameraThread(0, frame_queue, config, source=capture)
+    app.ai_thread = BenchAIThread(frame_queue, result_queue, config)
+
+    # Chờ model load xong trước khi bắt đầu đo
+    app.ai_thread.start()
+    while app.ai_thread.face_landmarker is None and app.ai_thread.is_alive():
+        time.sleep(0.05)
+    if not app.ai_thread.is_alive():
+        raise RuntimeError("AI thread không khởi động được")
+    app.camera_thread.start()
+
+    main_ms, overlay_ms, e2e_ms = [], [], []
+    last_result = None
+    processed = 0
+    t_start = time.perf_counter()
+    deadline = t_start + seconds
+    while time.perf_counter() < deadline:
+        # Giữ buffer của result['frame'] tới khi đọc xong (camera không ghi đè giữa chừng)
+        result, frame_ref = app.ai_thread.acquire_latest_result()
+        if result is None or result is last_result:
+            if frame_ref is not None:
+                frame_ref.release()
+            time.sleep(0.0005)
+            continue
+        last_result = result
+        try:
+            t0 = time.perf_counter()
+            data = app.process_frame(result, frame_ref.array)
+            t1 = time.perf_counter()
+            # Như main loop: copy vào buffer hiển thị rồi vẽ HUD
+            frame = app.display_buffers.get('display', frame_ref.array.shape)
+            np.copyto(frame, frame_ref.array)
+            app.draw_overlay(frame, data)
+            t2 = time.perf_counter()
+        finally:
+            frame_ref.release()
+        main_ms.append((t1 - t0) * 1000)
+        overlay_ms.append((t2 - t1) * 1000)
+        e2e_ms.append((time.monotonic() - result['capture_ts']) * 1000)
+        processed += 1
+    elapsed = time.perf_counter() - t_start
+
+    capture.stop()
+    app.camera_thread.stop()
+    app.ai_thread.stop()
+    app.camera_thread.join(2)
+    app.ai_thread.join(2)
+
+    stages = {'capture': _percentiles(capture.read_ms)}
+    stages.update({name: _percentiles(v) for name, v in stage_samples.items()})
+    stages['main_process'] = _percentiles(main_ms)
+    stages['overlay'] = _percentiles(overlay_ms)
+    ai_frames = len(stage_samples.get('ai_total', []))
+    return {
+        'preset': preset,
+        'overrides': overrides,
+        'seconds': round(elapsed, 2),
+        'frames_captured': capture.frame_index,
+        'frames_ai': ai_frames,
+        'frames_main': processed,
+        'throughput_fps': {
+            'capture': round(capture.frame_index / elapsed, 2),
+            'ai': round(ai_frames / elapsed, 2),
+            'main': round(processed / elapsed, 2),
+        },
+        'face_detect_rate': round(face_found[0] / face_found[1], 3) if face_found[1] else None,
+        'stages_ms': stages,
+        'capture_to_ai_ms': _percentiles(ai_latency),
+        'end_to_end_ms': _percentiles(e2e_ms),
+        'peak_rss_mb': _peak_rss_mb(),
+        # Span chi tiết (resize, cvtColor, detector...) khi --set SHOW_PERFORMANCE_METRICS=True
+        'trace_ms': app.tracer.summary() if app.tracer.enabled else None,
+    }
+
+
+# ============ DRIVER ============
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_ROOT,
+                             capture_output=True, text=True, timeout=5)
+        commit = out.stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=5)
+        return commit + ('-dirty' if dirty.stdout.strip() else '') if commit else None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _parse_overrides(items: List[str]) -> Dict:
+    overrides = {}
+    for item in items or []:
+        key, sep, raw = item.partition('=')
+        if not sep:
+            raise ValueError(f"--set cần dạng KEY=VALUE: {item}")
+        try:
+            overrides[key] = ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            overrides[key] = raw
+    return overrides
+
+
+def _run_in_subprocess(preset: str, args) -> Optional[Dict]:
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', preset,
+           '--seconds', str(args.seconds), '--pace', args.pace]
+    if args.video:
+        cmd += ['--video', os.path.abspath(args.video)]
+    if args.image:
+        cmd += ['--image', os.path.abspath(args.image)]
+    if args.folder:
+        cmd += ['--folder', os.path.abspath(args.folder)]
+    for item in args.set or []:
+        cmd += ['--set', item]
+    if args.adaptive:
+        cmd.append('--adaptive')
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    print(f"  ❌ {preset} thất bại (exit {proc.returncode})")
+    print("\n".join((proc.stdout + proc.stderr).strip().splitlines()[-10:]))
+    return None
+
+
+def _print_summary(results: Dict):
+    print(f"\n{'preset':<18}{'cap/ai/main FPS':>20}{'ai p50/p99':>14}"
+          f"{'e2e p50/p99':>16}{'face%':>8}{'RSS MB':>9}")
+    for preset, r in results.items():
+        fps = r['throughput_fps']
+        ai = r['stages_ms'].get('ai_total', {})
+        e2e = r['end_to_end_ms']
+        face = r['face_detect_rate']
+        print(f"{preset:<18}"
+              f"{fps['capture']:>7.1f}/{fps['ai']:>5.1f}/{fps['main']:>5.1f}"
+              f"{ai.get('p50', 0):>7.1f}/{ai.get('p99', 0):<6.1f}"
+              f"{e2e.get('p50', 0):>8.1f}/{e2e.get('p99', 0):<7.1f}"
+              f"{(face * 100 if face is not None else 0):>7.0f}%"
+              f"{r['peak_rss_mb'] or 0:>9.0f}")
+
+
+def _print_comparison(current: Dict, baseline_path: str):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\n📊 So với {baseline_path} ({baseline.get('git_commit', '?')[:12]}):")
+    for preset, r in current['results'].items():
+        old = baseline.get('results', {}).get(preset)
+        if not old:
+            continue
+        for label, new_v, old_v in (
+            ('e2e p50', r['end_to_end_ms'].get('p50'), old['end_to_end_ms'].get('p50')),
+            ('e2e p99', r['end_to_end_ms'].get('p99'), old['end_to_end_ms'].get('p99')),
+            ('ai p50', r['stages_ms'].get('ai_total', {}).get('p50'),
+             old['stages_ms'].get('ai_total', {}).get('p50')),
+            ('ai fps', r['throughput_fps']['ai'], old['throughput_fps']['ai']),
+        ):
+            if new_v is None or not old_v:
+                continue
+            change = (new_v - old_v) / old_v * 100
+            print(f"  {preset:<18}{label:<10}{old_v:>9.2f} → {new_v:>9.2f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end pipeline (headless)")
+    parser.add_argument('--video', default=None, help="Video fixture (lặp lại nếu ngắn)")
+    parser.add_argument('--image', default=None, help="Ảnh tĩnh (dịch nhẹ mỗi frame)")
+    parser.add_argument('--folder', default=None, help="Thư mục ảnh (lặp lại theo tên file)")
+    parser.add_argument('--presets', nargs='+', default=list(perf.PRESET_NAMES),
+                        help="Các preset cần đo (mặc định: tất cả)")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Thời gian đo mỗi preset")
+    parser.add_argument('--pace', choices=('realtime', 'fast'), default='realtime',
+                        help="realtime = đúng FPS nguồn, fast = đọc nhanh nhất có thể")
+    parser.add_argument('--set', action='append', metavar='KEY=VALUE',
+                        help="Ghi đè config cho mọi preset (vd. ENABLE_POSE_DETECTION=False)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="Bật adaptive quality (mặc định tắt để kết quả ổn định)")
+    parser.add_argument('--output', default=None, help="File JSON kết quả")
+    parser.add_argument('--compare', default=None, help="File JSON cũ để so sánh")
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    overrides = _parse_overrides(args.set)
+    if not args.adaptive:
+        overrides.setdefault('ADAPTIVE_QUALITY_ENABLED', False)
+
+    if args.worker:
+        result = run_preset(args.worker, overrides, args.seconds,
+                            video=args.video, image=args.image, folder=args.folder,
+                            pace=args.pace)
+        print(RESULT_MARKER + json.dumps(result))
+        return
+
+    source = args.video or args.folder or args.image or 'synthetic'
+    print("=" * 60)
+    print(f"🚀 PIPELINE BENCHMARK - {source}, {args.seconds:.0f}s/preset, pace={args.pace}")
+    print("=" * 60)
+
+    commit = _git_commit()
+    results = {}
+    for preset in args.presets:
+        print(f"⏱️  {preset}...")
+        result = _run_in_subprocess(preset, args)
+        if result:
+            results[preset] = result
+
+    report = {
+        'git_commit': commit,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'source': os.path.basename(source),
+        'pace': args.pace,
+        'seconds_per_preset': args.seconds,
+        'overrides': overrides,
+        'platform': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'system': platform.system(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        PROJECT_ROOT, 'data', 'benchmarks',
+        f"pipeline-{(commit or 'nogit')[:12]}-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    _print_summary(results)
+    if args.compare:
+        _print_comparison(report, args.compare)
+    print("=" * 60)
+    print(f"✅ Kết quả: {output}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark: preprocess cũ (resize + cvtColor ra mảng mới + mp.Image mỗi frame)
+so với core/preprocess.py (buffer dùng lại, đổi kênh tại chỗ, chỉ chạy khi
+có landmarker dùng frame theo FACE/POSE_PROCESS_INTERVAL)
+"""
+import sys
+import os
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import performance_config as perf
+from core.preprocess import Preprocessor, legacy_preprocess
+
+
+def best_of(fn, frames, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for index, frame in enumerate(frames, 1):
+            fn(index, frame)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(frames) * 1000  # ms / frame
+
+
+def run_benchmark(num_frames: int = 300, repeats: int = 3):
+    rng = np.random.default_rng(42)
+    camera = (perf.CAMERA_HEIGHT, perf.CAMERA_WIDTH, 3)
+    size = (perf.PROCESSING_WIDTH, perf.PROCESSING_HEIGHT)
+    frames = [rng.integers(0, 255, camera, dtype=np.uint8) for _ in range(8)]
+    frames = [frames[i % len(frames)] for i in range(num_frames)]
+    face_every, pose_every = perf.FACE_PROCESS_INTERVAL, perf.POSE_PROCESS_INTERVAL
+
+    # Kiểm tra 2 đường cho cùng ảnh RGB
+    preprocessor = Preprocessor()
+    # Giữ tham chiếu mp.Image: numpy_view() không sở hữu dữ liệu
+    legacy_image = legacy_preprocess(frames[0], size)
+    fused_image = preprocessor.run(frames[0], size).mp_image
+    same = np.array_equal(legacy_image.numpy_view(), fused_image.numpy_view())
+
+    def legacy(index, frame):
+        # Đường cũ khi không có cache (ENABLE_RESULT_CACHING=False / đầu phiên): preprocess mọi tick
+        legacy_preprocess(frame, size)
+
+    def fused_every(index, frame):
+        preprocessor.run(frame, size).mp_image
+
+    def fused_gated(index, frame):
+        if index % face_every == 0 or index % pose_every == 0:
+            preprocessor.run(frame, size).mp_image
+        else:
+            preprocessor.skip()
+
+    legacy_ms = best_of(legacy, frames, repeats)
+    fused_ms = best_of(fused_every, frames, repeats)
+    preprocessor.reset_stats()
+    gated_ms = best_of(fused_gated, frames, repeats)
+
+    print("=" * 60)
+    print("⏱️  PREPROCESS BENCHMARK")
+    print("=" * 60)
+    print(f"Camera {camera[1]}x{camera[0]} → {size[0]}x{size[1]}, {num_frames} frame x {repeats} lần")
+    print(f"  [Cũ          ] {legacy_ms:7.3f} ms/frame  (mọi tick khi không có result cache)")
+    print(f"  [Buffer      ] {fused_ms:7.3f} ms/frame  (mọi frame)")
+    print(f"  [Buffer+gate ] {gated_ms:7.3f} ms/frame  (face mỗi {face_every}, pose mỗi {pose_every})")
+    print(f"  → Tiết kiệm: {legacy_ms - gated_ms:.3f} ms/frame (buffer: {legacy_ms - fused_ms:+.3f})")
+    print(f"  → Cùng kết quả RGB: {'✅' if same else '❌'}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    run_benchmark(frames)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Script xuất dữ liệu SQLite sang Parquet cho phân tích (pandas / notebook)
+
+Ví dụ:
+    python utils/export_parquet.py                      # incremental
+    python utils/export_parquet.py --full --out data/export_all
+Đọc lại:
+    pd.read_parquet("data/export/study_sessions")
+"""
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.parquet_exporter import ParquetExporter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xuất study_sessions / rollup sang Parquet")
+    parser.add_argument('--db', default=None, help="Đường dẫn SQLite")
+    parser.add_argument('--out', default=None, help="Thư mục xuất")
+    parser.add_argument('--chunk-rows', type=int, default=None, help="Số dòng mỗi chunk")
+    parser.add_argument('--full', action='store_true', help="Bỏ qua tiến độ cũ, xuất lại từ đầu")
+    parser.add_argument('--no-rollups', action='store_true', help="Không xuất bảng rollup")
+    args = parser.parse_args()
+
+    exporter = ParquetExporter(args.db, args.out, args.chunk_rows)
+    try:
+        if args.full:
+            exporter.reset()
+        stats = exporter.export(include_rollups=not args.no_rollups)
+    finally:
+        exporter.close()
+
+    print("=" * 60)
+    print(f"✅ Export xong trong {stats['seconds']:.1f}s → {exporter.output_dir}")
+    print(f"   study_sessions: {stats['study_sessions']} dòng mới")
+    for resolution, count in stats.get('rollups', {}).items():
+        print(f"   focus_logs_{resolution}: {count} bucket")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
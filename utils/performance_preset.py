@@ -2,10 +2,15 @@
 """
 Script đổi preset performance config
 Presets: high_performance, balanced, high_accuracy, web_mvp, web_full
+
+- [preset]: ghi vào performance_config.py (cần khởi động lại)
+- live [preset] [KEY=VALUE ...]: đổi ngay khi app đang chạy (qua file runtime config)
 """
 
 import sys
 import os
+import json
+import ast
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -124,7 +129,36 @@ def apply_preset(preset_name: str):
         f.write(new_content)
     
     print(f"✅ Đã apply preset: {preset_name.upper()}")
-    print(f"🔄 Khởi động lại ứng dụng để áp dụng thay đổi!")
+    print(f"🔄 Khởi động lại ứng dụng để áp dụng thay đổi! (hoặc dùng 'live {preset_name}')")
+    return True
+
+def apply_live(preset_name: str, assignments: list) -> bool:
+    """Ghi file runtime config để app đang chạy tự áp dụng (không restart)"""
+    if preset_name not in perf.PRESET_NAMES:
+        print(f"❌ Preset '{preset_name}' không tồn tại!")
+        print(f"📋 Presets có sẵn: {', '.join(perf.PRESET_NAMES)}")
+        return False
+
+    overrides = {}
+    for item in assignments:
+        key, sep, raw = item.partition('=')
+        if not sep or not hasattr(perf, key):
+            print(f"❌ Override không hợp lệ: {item} (dạng KEY=VALUE, KEY có trong performance_config)")
+            return False
+        try:
+            overrides[key] = ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            overrides[key] = raw
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.path.join(project_root, perf.RUNTIME_CONFIG_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'preset': preset_name, 'overrides': overrides}, f, indent=2)
+    os.replace(tmp_path, path)  # Rename nguyên tử → watcher không đọc file ghi dở
+
+    print(f"✅ Live preset: {preset_name.upper()}" + (f" + {overrides}" if overrides else ""))
+    print("⚡ App đang chạy sẽ áp dụng trong ~1 giây (không cần restart)")
     return True
 
 def main():
@@ -140,6 +174,9 @@ def main():
         print("   python utils/performance_preset.py high_accuracy")
         print("   python utils/performance_preset.py web_mvp")
         print("   python utils/performance_preset.py web_full")
+        print("\n⚡ ĐỔI KHI ĐANG CHẠY (không restart):")
+        print("   python utils/performance_preset.py live web_mvp")
+        print("   python utils/performance_preset.py live balanced FACE_PROCESS_INTERVAL=2")
         return
     
     preset_name = sys.argv[1].lower()
@@ -147,6 +184,11 @@ def main():
     if preset_name in ['show', 'list', 'current']:
         show_current_config()
         show_available_presets()
+    elif preset_name == 'live':
+        if len(sys.argv) < 3:
+            print("❌ Thiếu tên preset: python utils/performance_preset.py live [preset_name]")
+            return
+        apply_live(sys.argv[2].lower(), sys.argv[3:])
     else:
         apply_preset(preset_name)
 